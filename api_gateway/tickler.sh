@@ -2,6 +2,11 @@
 # This script contains the tickler logic to keep the API Gateway session alive.
 # It continuously sends POST requests to the tickle endpoint at a specified interval.
 
+if [ "${TICKLE_INTERVAL}" = "0" ]; then
+  echo "[tickler] TICKLE_INTERVAL=0, tickler disabled (the MCP server's session supervisor keeps the session alive)."
+  exit 0
+fi
+
 echo "[tickler] Tickler service started."
 
 # Determine SSL flags: use CA cert if available, otherwise fall back to -k (insecure)
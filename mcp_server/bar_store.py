@@ -0,0 +1,374 @@
+import asyncio
+import calendar
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+from mcp_server.bars import BAR_FIELDS
+from mcp_server.config import BAR_STORE_ENABLED, BAR_STORE_PATH, BAR_STORE_MAX_GAPS
+
+logger = logging.getLogger(__name__)
+
+# Seconds per period/bar unit. Months and years are approximations, good enough for bar sizes;
+# request windows use calendar arithmetic for them (see period_start).
+UNIT_SECONDS = {
+    "s": 1, "S": 1, "sec": 1, "secs": 1,
+    "min": 60, "mins": 60,
+    "h": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+    "d": 86400, "day": 86400, "days": 86400,
+    "w": 7 * 86400, "week": 7 * 86400, "weeks": 7 * 86400,
+    "m": 30 * 86400, "month": 30 * 86400, "months": 30 * 86400,
+    "y": 365 * 86400,
+}
+
+_DURATION = re.compile(r"^\s*(\d+)\s*([A-Za-z]+)\s*$")
+START_TIME_FORMAT = "%Y%m%d-%H:%M:%S"
+
+# A fetch callable takes (period, startTime or None) and returns the gateway history payload.
+Fetch = Callable[[str, Optional[str]], Awaitable[Dict[str, Any]]]
+
+
+def duration_seconds(value: Optional[str]) -> Optional[int]:
+    """Parse a period or bar size like '1y', '3600S', '5mins' or '1h' into seconds."""
+    if not value:
+        return None
+    match = _DURATION.match(value)
+    if not match:
+        return None
+    count, unit = match.groups()
+    seconds = UNIT_SECONDS.get(unit) or UNIT_SECONDS.get(unit.lower())
+    return int(count) * seconds if seconds else None
+
+
+def period_start(period: str, end_ms: int) -> Optional[int]:
+    """Start of the window of length period ending at end_ms, or None if period cannot be parsed.
+
+    Months and years are calendar periods, as the gateway counts them: 1m
+    ending on 31 March starts on the last day of February.
+    """
+    match = _DURATION.match(period or "")
+    if not match:
+        return None
+    count, unit = int(match.group(1)), match.group(2)
+    months = {"m": 1, "month": 1, "months": 1, "y": 12}.get(unit if unit in UNIT_SECONDS else unit.lower())
+    if months is None:
+        seconds = duration_seconds(period)
+        return end_ms - seconds * 1000 if seconds else None
+    end = datetime.fromtimestamp(end_ms / 1000, tz=timezone.utc)
+    month_index = end.year * 12 + end.month - 1 - count * months
+    year, month = divmod(month_index, 12)
+    day = min(end.day, calendar.monthrange(year, month + 1)[1])
+    return int(end.replace(year=year, month=month + 1, day=day).timestamp() * 1000)
+
+
+def parse_start_time(value: str) -> int:
+    """Parse a gateway 'YYYYMMDD-hh:mm:ss' UTC time into epoch milliseconds."""
+    return int(datetime.strptime(value, START_TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def format_start_time(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime(START_TIME_FORMAT)
+
+
+def gap_period(gap_ms: int, bar_seconds: int, hmds: bool) -> str:
+    """Smallest period string covering a gap, in units the endpoint accepts.
+
+    Sub-day gaps use seconds on HMDS and minutes/hours on iServer; anything
+    longer, or any daily-or-larger bar, is requested in whole days.
+    """
+    seconds = max(math.ceil(gap_ms / 1000), bar_seconds)
+    if seconds >= 86400 or bar_seconds >= 86400:
+        return f"{math.ceil(seconds / 86400)}d"
+    if hmds:
+        return f"{seconds}S"
+    if seconds <= 30 * 60:
+        return f"{math.ceil(seconds / 60)}min"
+    if seconds <= 8 * 3600:
+        return f"{math.ceil(seconds / 3600)}h"
+    return "1d"
+
+
+def _extra_fields(bar: Dict[str, Any]) -> Optional[str]:
+    """JSON of the bar fields outside BAR_FIELDS, so whole bar rows survive the store."""
+    extra = {field: value for field, value in bar.items() if field not in BAR_FIELDS}
+    return json.dumps(extra) if extra else None
+
+
+class BarStore:
+    """SQLite store of historical bars with the time ranges already fetched for each series.
+
+    A series is one (source, conid, bar size, bar type, RTH flag, exchange)
+    combination. Coverage intervals record which windows have been fetched,
+    so a request only has to download the parts of its window that are not
+    covered yet. Requests anchored at a startTime are also recorded with the
+    exact bar range and metadata they were answered with, so a repeat gets
+    the same answer even when the gateway's window is not the wall-clock
+    one (e.g. a weekend startTime). The connection is shared and guarded by a lock; calls run in
+    a worker thread so the event loop is not blocked on disk I/O.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS series (id INTEGER PRIMARY KEY, key TEXT UNIQUE NOT NULL, meta TEXT);
+                CREATE TABLE IF NOT EXISTS bars (
+                    series_id INTEGER NOT NULL, t INTEGER NOT NULL,
+                    o REAL, h REAL, l REAL, c REAL, v REAL, extra TEXT,
+                    PRIMARY KEY (series_id, t)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS coverage (series_id INTEGER NOT NULL, start_ms INTEGER NOT NULL, end_ms INTEGER NOT NULL);
+                CREATE TABLE IF NOT EXISTS requests (
+                    series_id INTEGER NOT NULL, period TEXT NOT NULL, start_time TEXT NOT NULL,
+                    first_t INTEGER, last_t INTEGER, meta TEXT,
+                    PRIMARY KEY (series_id, period, start_time)
+                ) WITHOUT ROWID;
+                """
+            )
+            # Stores created before per-bar extra fields were kept lack the column.
+            if "extra" not in {column[1] for column in conn.execute("PRAGMA table_info(bars)")}:
+                conn.execute("ALTER TABLE bars ADD COLUMN extra TEXT")
+            self._conn = conn
+        return self._conn
+
+    def _series_id(self, conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT id FROM series WHERE key = ?", (key,)).fetchone()
+        if row:
+            return row[0]
+        return conn.execute("INSERT INTO series (key) VALUES (?)", (key,)).lastrowid
+
+    def _coverage(self, conn: sqlite3.Connection, series_id: int) -> List[Tuple[int, int]]:
+        return conn.execute(
+            "SELECT start_ms, end_ms FROM coverage WHERE series_id = ? ORDER BY start_ms", (series_id,)
+        ).fetchall()
+
+    def _missing(self, key: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT id FROM series WHERE key = ?", (key,)).fetchone()
+            intervals = self._coverage(conn, row[0]) if row else []
+        gaps = []
+        cursor = start_ms
+        for covered_start, covered_end in intervals:
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end_ms:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end_ms:
+            gaps.append((cursor, end_ms))
+        return gaps
+
+    def _save(self, key: str, payload: Dict[str, Any], covered: Tuple[int, int], gap: bool = False) -> None:
+        """Store the bars of a response and mark covered as fetched.
+
+        The series metadata is merged: a full-window response updates it, a
+        gap response only adds keys that are not known yet, so the stored
+        startTime/high/low/timePeriod are not those of the last small gap.
+        """
+        bars = payload.get("data") or []
+        meta = {k: v for k, v in payload.items() if k != "data"}
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                series_id = self._series_id(conn, key)
+                row = conn.execute("SELECT meta FROM series WHERE id = ?", (series_id,)).fetchone()
+                stored = json.loads(row[0]) if row and row[0] else {}
+                merged_meta = {**meta, **stored} if gap else {**stored, **meta}
+                conn.execute("UPDATE series SET meta = ? WHERE id = ?", (json.dumps(merged_meta), series_id))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bars (series_id, t, o, h, l, c, v, extra) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(series_id, *(bar.get(field) for field in BAR_FIELDS), _extra_fields(bar))
+                     for bar in bars if "t" in bar],
+                )
+                intervals = self._coverage(conn, series_id)
+                # An open-ended window whose last bar is older than its start covers nothing.
+                if covered[0] < covered[1]:
+                    intervals.append(covered)
+                intervals.sort()
+                merged: List[List[int]] = []
+                for start, end in intervals:
+                    if merged and start <= merged[-1][1]:
+                        merged[-1][1] = max(merged[-1][1], end)
+                    else:
+                        merged.append([start, end])
+                conn.execute("DELETE FROM coverage WHERE series_id = ?", (series_id,))
+                conn.executemany(
+                    "INSERT INTO coverage (series_id, start_ms, end_ms) VALUES (?, ?, ?)",
+                    [(series_id, start, end) for start, end in merged],
+                )
+
+    def _record(self, key: str, period: str, start_time: str, payload: Dict[str, Any]) -> None:
+        times = [bar["t"] for bar in payload.get("data") or [] if "t" in bar]
+        meta = {k: v for k, v in payload.items() if k != "data"}
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO requests (series_id, period, start_time, first_t, last_t, meta) VALUES (?, ?, ?, ?, ?, ?)",
+                    (self._series_id(conn, key), period, start_time,
+                     min(times) if times else None, max(times) if times else None, json.dumps(meta)),
+                )
+
+    def _recorded(self, key: str, period: str, start_time: str) -> Optional[Dict[str, Any]]:
+        """The answer recorded for this exact request, rebuilt from its bar range, or None if it was never served."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT r.first_t, r.last_t, r.meta FROM requests r JOIN series s ON s.id = r.series_id "
+                "WHERE s.key = ? AND r.period = ? AND r.start_time = ?",
+                (key, period, start_time),
+            ).fetchone()
+        if row is None:
+            return None
+        first_t, last_t, meta = row
+        if first_t is None:
+            return {**json.loads(meta), "data": []}
+        return self._load(key, first_t, last_t + 1, json.loads(meta))
+
+    def _load(self, key: str, start_ms: int, end_ms: int, meta: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Bars with start_ms <= t < end_ms: a bar stamped at the window end belongs to the next window."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute("SELECT id, meta FROM series WHERE key = ?", (key,)).fetchone()
+            rows = conn.execute(
+                "SELECT t, o, h, l, c, v, extra FROM bars WHERE series_id = ? AND t >= ? AND t < ? ORDER BY t",
+                (row[0], start_ms, end_ms),
+            ).fetchall() if row else []
+        if meta is not None:
+            payload = dict(meta)
+        else:
+            payload = json.loads(row[1]) if row and row[1] else {}
+        payload["data"] = [
+            {
+                **{field: value for field, value in zip(BAR_FIELDS, values) if value is not None},
+                **(json.loads(values[-1]) if values[-1] else {}),
+            }
+            for values in rows
+        ]
+        if "points" in payload:
+            payload["points"] = len(rows)
+        return payload
+
+    async def missing(self, key: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        return await asyncio.to_thread(self._missing, key, start_ms, end_ms)
+
+    async def save(self, key: str, payload: Dict[str, Any], covered: Tuple[int, int], gap: bool = False) -> None:
+        await asyncio.to_thread(self._save, key, payload, covered, gap)
+
+    async def load(self, key: str, start_ms: int, end_ms: int) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._load, key, start_ms, end_ms)
+
+    async def record(self, key: str, period: str, start_time: str, payload: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._record, key, period, start_time, payload)
+
+    async def recorded(self, key: str, period: str, start_time: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self._recorded, key, period, start_time)
+
+
+def _covered_until(payload: Dict[str, Any], end_ms: int, open_ended: bool) -> int:
+    """For windows ending now, stop coverage at the last bar so the still-forming bar is fetched again."""
+    if not open_ended:
+        return end_ms
+    times = [bar["t"] for bar in payload.get("data") or [] if "t" in bar]
+    return min(end_ms, max(times)) if times else end_ms
+
+
+async def read_through(
+    store: BarStore,
+    key: str,
+    period: str,
+    bar: Optional[str],
+    start_time: Optional[str],
+    hmds: bool,
+    fetch: Fetch,
+) -> Dict[str, Any]:
+    """Serve a history request from the store, fetching only the uncovered parts of its window.
+
+    The gateway's startTime anchors the end of the requested period; without
+    it the window ends now. A request with a startTime that was served before
+    is answered with the bar range and metadata recorded for it. Falls back to
+    the plain request whenever the window cannot be computed, the series is
+    unknown, it has too many gaps, or a gap fetch is rejected by the gateway.
+    """
+    if start_time is not None:
+        recorded = await store.recorded(key, period, start_time)
+        if recorded is not None:
+            return recorded
+
+    payload = await _read_window(store, key, period, bar, start_time, hmds, fetch)
+    # Only windows that have already ended are final; a future startTime still has bars forming.
+    if (
+        start_time is not None and parse_start_time(start_time) <= time.time() * 1000
+        and isinstance(payload, dict) and isinstance(payload.get("data"), list)
+    ):
+        await store.record(key, period, start_time, payload)
+    return payload
+
+
+async def _read_window(
+    store: BarStore,
+    key: str,
+    period: str,
+    bar: Optional[str],
+    start_time: Optional[str],
+    hmds: bool,
+    fetch: Fetch,
+) -> Dict[str, Any]:
+    bar_seconds = duration_seconds(bar) or 60
+    now_ms = int(time.time() * 1000)
+    end_ms = now_ms if start_time is None else parse_start_time(start_time)
+    start_ms = period_start(period, end_ms)
+    if start_ms is None:
+        return await fetch(period, start_time)
+    # A window that has not ended yet still has bars forming, like one without startTime.
+    open_ended = end_ms >= now_ms
+
+    gaps = await store.missing(key, start_ms, end_ms)
+    if gaps == [(start_ms, end_ms)] or len(gaps) > BAR_STORE_MAX_GAPS:
+        payload = await fetch(period, start_time)
+        if isinstance(payload, dict) and isinstance(payload.get("data"), list):
+            await store.save(key, payload, (start_ms, _covered_until(payload, end_ms, open_ended)))
+        return payload
+
+    try:
+        for gap_start, gap_end in gaps:
+            gap_is_tail = open_ended and gap_end == end_ms
+            payload = await fetch(
+                gap_period(gap_end - gap_start, bar_seconds, hmds),
+                None if gap_is_tail and start_time is None else format_start_time(gap_end),
+            )
+            if not isinstance(payload, dict) or not isinstance(payload.get("data"), list):
+                raise ValueError("Unexpected history payload")
+            await store.save(key, payload, (gap_start, _covered_until(payload, gap_end, gap_is_tail)), gap=True)
+    except (httpx.HTTPStatusError, ValueError) as exc:
+        logger.info("Incremental history fetch for %s failed (%s); fetching the full window", key, exc)
+        payload = await fetch(period, start_time)
+        if isinstance(payload, dict) and isinstance(payload.get("data"), list):
+            await store.save(key, payload, (start_ms, _covered_until(payload, end_ms, open_ended)))
+        return payload
+
+    return await store.load(key, start_ms, end_ms)
+
+
+bar_store = BarStore(os.path.expanduser(BAR_STORE_PATH)) if BAR_STORE_ENABLED else None
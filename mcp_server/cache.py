@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+# All caches created through create_cache(), keyed by name, for stats and invalidation.
+CACHES: Dict[str, "TTLCache"] = {}
+
+
+def normalize_csv(value: Optional[str], upper: bool = False) -> Tuple[str, ...]:
+    """Normalize a comma-separated parameter into a sorted, de-duplicated tuple usable as a cache key."""
+    if not value:
+        return ()
+    items = (item.strip() for item in value.split(","))
+    if upper:
+        items = (item.upper() for item in items)
+    return tuple(sorted({item for item in items if item}))
+
+
+class TTLCache:
+    """A bounded in-process cache with per-entry expiry and LRU eviction.
+
+    Not thread-safe; intended for use from the server's single event loop.
+    """
+
+    def __init__(self, name: str, ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING if absent or expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return MISSING
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del self._data[key]
+            self.misses += 1
+            return MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, keys: Optional[Iterable[Hashable]] = None) -> int:
+        """Remove the given keys, or every entry if keys is None. Returns the number removed."""
+        if keys is None:
+            removed = len(self._data)
+            self._data.clear()
+            return removed
+        removed = 0
+        for key in keys:
+            if self._data.pop(key, None) is not None:
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+class SingleFlight:
+    """Coalesce concurrent identical lookups into a single upstream request.
+
+    The first caller to claim a key owns it and must complete it with
+    resolve() or fail(); later callers get the same future and just await it.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def claim(self, key: Hashable) -> Tuple[asyncio.Future, bool]:
+        """Return the in-flight future for key and whether the caller owns it."""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future, True
+
+    def resolve(self, key: Hashable, result: Any) -> None:
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def fail(self, key: Hashable, exc: BaseException) -> None:
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(exc)
+            # Mark the exception as retrieved in case nobody else is waiting.
+            future.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() unless an identical call is already in flight, and share its result."""
+        future, owner = self.claim(key)
+        if not owner:
+            return await asyncio.shield(future)
+        try:
+            result = await fn()
+        except BaseException as exc:
+            self.fail(key, exc)
+            raise
+        self.resolve(key, result)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+
+def create_cache(name: str, ttl: float, max_entries: int) -> TTLCache:
+    """Create a TTLCache and register it under name so it shows up in cache stats."""
+    cache = TTLCache(name, ttl, max_entries)
+    CACHES[name] = cache
+    return cache
+
+
+async def cached_get(
+    client: httpx.AsyncClient,
+    cache: TTLCache,
+    key: Hashable,
+    url: str,
+    *,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = 10,
+    refresh: bool = False,
+) -> Any:
+    """GET a JSON document through the cache.
+
+    With refresh=True the cache is bypassed for the read but updated with the
+    fresh result. Empty responses are not cached, since the gateway returns
+    them while a session is still warming up. HTTP and connection errors
+    propagate to the caller unchanged.
+    """
+    if not refresh:
+        cached = cache.get(key)
+        if cached is not MISSING:
+            return cached
+    response = await client.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    data = response.json()
+    if data:
+        cache.set(key, data)
+    return data
@@ -28,6 +28,131 @@ MCP_SERVER_LOG_LEVEL = os.environ.get("MCP_SERVER_LOG_LEVEL", "info")
 # SSL verification: set to path of CA cert file, or "false" to disable (insecure)
 SSL_VERIFY = os.environ.get("SSL_VERIFY", "false")
 
+# Shared gateway connection pool (one httpx.AsyncClient for the whole application)
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP2_ENABLED = os.environ.get("HTTP2_ENABLED", "false").lower() == "true"
+
+# Market data snapshots: how long a primed conid/field subscription is trusted,
+# how many times cold conids with missing fields are re-read, and how long
+# conid lists are split into chunks fetched concurrently.
+SNAPSHOT_PRIME_TTL = float(os.environ.get("SNAPSHOT_PRIME_TTL", "600"))
+SNAPSHOT_MAX_RETRIES = int(os.environ.get("SNAPSHOT_MAX_RETRIES", "1"))
+SNAPSHOT_RETRY_DELAY = float(os.environ.get("SNAPSHOT_RETRY_DELAY", "0.25"))
+SNAPSHOT_CHUNK_SIZE = int(os.environ.get("SNAPSHOT_CHUNK_SIZE", "100"))
+SNAPSHOT_CHUNK_CONCURRENCY = int(os.environ.get("SNAPSHOT_CHUNK_CONCURRENCY", "4"))
+
+# Contract metadata cache (seconds / entries per cached endpoint)
+CONTRACT_CACHE_TTL = float(os.environ.get("CONTRACT_CACHE_TTL", "43200"))
+CONTRACT_SEARCH_CACHE_TTL = float(os.environ.get("CONTRACT_SEARCH_CACHE_TTL", "3600"))
+CONTRACT_CACHE_MAX_ENTRIES = int(os.environ.get("CONTRACT_CACHE_MAX_ENTRIES", "2048"))
+
+# Outbound rate limiting. Budgets are "rate:burst" token buckets (requests per second : max burst).
+# Every call needs a token from its endpoint family and from the global budget.
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Seconds a call may queue before it fails locally with a 429
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", "30"))
+RATE_LIMIT_BUDGETS = {
+    "global": os.environ.get("RATE_LIMIT_GLOBAL", "10:10"),
+    "orders": os.environ.get("RATE_LIMIT_ORDERS", "5:5"),
+    "session": os.environ.get("RATE_LIMIT_SESSION", "1:2"),
+    "live_orders": os.environ.get("RATE_LIMIT_LIVE_ORDERS", "0.2:1"),
+    "trades": os.environ.get("RATE_LIMIT_TRADES", "0.2:1"),
+    "portfolio_accounts": os.environ.get("RATE_LIMIT_PORTFOLIO_ACCOUNTS", "0.2:1"),
+    "snapshot": os.environ.get("RATE_LIMIT_SNAPSHOT", "10:10"),
+    "history": os.environ.get("RATE_LIMIT_HISTORY", "5:5"),
+    "scanner": os.environ.get("RATE_LIMIT_SCANNER", "1:1"),
+    "default": os.environ.get("RATE_LIMIT_DEFAULT", "10:10"),
+}
+
+# Automatic retries for idempotent (GET) gateway reads. Never applied to POST/DELETE calls.
+RETRY_MAX_ATTEMPTS = int(os.environ.get("RETRY_MAX_ATTEMPTS", "3"))
+# Total seconds across all attempts, including backoff
+RETRY_DEADLINE = float(os.environ.get("RETRY_DEADLINE", "20"))
+RETRY_BACKOFF_BASE = float(os.environ.get("RETRY_BACKOFF_BASE", "0.5"))
+RETRY_BACKOFF_MAX = float(os.environ.get("RETRY_BACKOFF_MAX", "5"))
+# Per-router overrides as "max_attempts:deadline", e.g. RETRY_POLICY_MARKET_DATA=4:30
+RETRY_POLICY_OVERRIDES = {
+    key[len("RETRY_POLICY_"):].lower(): value
+    for key, value in os.environ.items()
+    if key.startswith("RETRY_POLICY_")
+}
+
+# Position pages fetched concurrently by /portfolio/{accountId}/positions/all
+POSITIONS_PAGE_CONCURRENCY = int(os.environ.get("POSITIONS_PAGE_CONCURRENCY", "4"))
+
+# Portfolio account listings cache (seconds) and concurrent calls for /portfolio/aggregate
+PORTFOLIO_ACCOUNTS_CACHE_TTL = float(os.environ.get("PORTFOLIO_ACCOUNTS_CACHE_TTL", "300"))
+AGGREGATE_CONCURRENCY = int(os.environ.get("AGGREGATE_CONCURRENCY", "8"))
+
+# Local SQLite bar store for history endpoints: only uncovered parts of a window are fetched.
+# BAR_STORE_MAX_GAPS bounds how many separate gaps are backfilled before refetching the whole window.
+BAR_STORE_ENABLED = os.environ.get("BAR_STORE_ENABLED", "true").lower() == "true"
+BAR_STORE_PATH = os.environ.get("BAR_STORE_PATH", "~/.cache/ib_mcp/bars.sqlite3")
+BAR_STORE_MAX_GAPS = int(os.environ.get("BAR_STORE_MAX_GAPS", "3"))
+
+# In-process session supervisor: tickle/status check interval, recovery polling and how long
+# outbound calls are held while the session is being re-authenticated (seconds)
+SESSION_SUPERVISOR_ENABLED = os.environ.get("SESSION_SUPERVISOR_ENABLED", "true").lower() == "true"
+SESSION_TICKLE_INTERVAL = float(os.environ.get("SESSION_TICKLE_INTERVAL", "60"))
+SESSION_RECOVERY_POLL_INTERVAL = float(os.environ.get("SESSION_RECOVERY_POLL_INTERVAL", "2"))
+SESSION_RECOVERY_TIMEOUT = float(os.environ.get("SESSION_RECOVERY_TIMEOUT", "60"))
+SESSION_GATE_TIMEOUT = float(os.environ.get("SESSION_GATE_TIMEOUT", "30"))
+
+# Seconds an /hmds/auth/init is trusted before the next HMDS call re-initializes the session
+HMDS_SESSION_TTL = float(os.environ.get("HMDS_SESSION_TTL", "900"))
+
+# /hmds/history/range: concurrent window fetches and the most windows one request may plan
+HMDS_RANGE_CONCURRENCY = int(os.environ.get("HMDS_RANGE_CONCURRENCY", "4"))
+HMDS_RANGE_MAX_WINDOWS = int(os.environ.get("HMDS_RANGE_MAX_WINDOWS", "200"))
+
+# Parsed /iserver/scanner/params: seconds before refetching, and where it is kept across restarts
+SCANNER_PARAMS_TTL = float(os.environ.get("SCANNER_PARAMS_TTL", "86400"))
+SCANNER_PARAMS_CACHE_PATH = os.environ.get("SCANNER_PARAMS_CACHE_PATH", "~/.cache/ib_mcp/scanner_params.json")
+
+# /batch/scanner: concurrent scans, the most scans per call, and how long identical scan results are reused (seconds)
+SCANNER_BATCH_CONCURRENCY = int(os.environ.get("SCANNER_BATCH_CONCURRENCY", "2"))
+SCANNER_BATCH_MAX_SCANS = int(os.environ.get("SCANNER_BATCH_MAX_SCANS", "50"))
+SCANNER_RESULT_CACHE_TTL = float(os.environ.get("SCANNER_RESULT_CACHE_TTL", "60"))
+
+# /options/chain: concurrent secdef lookups, and the most strike/right lookups one chain may need
+OPTION_CHAIN_CONCURRENCY = int(os.environ.get("OPTION_CHAIN_CONCURRENCY", "8"))
+OPTION_CHAIN_MAX_REQUESTS = int(os.environ.get("OPTION_CHAIN_MAX_REQUESTS", "400"))
+
+# Streaming over the gateway WebSocket: its URL (derived from the gateway URL by default), the fields
+# streamed when a subscriber names none, how long a subscription lease lasts without being renewed,
+# the keep-alive interval, the delay before reconnecting, and the events buffered per SSE consumer
+STREAM_WS_URL = os.environ.get("STREAM_WS_URL")
+STREAM_DEFAULT_FIELDS = [field.strip() for field in os.environ.get("STREAM_DEFAULT_FIELDS", "31,84,85,86,88,87,7059").split(",") if field.strip()]
+STREAM_SUBSCRIPTION_TTL = float(os.environ.get("STREAM_SUBSCRIPTION_TTL", "300"))
+STREAM_HEARTBEAT_INTERVAL = float(os.environ.get("STREAM_HEARTBEAT_INTERVAL", "25"))
+STREAM_RECONNECT_DELAY = float(os.environ.get("STREAM_RECONNECT_DELAY", "2"))
+STREAM_LISTENER_QUEUE_SIZE = int(os.environ.get("STREAM_LISTENER_QUEUE_SIZE", "1000"))
+# Field codes given a fixed slot in the in-memory quote table fed by the stream
+QUOTE_TABLE_FIELDS = [field.strip() for field in os.environ.get(
+    "QUOTE_TABLE_FIELDS", "31,55,70,71,82,83,84,85,86,87,88,7059,7295,7296,7308,7309,7310,7311,7633"
+).split(",") if field.strip()]
+
+# Streamed order book: seconds without use before the order topics are released, the most
+# orders kept, and the longest a single wait-for-status call may block
+ORDER_STREAM_IDLE_TTL = float(os.environ.get("ORDER_STREAM_IDLE_TTL", "600"))
+ORDER_BOOK_MAX_ORDERS = int(os.environ.get("ORDER_BOOK_MAX_ORDERS", "1000"))
+ORDER_WAIT_MAX_TIMEOUT = float(os.environ.get("ORDER_WAIT_MAX_TIMEOUT", "300"))
+
+# Order confirmation prompts that place/modify calls with autoReply=true may confirm server-side
+# (message ids such as o354 or o163; empty disables auto-reply), and the most confirmations in a row
+ORDER_AUTO_REPLY_MESSAGE_IDS = [message_id.strip() for message_id in os.environ.get("ORDER_AUTO_REPLY_MESSAGE_IDS", "").split(",") if message_id.strip()]
+ORDER_AUTO_REPLY_MAX_DEPTH = int(os.environ.get("ORDER_AUTO_REPLY_MAX_DEPTH", "5"))
+
+# /batch/orders/*: orders submitted concurrently (also paced by the orders rate lane), and the most orders per call
+ORDER_BATCH_CONCURRENCY = int(os.environ.get("ORDER_BATCH_CONCURRENCY", "5"))
+ORDER_BATCH_MAX_ORDERS = int(os.environ.get("ORDER_BATCH_MAX_ORDERS", "500"))
+
+# Batch symbol resolution: concurrent upstream lookups and symbols per /trsrv/stocks call
+BATCH_RESOLVE_CONCURRENCY = int(os.environ.get("BATCH_RESOLVE_CONCURRENCY", "8"))
+BATCH_RESOLVE_CHUNK_SIZE = int(os.environ.get("BATCH_RESOLVE_CHUNK_SIZE", "50"))
+
 INCLUDED_TAGS = os.getenv("INCLUDED_TAGS")
 EXCLUDED_TAGS = os.getenv("EXCLUDED_TAGS")
 
@@ -72,6 +197,7 @@ This API provides a clean, modern interface to interact with various IBKR functi
 ALL_MODULES = {
     "Alerts": "Create, modify, delete, and monitor price, time, and margin alerts.",
     "Contract": "Search for and retrieve detailed information on financial instruments including stocks, options, futures, and bonds.",
+    "Diagnostics": "Inspect and invalidate the server's local caches and outbound rate limiting.",
     "Events Contracts": "Get details on contracts that settle based on the outcome of future events.",
     "FA Allocation Management": "Manage Financial Advisor allocation groups for trade distribution.",
     "FYIs & Notifications": "Manage and retrieve notifications, disclaimers, and delivery options.",
@@ -83,6 +209,7 @@ ALL_MODULES = {
     "Portfolio Analyst": "Access performance data and transaction history for accounts.",
     "Scanner": "Run market scanners on both iServer and the Historical Market Data Service (HMDS).",
     "Session": "Manage the user's authentication session, including status checks, re-authentication, and logout.",
+    "Streaming": "Stream market data over the gateway WebSocket and read the latest ticks from memory instead of polling.",
     "Watchlists": "Create, delete, and manage watchlists and the contracts within them."
 }
 
@@ -4,10 +4,12 @@ from fastmcp import FastMCP
 from fastmcp.server.openapi import RouteMap, MCPType
 from mcp_server.config import MCP_SERVER_HOST, MCP_SERVER_PORT, MCP_SERVER_LOG_LEVEL, MCP_TRANSPORT_PROTOCOL, FINAL_DESCRIPTION, EXCLUDED_TAGS_SET
 from mcp_server.auth import verify_api_key
+from mcp_server.http_client import lifespan
 
 # Import Router Files
 import alerts
 import contract
+import diagnostics
 import events_contracts
 import fa_allocation_management
 import fyis_and_notifications
@@ -19,6 +21,7 @@ import portfolio
 import portfolio_analyst
 import scanner
 import session
+import streaming
 import watchlists
 
 
@@ -27,10 +30,12 @@ app = FastAPI(
     description=FINAL_DESCRIPTION,
     version="1.0.0",
     dependencies=[Depends(verify_api_key)],
+    lifespan=lifespan,
 )
 
 app.include_router(alerts.router)
 app.include_router(contract.router)
+app.include_router(diagnostics.router)
 app.include_router(events_contracts.router)
 app.include_router(fa_allocation_management.router)
 app.include_router(fyis_and_notifications.router)
@@ -42,10 +47,12 @@ app.include_router(portfolio.router)
 app.include_router(portfolio_analyst.router)
 app.include_router(scanner.router)
 app.include_router(session.router)
+app.include_router(streaming.router)
 app.include_router(watchlists.router)
 
 
-route_maps_list = []
+# Server-Sent Event streams never complete, so they cannot be MCP tools.
+route_maps_list = [RouteMap(pattern=r"^/stream/.*/events$", mcp_type=MCPType.EXCLUDE)]
 
 if EXCLUDED_TAGS_SET:    
     for tag_ in EXCLUDED_TAGS_SET:
@@ -55,6 +62,9 @@ if EXCLUDED_TAGS_SET:
 mcp = FastMCP.from_fastapi(
     app=app,
     route_maps = route_maps_list,
+    # FastMCP calls the app in-process, which does not run FastAPI's lifespan,
+    # so the MCP sessions also hold the shared client (reference-counted).
+    lifespan=lifespan,
     )
 
 if __name__ == "__main__":
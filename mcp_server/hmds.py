@@ -0,0 +1,85 @@
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+import httpx
+from mcp_server.config import BASE_URL, HMDS_SESSION_TTL
+
+logger = logging.getLogger(__name__)
+
+HMDS_AUTH_FAILURE_CODES = frozenset({401, 403})
+# An uninitialized or expired HMDS session answers 404 (not 401) on its data endpoints, but so does a
+# genuinely missing resource such as a bad conid. Body fragments that point at the session:
+HMDS_UNINITIALIZED_MARKERS = ("init", "session", "auth")
+
+
+def _looks_uninitialized(response: httpx.Response) -> bool:
+    text = response.text.lower()
+    return any(marker in text for marker in HMDS_UNINITIALIZED_MARKERS)
+
+
+class HmdsSession:
+    """Initializes the HMDS session once and re-initializes it only when needed.
+
+    The init is remembered for HMDS_SESSION_TTL seconds. A request that comes
+    back with an auth failure status invalidates it, re-inits and is sent
+    once more. A 404 does so only if its body points at the session, or if
+    the current session has not answered any request successfully yet; on a
+    session known to work, a 404 is a real one (e.g. a bad conid). Concurrent callers share a single in-flight init through the
+    lock instead of each calling /hmds/auth/init, and a failure seen on a
+    session that has already been re-initialized does not trigger another init.
+    """
+
+    def __init__(self, ttl: float = HMDS_SESSION_TTL):
+        self.ttl = ttl
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+        self.inits = 0
+        self._generation = 0
+        self._verified_generation = -1
+
+    @property
+    def is_ready(self) -> bool:
+        return time.monotonic() < self._expires_at
+
+    def invalidate(self, generation: Optional[int] = None) -> None:
+        if generation is None or generation == self._generation:
+            self._expires_at = 0.0
+
+    async def ensure(self, client: httpx.AsyncClient) -> None:
+        if self.is_ready:
+            return
+        async with self._lock:
+            if self.is_ready:
+                return
+            response = await client.get(f"{BASE_URL}/hmds/auth/init", timeout=10)
+            response.raise_for_status()
+            self.inits += 1
+            self._generation += 1
+            self._expires_at = time.monotonic() + self.ttl
+
+    async def request(self, client: httpx.AsyncClient, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Send an HMDS request on an initialized session, re-initializing once on an auth failure."""
+        await self.ensure(client)
+        generation = self._generation
+        response = await client.request(method, url, **kwargs)
+        if response.is_success:
+            self._verified_generation = generation
+        if response.status_code in HMDS_AUTH_FAILURE_CODES or (
+            response.status_code == 404 and (generation != self._verified_generation or _looks_uninitialized(response))
+        ):
+            logger.info("HMDS request to %s returned %s; re-initializing the HMDS session", url, response.status_code)
+            self.invalidate(generation)
+            await self.ensure(client)
+            response = await client.request(method, url, **kwargs)
+        return response
+
+    async def get(self, client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request(client, "GET", url, **kwargs)
+
+    async def post(self, client: httpx.AsyncClient, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request(client, "POST", url, **kwargs)
+
+
+hmds_session = HmdsSession()
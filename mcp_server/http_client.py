@@ -1,8 +1,22 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager
 from typing import Optional
 
 import httpx
-from mcp_server.config import get_ssl_verify
+from mcp_server.config import (
+    get_ssl_verify,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP2_ENABLED,
+    SESSION_SUPERVISOR_ENABLED,
+)
+from mcp_server.rate_limiter import SESSION_PATHS, RateLimitTimeout, gateway_path, scheduler
+from mcp_server.session_supervisor import supervisor
+from mcp_server.streaming import gateway_ws
+from mcp_server.retry import IDEMPOTENT_METHODS, NO_RETRY, RETRYABLE_STATUS_CODES, current_policy, retry_after_seconds
 
 logger = logging.getLogger(__name__)
 
@@ -22,9 +36,146 @@ STATUS_GUIDANCE: dict[int, str] = {
 }
 
 
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """Return True if HTTP/2 is requested and the optional h2 package is installed."""
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+        return False
+    return True
+
+
+class GatewayTransport(httpx.AsyncBaseTransport):
+    """Wrap the network transport so every outbound gateway call is paced and, if idempotent, retried.
+
+    A call that cannot be scheduled within RATE_LIMIT_MAX_WAIT gets a local
+    429 response, which routers already turn into an error with guidance.
+    Transient failures of GET requests are retried under the retry policy
+    of the calling router; other methods are sent exactly once. While the
+    session supervisor is recovering the brokerage session, non-session
+    calls wait for it instead of failing with 401.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def _send(self, request: httpx.Request) -> httpx.Response:
+        path = gateway_path(request.url.path)
+        is_session_call = SESSION_PATHS.match(path) is not None
+        if not is_session_call:
+            await supervisor.wait_until_healthy()
+        lane = scheduler.classify(request.method, path)
+        try:
+            await scheduler.acquire(lane)
+        except RateLimitTimeout as exc:
+            logger.warning("Outbound request rejected locally: %s", exc)
+            return httpx.Response(429, json={"error": str(exc)}, request=request, extensions={"local": True})
+        response = await self._transport.handle_async_request(request)
+        if response.status_code == 401 and not is_session_call:
+            supervisor.report_unauthorized()
+        return response
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        policy = current_policy() if request.method in IDEMPOTENT_METHODS else NO_RETRY
+        deadline = time.monotonic() + policy.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await self._send(request)
+            except httpx.TransportError as exc:
+                delay = policy.backoff(attempt)
+                if attempt >= policy.max_attempts or time.monotonic() + delay > deadline:
+                    raise
+                logger.info("Retrying %s %s in %.2fs after %s (attempt %d/%d)",
+                            request.method, request.url.path, delay, type(exc).__name__, attempt, policy.max_attempts)
+            else:
+                if (
+                    response.status_code not in RETRYABLE_STATUS_CODES
+                    or response.extensions.get("local")
+                    or attempt >= policy.max_attempts
+                ):
+                    return response
+                delay = max(policy.backoff(attempt), retry_after_seconds(response) or 0.0)
+                if time.monotonic() + delay > deadline:
+                    return response
+                await response.aclose()
+                logger.info("Retrying %s %s in %.2fs after status %d (attempt %d/%d)",
+                            request.method, request.url.path, delay, response.status_code, attempt, policy.max_attempts)
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
 def create_client() -> httpx.AsyncClient:
-    """Create a configured httpx.AsyncClient with proper SSL settings."""
-    return httpx.AsyncClient(verify=get_ssl_verify())
+    """Create a configured httpx.AsyncClient with proper SSL, pool and rate limit settings."""
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    transport = httpx.AsyncHTTPTransport(verify=get_ssl_verify(), limits=limits, http2=_http2_available())
+    return httpx.AsyncClient(transport=GatewayTransport(transport))
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the application-scoped client, creating it on first use.
+
+    Used as a FastAPI dependency so every router shares one connection pool
+    and reuses keep-alive connections to the gateway instead of paying a
+    TCP + TLS handshake per call.
+    """
+    global _shared_client
+    if _shared_client is None or _shared_client.is_closed:
+        _shared_client = create_client()
+    return _shared_client
+
+
+async def close_client() -> None:
+    """Close the application-scoped client and release its connections."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
+
+
+# Holders of the shared gateway resources: the FastAPI app and each open MCP session.
+_lifespan_users = 0
+_lifespan_lock = asyncio.Lock()
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    """Hold the shared gateway client, session supervisor and gateway WebSocket while the app or an MCP session runs.
+
+    FastMCP enters its lifespan once per MCP session, not once per process,
+    so the resources are reference-counted: the first holder starts them and
+    the last one to exit stops them. Accepts either the FastAPI app or the
+    FastMCP server, so the same hook can be registered on both.
+    """
+    global _lifespan_users
+    async with _lifespan_lock:
+        _lifespan_users += 1
+        if _lifespan_users == 1:
+            client = get_client()
+            if SESSION_SUPERVISOR_ENABLED:
+                supervisor.start(client)
+    try:
+        yield
+    finally:
+        async with _lifespan_lock:
+            _lifespan_users -= 1
+            if not _lifespan_users:
+                await gateway_ws.stop()
+                await supervisor.stop()
+                await close_client()
 
 
 def _extract_error_detail(response: httpx.Response) -> Optional[str]:
@@ -85,3 +236,10 @@ def handle_request_error(exc: httpx.RequestError) -> dict:
         "error": "Request Error",
         "detail": "Failed to connect to the IBKR gateway. Please check the service status.",
     }
+
+
+def handle_gateway_error(exc: Exception) -> dict:
+    """Handle either kind of gateway error, e.g. one collected per item in a concurrent batch."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return handle_http_error(exc)
+    return handle_request_error(exc)
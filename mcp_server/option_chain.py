@@ -0,0 +1,336 @@
+import asyncio
+import bisect
+import logging
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from mcp_server.cache import cached_get, create_cache
+from mcp_server.config import (
+    BASE_URL,
+    CONTRACT_CACHE_TTL,
+    CONTRACT_SEARCH_CACHE_TTL,
+    CONTRACT_CACHE_MAX_ENTRIES,
+    OPTION_CHAIN_CONCURRENCY,
+    OPTION_CHAIN_MAX_REQUESTS,
+)
+from mcp_server.http_client import handle_gateway_error
+from mcp_server.snapshot import snapshot_engine
+
+logger = logging.getLogger(__name__)
+
+# Underlying search results (with their option months), strike lists per month, and option legs per strike/right.
+underlying_cache = create_cache("option_underlying", CONTRACT_SEARCH_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+strikes_cache = create_cache("option_strikes", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+legs_cache = create_cache("option_legs", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES * 4)
+
+LAST_PRICE_FIELD = "31"
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_SUFFIXES = {"K": 1e3, "M": 1e6, "B": 1e9}
+
+# Snapshot fields available per option leg, by the column name they are returned under.
+LEG_FIELDS = {
+    "last": "31",
+    "bid": "84",
+    "ask": "86",
+    "volume": "87",
+    "iv": "7633",
+    "delta": "7308",
+    "gamma": "7309",
+    "theta": "7310",
+    "vega": "7311",
+    "open_interest": "7638",
+}
+
+
+class ChainError(Exception):
+    """Raised when a chain cannot be built from the caller's input (unknown symbol, no option months, ...)."""
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """Parse a formatted snapshot value such as '201.3', 'C201.30' (closing), 'H201.3' (halted), '1.2K' or '31.5%'."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value or "").replace(",", "")
+    match = _NUMBER.search(text)
+    if not match:
+        return None
+    number = float(match.group())
+    suffix = text[match.end():match.end() + 1].upper()
+    return number * _SUFFIXES.get(suffix, 1)
+
+
+def select_strikes(
+    strikes: Sequence[float],
+    price: Optional[float],
+    count: Optional[int],
+    pct: Optional[float],
+) -> List[float]:
+    """Keep the strikes around the underlying price.
+
+    `count` keeps that many strikes below and above the price; `pct` keeps the
+    strikes within +/- pct (e.g. 0.1 for 10%) of it. Without a price, or with
+    neither limit, every strike is kept.
+    """
+    strikes = sorted(set(strikes))
+    if price is None or not strikes:
+        return strikes
+    if pct:
+        strikes = [strike for strike in strikes if abs(strike - price) <= price * pct]
+    if count:
+        middle = bisect.bisect_left(strikes, price)
+        strikes = strikes[max(0, middle - count):middle + count]
+    return strikes
+
+
+def _option_months(result: Dict[str, Any], sec_type: str) -> List[str]:
+    for section in result.get("sections") or []:
+        if section.get("secType") == sec_type and section.get("months"):
+            return [month for month in section["months"].split(";") if month]
+    return []
+
+
+async def resolve_underlying(
+    client: httpx.AsyncClient, symbol: str, conid: Optional[int], sec_type: str, refresh: bool
+) -> Tuple[int, List[str]]:
+    """Return the underlying conid and its option months, using /iserver/secdef/search."""
+    symbol = symbol.strip().upper()
+    results = await cached_get(
+        client, underlying_cache, symbol, f"{BASE_URL}/iserver/secdef/search", params={"symbol": symbol}, refresh=refresh
+    )
+    candidates = [result for result in results or [] if isinstance(result, dict) and result.get("conid")]
+    if conid is not None:
+        candidates = [result for result in candidates if str(result.get("conid")) == str(conid)]
+    else:
+        candidates = [result for result in candidates if str(result.get("symbol", "")).upper() == symbol] or candidates
+    for result in candidates:
+        months = _option_months(result, sec_type)
+        if months:
+            return int(result["conid"]), months
+    if not candidates:
+        raise ChainError(f"No contract found for symbol '{symbol}'" + (f" with conid {conid}" if conid else ""))
+    raise ChainError(f"'{symbol}' has no {sec_type} months in /iserver/secdef/search")
+
+
+async def underlying_price(client: httpx.AsyncClient, conid: int) -> Optional[float]:
+    """Last price of the underlying from a market data snapshot, or None if it is not available."""
+    try:
+        rows = await snapshot_engine.fetch(client, [str(conid)], [LAST_PRICE_FIELD])
+    except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+        logger.info("Could not read the underlying price of %s: %s", conid, exc)
+        return None
+    return parse_number(rows[0].get(LAST_PRICE_FIELD)) if rows else None
+
+
+async def build_chain(
+    client: httpx.AsyncClient,
+    symbol: str,
+    *,
+    conid: Optional[int] = None,
+    months: Optional[List[str]] = None,
+    max_months: int = 1,
+    sec_type: str = "OPT",
+    exchange: Optional[str] = None,
+    rights: Sequence[str] = ("C", "P"),
+    strike_count: Optional[int] = 10,
+    strike_range: Optional[float] = None,
+    price: Optional[float] = None,
+    refresh: bool = False,
+) -> Dict[str, Any]:
+    """Resolve an option chain into a strike x expiration grid of conids.
+
+    Fans out /iserver/secdef/strikes per month and /iserver/secdef/info per
+    month/strike/right concurrently (OPTION_CHAIN_CONCURRENCY), with every
+    step cached. Raises ChainError for bad input; gateway failures of single
+    legs are collected under "errors" instead.
+    """
+    underlying_conid, available = await resolve_underlying(client, symbol, conid, sec_type, refresh)
+    if months:
+        wanted = [month.strip().upper() for month in months if month.strip()]
+        unknown = [month for month in wanted if month not in available]
+        if unknown:
+            raise ChainError(f"Months {', '.join(unknown)} are not available. Available months: {', '.join(available)}")
+        selected = wanted
+    else:
+        selected = available[:max_months]
+
+    if price is None and (strike_count or strike_range):
+        price = await underlying_price(client, underlying_conid)
+
+    semaphore = asyncio.Semaphore(OPTION_CHAIN_CONCURRENCY)
+    errors: List[Dict[str, Any]] = []
+    stats = {"strike_requests": 0, "leg_requests": 0}
+
+    async def get(cache, key, path: str, params: Dict[str, Any]) -> Any:
+        async with semaphore:
+            return await cached_get(client, cache, key, f"{BASE_URL}{path}", params=params, refresh=refresh)
+
+    async def month_strikes(month: str) -> List[float]:
+        params = {"conid": underlying_conid, "secType": sec_type, "month": month}
+        if exchange:
+            params["exchange"] = exchange
+        stats["strike_requests"] += 1
+        try:
+            data = await get(strikes_cache, (underlying_conid, sec_type, month, exchange), "/iserver/secdef/strikes", params)
+        except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+            errors.append({"month": month, **handle_gateway_error(exc)})
+            return []
+        keys = {"C": "call", "P": "put"}
+        values = [strike for right in rights for strike in (data or {}).get(keys[right], [])]
+        return select_strikes(values, price, strike_count, strike_range)
+
+    month_strike_lists = await asyncio.gather(*(month_strikes(month) for month in selected))
+    requests = [
+        (month, strike, right)
+        for month, strikes in zip(selected, month_strike_lists)
+        for strike in strikes
+        for right in rights
+    ]
+    if len(requests) > OPTION_CHAIN_MAX_REQUESTS:
+        raise ChainError(
+            f"The chain needs {len(requests)} secdef lookups (limit {OPTION_CHAIN_MAX_REQUESTS}). "
+            "Narrow it with fewer months, a strike count or a strike range."
+        )
+
+    async def legs(month: str, strike: float, right: str) -> List[Dict[str, Any]]:
+        params = {"conid": underlying_conid, "secType": sec_type, "month": month, "strike": strike, "right": right}
+        if exchange:
+            params["exchange"] = exchange
+        stats["leg_requests"] += 1
+        try:
+            data = await get(legs_cache, (underlying_conid, sec_type, month, strike, right, exchange), "/iserver/secdef/info", params)
+        except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+            errors.append({"month": month, "strike": strike, "right": right, **handle_gateway_error(exc)})
+            return []
+        return [leg for leg in data or [] if isinstance(leg, dict) and leg.get("conid")]
+
+    found = await asyncio.gather(*(legs(*request) for request in requests))
+
+    cells: Dict[Tuple[str, float, str], int] = {}
+    multiplier = trading_class = None
+    for (month, strike, right), month_legs in zip(requests, found):
+        for leg in month_legs:
+            expiry = str(leg.get("maturityDate") or month)
+            cells[(expiry, float(leg.get("strike", strike)), leg.get("right", right))] = int(leg["conid"])
+            multiplier = multiplier or leg.get("multiplier")
+            trading_class = trading_class or leg.get("tradingClass")
+
+    expirations = sorted({expiry for expiry, _, _ in cells})
+    strikes = sorted({strike for _, strike, _ in cells})
+    grid = {
+        right: [[cells.get((expiry, strike, right)) for expiry in expirations] for strike in strikes]
+        for right in rights
+    }
+    return {
+        "symbol": symbol.strip().upper(),
+        "underlying_conid": underlying_conid,
+        "underlying_price": price,
+        "sec_type": sec_type,
+        "months": selected,
+        "available_months": available,
+        "multiplier": multiplier,
+        "trading_class": trading_class,
+        "expirations": expirations,
+        "strikes": strikes,
+        "calls": grid.get("C"),
+        "puts": grid.get("P"),
+        "errors": errors,
+        "stats": {**stats, "legs": len(cells)},
+    }
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return round(numerator / denominator, 4) if denominator else None
+
+
+def _atm_iv(table: Dict[str, List[Any]], rows: List[int], price: Optional[float]) -> Optional[float]:
+    """Mean call/put IV at the strike closest to the underlying price among the given rows."""
+    quoted = [row for row in rows if table["iv"][row] is not None]
+    if price is None or not quoted:
+        return None
+    atm_strike = min((table["strike"][row] for row in quoted), key=lambda strike: abs(strike - price))
+    ivs = [table["iv"][row] for row in quoted if table["strike"][row] == atm_strike]
+    return round(sum(ivs) / len(ivs), 4)
+
+
+def summarize(table: Dict[str, List[Any]], price: Optional[float]) -> Dict[str, Any]:
+    """Put/call volume and open interest ratios plus ATM IV, overall and per expiration."""
+
+    def stats_for(rows: List[int]) -> Dict[str, Any]:
+        totals = {}
+        for column in ("volume", "open_interest"):
+            if column not in table:
+                continue
+            for right in ("C", "P"):
+                values = [table[column][row] for row in rows if table["right"][row] == right]
+                totals[(column, right)] = sum(value for value in values if value is not None)
+        summary = {
+            "legs": len(rows),
+            "call_volume": totals.get(("volume", "C")),
+            "put_volume": totals.get(("volume", "P")),
+            "put_call_volume_ratio": _ratio(totals.get(("volume", "P"), 0), totals.get(("volume", "C"), 0)),
+            "put_call_oi_ratio": _ratio(totals.get(("open_interest", "P"), 0), totals.get(("open_interest", "C"), 0)),
+        }
+        if "iv" in table:
+            summary["atm_iv"] = _atm_iv(table, rows, price)
+        return summary
+
+    expirations: Dict[str, List[int]] = {}
+    for row, expiry in enumerate(table["expiry"]):
+        expirations.setdefault(expiry, []).append(row)
+    return {
+        **stats_for(list(range(len(table["expiry"])))),
+        "by_expiration": {expiry: stats_for(rows) for expiry, rows in expirations.items()},
+    }
+
+
+async def snapshot_chain(
+    client: httpx.AsyncClient, chain: Dict[str, Any], columns: Sequence[str]
+) -> Dict[str, Any]:
+    """Snapshot every leg of a built chain and return it as a columnar table.
+
+    The snapshot engine splits the conids into gateway-sized chunks fetched
+    concurrently. The table holds one list per column, all the same length,
+    with values parsed to numbers (None when the gateway did not publish the
+    field). Legs whose snapshot failed are reported under "errors" and kept
+    with empty values.
+    """
+    table: Dict[str, List[Any]] = {"expiry": [], "strike": [], "right": [], "conid": []}
+    for right, grid in (("C", chain.get("calls")), ("P", chain.get("puts"))):
+        for strike, conids in zip(chain["strikes"], grid or []):
+            for expiry, conid in zip(chain["expirations"], conids):
+                if conid is not None:
+                    table["expiry"].append(expiry)
+                    table["strike"].append(strike)
+                    table["right"].append(right)
+                    table["conid"].append(conid)
+
+    conids = [str(conid) for conid in table["conid"]]
+    fields = [LEG_FIELDS[column] for column in columns]
+    errors: List[Dict[str, Any]] = []
+    rows: Dict[str, Dict[str, Any]] = {}
+    if conids:
+        try:
+            fetched = await snapshot_engine.fetch(client, conids, fields)
+        except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+            fetched = []
+            errors.append({"conids": table["conid"], **handle_gateway_error(exc)})
+        for row in fetched:
+            if "error" in row:
+                errors.append(row)
+            else:
+                rows[str(row.get("conid"))] = row
+    for column, field in zip(columns, fields):
+        table[column] = [parse_number(rows.get(conid, {}).get(field)) for conid in conids]
+
+    return {
+        "symbol": chain["symbol"],
+        "underlying_conid": chain["underlying_conid"],
+        "underlying_price": chain["underlying_price"],
+        "multiplier": chain["multiplier"],
+        "columns": list(table),
+        "table": table,
+        "summary": summarize(table, chain["underlying_price"]),
+        "errors": chain["errors"] + errors,
+        "stats": {**chain["stats"], "quoted_legs": len(rows)},
+    }
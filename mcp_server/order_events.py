@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
+
+import httpx
+from mcp_server.config import BASE_URL, ORDER_STREAM_IDLE_TTL, ORDER_BOOK_MAX_ORDERS
+from mcp_server.streaming import GatewayWebSocket, gateway_ws
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({"filled", "cancelled", "inactive"})
+
+
+class OrderBook:
+    """Live orders kept up to date from the gateway's order (sor) and PnL (spl) WebSocket topics.
+
+    Orders are keyed by orderId and merged field by field as updates arrive;
+    every status change is recorded with its time. The topics are held on
+    the shared gateway WebSocket while the book is in use and released after
+    ORDER_STREAM_IDLE_TTL seconds without a read or wait, and never while a
+    waiter is blocked. Waiters block on a per-order event that is set on
+    every update of that order.
+    """
+
+    def __init__(self, ws: GatewayWebSocket, idle_ttl: float, max_orders: int):
+        self.ws = ws
+        self.idle_ttl = idle_ttl
+        self.max_orders = max_orders
+        self.orders: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.transitions: Dict[str, List[Dict[str, Any]]] = {}
+        self.pnl: Dict[str, Any] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+        self._active = False
+        self._last_used = 0.0
+        self.counters = {"order_updates": 0, "pnl_updates": 0, "seeded": 0, "waits": 0, "waits_matched": 0, "waits_timed_out": 0}
+        ws.on("sor", self._on_orders)
+        ws.on("spl", self._on_pnl)
+        ws.on_heartbeat(self._expire)
+
+    async def start(self, client: httpx.AsyncClient) -> bool:
+        """Hold the order and PnL topics (again) and mark the book as in use.
+
+        Returns True if the topics were (re)subscribed, i.e. the book may have
+        missed updates since it was last held.
+        """
+        self._last_used = time.monotonic()
+        if self._active and self.ws.is_running:
+            return False
+        self._active = True
+        await self.ws.subscribe(client, "sor", "sor+{}")
+        await self.ws.subscribe(client, "spl", "spl+{}")
+        return True
+
+    async def _expire(self) -> None:
+        if self._active and not self._waiters and time.monotonic() - self._last_used > self.idle_ttl:
+            self._active = False
+            await self.ws.unsubscribe("sor", "uor+{}")
+            await self.ws.unsubscribe("spl", "upl+{}")
+
+    def update(self, order: Dict[str, Any]) -> None:
+        """Merge an order update into the book and wake anyone waiting on that order."""
+        order_id = str(order.get("orderId") or order.get("order_id") or "")
+        if not order_id:
+            return
+        self.counters["order_updates"] += 1
+        current = self.orders.pop(order_id, None) or {}
+        previous = current.get("status")
+        current.update({key: value for key, value in order.items() if value is not None})
+        self.orders[order_id] = current
+        if current.get("status") and current.get("status") != previous:
+            self.transitions.setdefault(order_id, []).append({"status": current["status"], "time": time.time()})
+        while len(self.orders) > self.max_orders:
+            dropped, _ = self.orders.popitem(last=False)
+            self.transitions.pop(dropped, None)
+        event = self._changed.pop(order_id, None)
+        if event is not None:
+            event.set()
+
+    def _on_orders(self, message: Dict[str, Any]) -> None:
+        for order in message.get("args") or []:
+            if isinstance(order, dict):
+                self.update(order)
+
+    def _on_pnl(self, message: Dict[str, Any]) -> None:
+        args = message.get("args")
+        if isinstance(args, dict):
+            self.counters["pnl_updates"] += 1
+            self.pnl.update(args)
+
+    async def _seed(self, client: httpx.AsyncClient, order_id: str) -> None:
+        """Read an order the stream has not reported yet from /iserver/account/order/status."""
+        response = await client.get(f"{BASE_URL}/iserver/account/order/status/{order_id}", timeout=10)
+        response.raise_for_status()
+        body = response.json()
+        if isinstance(body, dict) and body:
+            self.counters["seeded"] += 1
+            body = dict(body)
+            self.update({
+                "orderId": body.pop("order_id", order_id),
+                "status": body.pop("order_status", None),
+                **body,
+            })
+
+    def snapshot(self, order_id: str) -> Dict[str, Any]:
+        return {
+            "orderId": order_id,
+            "status": self.orders.get(order_id, {}).get("status"),
+            "order": self.orders.get(order_id),
+            "transitions": self.transitions.get(order_id, []),
+        }
+
+    async def wait_for(
+        self, client: httpx.AsyncClient, order_id: str, statuses: Iterable[str], timeout: float
+    ) -> Dict[str, Any]:
+        """Block until the order reaches one of statuses (case-insensitive) or timeout seconds pass.
+
+        Raises httpx errors only if the order is unknown to the stream and
+        cannot be read from the gateway either.
+        """
+        wanted = {status.lower() for status in statuses}
+        order_id = str(order_id)
+        started = time.monotonic()
+        self.counters["waits"] += 1
+        # After an idle period the book may hold a stale status for a known order, so read it again too.
+        if await self.start(client) or order_id not in self.orders:
+            await self._seed(client, order_id)
+        self._waiters[order_id] = self._waiters.get(order_id, 0) + 1
+        try:
+            while True:
+                status = str(self.orders.get(order_id, {}).get("status") or "")
+                remaining = timeout - (time.monotonic() - started)
+                if status.lower() in wanted or remaining <= 0:
+                    break
+                event = self._changed.setdefault(order_id, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                self._last_used = time.monotonic()
+        finally:
+            self._waiters[order_id] -= 1
+            if not self._waiters[order_id]:
+                del self._waiters[order_id]
+                self._changed.pop(order_id, None)
+        matched = status.lower() in wanted
+        self.counters["waits_matched" if matched else "waits_timed_out"] += 1
+        return {
+            **self.snapshot(order_id),
+            "matched": matched,
+            "timed_out": not matched,
+            "waited_seconds": round(time.monotonic() - started, 3),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "orders": len(self.orders),
+            "waiters": sum(self._waiters.values()),
+            **self.counters,
+        }
+
+
+order_book = OrderBook(gateway_ws, ORDER_STREAM_IDLE_TTL, ORDER_BOOK_MAX_ORDERS)
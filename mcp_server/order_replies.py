@@ -0,0 +1,65 @@
+import logging
+from typing import Any, Dict, FrozenSet, Iterable, List
+
+import httpx
+from mcp_server.config import BASE_URL, ORDER_AUTO_REPLY_MESSAGE_IDS, ORDER_AUTO_REPLY_MAX_DEPTH
+from mcp_server.http_client import handle_gateway_error
+
+logger = logging.getLogger(__name__)
+
+
+def reply_prompts(payload: Any) -> List[Dict[str, Any]]:
+    """The confirmation prompts in an order response: items with a reply id and messages but no order id yet."""
+    items = payload if isinstance(payload, list) else [payload]
+    return [
+        item for item in items
+        if isinstance(item, dict) and item.get("id") and ("message" in item or "messageIds" in item)
+        and "order_id" not in item
+    ]
+
+
+class ReplyPolicy:
+    """Which order confirmation prompts may be answered server-side, and how many in a row.
+
+    A prompt is auto-confirmed only if every one of its messageIds (e.g.
+    'o354' for missing market data, 'o163' for the price constraint) is in
+    the whitelist. Anything else is handed back to the caller unanswered.
+    """
+
+    def __init__(self, message_ids: Iterable[str], max_depth: int):
+        self.message_ids: FrozenSet[str] = frozenset(message_ids)
+        self.max_depth = max_depth
+
+    def allows(self, prompt: Dict[str, Any]) -> bool:
+        ids = prompt.get("messageIds") or []
+        return bool(ids) and all(str(message_id) in self.message_ids for message_id in ids)
+
+    async def resolve(self, client: httpx.AsyncClient, payload: Any) -> Dict[str, Any]:
+        """Answer whitelisted prompts in payload until the gateway acknowledges the order.
+
+        Returns {"result", "auto_confirmed", "pending"}: the last gateway
+        response, the prompts answered on the caller's behalf, and whether a
+        prompt is still waiting for a manual /iserver/reply (because it is not
+        whitelisted or max_depth was reached). If a reply fails, the gateway
+        error fields are returned alongside, with the prompt it answered still
+        in result and the earlier confirmations in auto_confirmed.
+        """
+        confirmed: List[Dict[str, Any]] = []
+        while True:
+            prompts = reply_prompts(payload)
+            if not prompts:
+                return {"result": payload, "auto_confirmed": confirmed, "pending": False}
+            prompt = prompts[0]
+            if not self.allows(prompt) or len(confirmed) >= self.max_depth:
+                return {"result": payload, "auto_confirmed": confirmed, "pending": True}
+            logger.info("Auto-confirming order reply %s (%s)", prompt["id"], ", ".join(map(str, prompt.get("messageIds") or [])))
+            try:
+                response = await client.post(f"{BASE_URL}/iserver/reply/{prompt['id']}", json={"confirmed": True}, timeout=10)
+                response.raise_for_status()
+            except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                return {**handle_gateway_error(exc), "result": payload, "auto_confirmed": confirmed, "pending": True}
+            confirmed.append({"replyId": prompt["id"], "messageIds": prompt.get("messageIds"), "message": prompt.get("message")})
+            payload = response.json()
+
+
+auto_reply_policy = ReplyPolicy(ORDER_AUTO_REPLY_MESSAGE_IDS, ORDER_AUTO_REPLY_MAX_DEPTH)
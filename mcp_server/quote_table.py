@@ -0,0 +1,122 @@
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+
+class QuoteTable:
+    """Latest streamed values per conid, one fixed-width row per conid.
+
+    Each of the configured field codes has a fixed slot in a row-major value
+    list, so applying a stream delta or reading a conid is a dict lookup for
+    the row plus direct slot indexing. Receive times and the gateway's
+    "_updated" stamp are kept in parallel arrays, one entry per row. Rows of
+    removed conids are reused. Fields outside the slots still arrive on the
+    stream occasionally; they go into a small per-row overflow dict.
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields = list(dict.fromkeys(fields))
+        self._slots = {field: slot for slot, field in enumerate(self.fields)}
+        self._width = len(self.fields)
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._values: List[Any] = []
+        self._received = array("d")
+        self._updated = array("q")
+        self._extra: Dict[int, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, conid: str) -> bool:
+        return str(conid) in self._rows
+
+    def _allocate(self, conid: str) -> int:
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._received)
+            self._values.extend([None] * self._width)
+            self._received.append(0.0)
+            self._updated.append(0)
+        self._rows[conid] = row
+        return row
+
+    def update(self, conid: str, delta: Dict[str, Any]) -> None:
+        """Apply a stream delta: field codes to their slots, '_updated' to the row stamp."""
+        row = self._rows.get(conid)
+        if row is None:
+            row = self._allocate(conid)
+        base = row * self._width
+        for field, value in delta.items():
+            slot = self._slots.get(field)
+            if slot is not None:
+                self._values[base + slot] = value
+            elif field == "_updated":
+                self._updated[row] = int(value or 0)
+            else:
+                self._extra.setdefault(row, {})[field] = value
+        self._received[row] = time.time()
+
+    def remove(self, conid: str) -> None:
+        row = self._rows.pop(str(conid), None)
+        if row is None:
+            return
+        base = row * self._width
+        self._values[base:base + self._width] = [None] * self._width
+        self._received[row] = 0.0
+        self._updated[row] = 0
+        self._extra.pop(row, None)
+        self._free.append(row)
+
+    def age(self, conid: str) -> Optional[float]:
+        """Seconds since the last delta for conid, or None if it has none."""
+        row = self._rows.get(str(conid))
+        return None if row is None else time.time() - self._received[row]
+
+    def _row_dict(self, conid: str, row: int, fields: Optional[List[str]]) -> Dict[str, Any]:
+        base = row * self._width
+        extra = self._extra.get(row, {})
+        result: Dict[str, Any] = {"conid": int(conid) if conid.isdigit() else conid}
+        for field in fields if fields is not None else self.fields + list(extra):
+            slot = self._slots.get(field)
+            value = self._values[base + slot] if slot is not None else extra.get(field)
+            if value is not None:
+                result[field] = value
+        if self._updated[row]:
+            result["_updated"] = self._updated[row]
+        result["_received"] = self._received[row]
+        return result
+
+    def get(self, conid: str, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        """The latest values of conid (only the given fields, if any), or None if nothing was received."""
+        conid = str(conid)
+        row = self._rows.get(conid)
+        return None if row is None else self._row_dict(conid, row, fields)
+
+    def read_fresh(self, conid: str, fields: List[str], max_age: float) -> Optional[Dict[str, Any]]:
+        """Snapshot-style row for conid if it was updated within max_age seconds and has every field, else None."""
+        conid = str(conid)
+        row = self._rows.get(conid)
+        if row is None or time.time() - self._received[row] > max_age:
+            self.misses += 1
+            return None
+        result = self._row_dict(conid, row, fields)
+        if any(field not in result for field in fields):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "conids": len(self._rows),
+            "capacity": len(self._received),
+            "slots": self.fields,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
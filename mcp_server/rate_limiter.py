@@ -0,0 +1,209 @@
+import asyncio
+import itertools
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from mcp_server.config import GATEWAY_ENDPOINT, RATE_LIMIT_ENABLED, RATE_LIMIT_MAX_WAIT, RATE_LIMIT_BUDGETS
+
+logger = logging.getLogger(__name__)
+
+# Lower number = served first when several lanes compete for the global budget.
+LANE_PRIORITIES: Dict[str, int] = {
+    "orders": 0,
+    "session": 1,
+    "live_orders": 2,
+    "trades": 2,
+    "portfolio_accounts": 2,
+    "default": 2,
+    "snapshot": 3,
+    "history": 3,
+    "scanner": 4,
+}
+
+# Session keep-alive and authentication endpoints; also exempt from the session supervisor's gate.
+SESSION_PATHS = re.compile(r"^/(tickle|sso/validate|logout|iserver/auth/|iserver/reauthenticate)")
+
+# (methods or None for any, gateway path pattern, lane). First match wins.
+ENDPOINT_LANES: List[Tuple[Optional[Tuple[str, ...]], Pattern, str]] = [
+    (("POST", "DELETE"), re.compile(r"^/iserver/account/[^/]+/orders?(/|$)"), "orders"),
+    (("POST",), re.compile(r"^/iserver/reply/"), "orders"),
+    (None, SESSION_PATHS, "session"),
+    # The gateway paces the live order and trade lists separately; order/status has no such limit (default lane).
+    (("GET",), re.compile(r"^/iserver/account/orders(/|$)"), "live_orders"),
+    (("GET",), re.compile(r"^/iserver/account/trades(/|$)"), "trades"),
+    (("GET",), re.compile(r"^/portfolio/(accounts|subaccounts)"), "portfolio_accounts"),
+    (None, re.compile(r"^/(iserver/marketdata|md)/snapshot"), "snapshot"),
+    (None, re.compile(r"^/(iserver/marketdata|hmds)/history"), "history"),
+    (None, re.compile(r"^/(iserver|hmds)/scanner"), "scanner"),
+]
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request could not be scheduled within RATE_LIMIT_MAX_WAIT."""
+
+
+def parse_budget(value: str) -> Tuple[float, float]:
+    """Parse a 'rate:burst' budget string (requests per second : bucket size)."""
+    rate, _, burst = value.partition(":")
+    rate = float(rate)
+    return rate, float(burst) if burst else max(rate, 1.0)
+
+
+def gateway_path(url_path: str) -> str:
+    """Strip the gateway API prefix (e.g. /v1/api) from a request path."""
+    if GATEWAY_ENDPOINT and url_path.startswith(GATEWAY_ENDPOINT):
+        return url_path[len(GATEWAY_ENDPOINT):] or "/"
+    return url_path
+
+
+class TokenBucket:
+    """A classic token bucket refilled continuously at `rate` tokens per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+
+@dataclass
+class Lane:
+    name: str
+    priority: int
+    bucket: TokenBucket
+    requests: int = 0
+    timeouts: int = 0
+    queued: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "priority": self.priority,
+            "rate_per_second": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "queue_depth": self.queued,
+            "requests": self.requests,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_total / self.requests * 1000, 2) if self.requests else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    lane: Lane = field(compare=False)
+
+
+class OutboundScheduler:
+    """Pace outbound gateway calls with a global token bucket plus one bucket per endpoint family.
+
+    Each request waits for a token from its lane and from the global budget.
+    When several lanes are ready at once, the global token goes to the
+    highest-priority (then oldest) waiter, so order placement and cancellation
+    overtake market data and scanner traffic queued behind the same limit.
+    """
+
+    def __init__(self, global_budget: Tuple[float, float], lane_budgets: Dict[str, Tuple[float, float]],
+                 max_wait: float, enabled: bool = True):
+        self.enabled = enabled
+        self.max_wait = max_wait
+        self.global_bucket = TokenBucket(*global_budget)
+        self.lanes = {
+            name: Lane(name, LANE_PRIORITIES.get(name, LANE_PRIORITIES["default"]), TokenBucket(*budget))
+            for name, budget in lane_budgets.items()
+        }
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+
+    @classmethod
+    def from_config(cls) -> "OutboundScheduler":
+        budgets = {name: parse_budget(value) for name, value in RATE_LIMIT_BUDGETS.items()}
+        global_budget = budgets.pop("global")
+        return cls(global_budget, budgets, RATE_LIMIT_MAX_WAIT, RATE_LIMIT_ENABLED)
+
+    def classify(self, method: str, path: str) -> str:
+        for methods, pattern, lane in ENDPOINT_LANES:
+            if (methods is None or method in methods) and pattern.match(path) and lane in self.lanes:
+                return lane
+        return "default"
+
+    def _grant_delay(self, waiter: _Waiter, now: float) -> float:
+        lane_wait = waiter.lane.bucket.wait_time(now)
+        if lane_wait:
+            return lane_wait
+        for other in self._waiters:
+            if other < waiter and other.lane.bucket.wait_time(now) == 0:
+                # A more urgent request is ready; let it take the next global token.
+                return self.global_bucket.wait_time(now) or 0.01
+        return self.global_bucket.wait_time(now)
+
+    async def acquire(self, lane_name: str) -> float:
+        """Wait until the request may be sent. Returns the time spent queued, in seconds."""
+        if not self.enabled:
+            return 0.0
+        lane = self.lanes[lane_name]
+        waiter = _Waiter(lane.priority, next(self._seq), lane)
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        async with self._cond:
+            self._waiters.append(waiter)
+            lane.queued += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    delay = self._grant_delay(waiter, now)
+                    if delay == 0:
+                        lane.bucket.take()
+                        self.global_bucket.take()
+                        break
+                    if now + delay > deadline:
+                        lane.timeouts += 1
+                        raise RateLimitTimeout(f"'{lane_name}' lane could not be scheduled within {self.max_wait}s")
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(waiter)
+                lane.queued -= 1
+                self._cond.notify_all()
+        waited = time.monotonic() - start
+        lane.requests += 1
+        lane.wait_total += waited
+        lane.wait_max = max(lane.wait_max, waited)
+        if waited > 1:
+            logger.debug("Outbound request queued %.2fs in '%s' lane", waited, lane_name)
+        return waited
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_wait_seconds": self.max_wait,
+            "global": {
+                "rate_per_second": self.global_bucket.rate,
+                "burst": self.global_bucket.burst,
+                "queue_depth": len(self._waiters),
+            },
+            "lanes": {name: lane.stats() for name, lane in sorted(self.lanes.items(), key=lambda i: i[1].priority)},
+        }
+
+
+scheduler = OutboundScheduler.from_config()
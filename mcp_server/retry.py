@@ -0,0 +1,87 @@
+import contextvars
+import logging
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+from mcp_server.config import (
+    RETRY_MAX_ATTEMPTS,
+    RETRY_DEADLINE,
+    RETRY_BACKOFF_BASE,
+    RETRY_BACKOFF_MAX,
+    RETRY_POLICY_OVERRIDES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Only requests that are safe to repeat are ever retried.
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and a total deadline."""
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    deadline: float = RETRY_DEADLINE
+    backoff_base: float = RETRY_BACKOFF_BASE
+    backoff_max: float = RETRY_BACKOFF_MAX
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before the next try, after `attempt` failed attempts."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+
+DEFAULT_POLICY = RetryPolicy()
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+_current_policy: contextvars.ContextVar[RetryPolicy] = contextvars.ContextVar("retry_policy", default=DEFAULT_POLICY)
+
+
+def policy_for(name: str, default: RetryPolicy = DEFAULT_POLICY) -> RetryPolicy:
+    """Return the policy for a router, applying a RETRY_POLICY_<NAME>="attempts:deadline" override if set."""
+    override = RETRY_POLICY_OVERRIDES.get(name)
+    if not override:
+        return default
+    attempts, _, deadline = override.partition(":")
+    return RetryPolicy(
+        max_attempts=int(attempts),
+        deadline=float(deadline) if deadline else default.deadline,
+        backoff_base=default.backoff_base,
+        backoff_max=default.backoff_max,
+    )
+
+
+def retry_policy(name: str, default: RetryPolicy = DEFAULT_POLICY):
+    """Build a router-level dependency that applies the named retry policy to the request's gateway calls.
+
+    Usage: router = APIRouter(dependencies=[Depends(retry_policy("market_data"))])
+    """
+    policy = policy_for(name, default)
+
+    async def apply_retry_policy():
+        _current_policy.set(policy)
+
+    return apply_retry_policy
+
+
+def current_policy() -> RetryPolicy:
+    return _current_policy.get()
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
@@ -1,12 +1,13 @@
 # alerts.py
-from fastapi import APIRouter, Query, Body, Path
+from fastapi import APIRouter, Query, Body, Path, Depends
 from typing import List, Optional, Any
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("alerts"))])
 
 # --- Pydantic Models for Alert Requests ---
 
@@ -66,20 +67,20 @@ class AlertActivationRequest(BaseModel):
     description="Returns a list of alerts for the specified account."
 )
 async def get_alerts(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves all alerts associated with a given account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/{accountId}/alerts", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/{accountId}/alerts", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -90,24 +91,24 @@ async def get_alerts(
 )
 async def create_or_modify_alert(
     accountId: str = Path(..., description="The account ID."),
-    body: AlertRequest = Body(...)
+    body: AlertRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Creates a new alert or modifies an existing one for the specified account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/alert",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{accountId}/alert",
+            json=body.dict(exclude_none=True),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.delete(
@@ -118,23 +119,23 @@ async def create_or_modify_alert(
 )
 async def delete_alert(
     accountId: str = Path(..., description="The account ID."),
-    alertId: str = Path(..., description="The ID of the alert to delete.")
+    alertId: str = Path(..., description="The ID of the alert to delete."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Deletes a specific alert by its ID.
     """
-    async with create_client() as client:
-        try:
-            response = await client.delete(
-                f"{BASE_URL}/iserver/account/{accountId}/alert/{alertId}",
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.delete(
+            f"{BASE_URL}/iserver/account/{accountId}/alert/{alertId}",
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -143,19 +144,18 @@ async def delete_alert(
     summary="Get MTA Alert",
     description="Each login user has a unique Mobile Trading Assistant (MTA) alert with a description, status, and other fields. This endpoint retrieves that alert."
 )
-async def get_mta_alert():
+async def get_mta_alert(client: httpx.AsyncClient = Depends(get_client)):
     """
     Fetches the Mobile Trading Assistant (MTA) alert for the current user.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/mta", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/mta", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/iserver/account/alert/activate",
@@ -163,20 +163,19 @@ async def get_mta_alert():
     summary="Activate or Deactivate Alert",
     description="Activates or deactivates an existing alert. Requires the alert ID."
 )
-async def activate_deactivate_alert(body: AlertActivationRequest = Body(...)):
+async def activate_deactivate_alert(body: AlertActivationRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Toggles the active status of an alert.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/alert/activate",
-                json=body.dict(),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/alert/activate",
+            json=body.dict(),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
@@ -1,12 +1,35 @@
 # contract.py
-from fastapi import APIRouter, Query, Body, Path
-from typing import List, Optional
+import asyncio
+from fastapi import APIRouter, Query, Body, Path, Depends
+from typing import Any, Dict, List, Optional
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
-from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.config import (
+    BASE_URL,
+    CONTRACT_CACHE_TTL,
+    CONTRACT_SEARCH_CACHE_TTL,
+    CONTRACT_CACHE_MAX_ENTRIES,
+    BATCH_RESOLVE_CONCURRENCY,
+    BATCH_RESOLVE_CHUNK_SIZE,
+)
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error, handle_gateway_error
+from mcp_server.retry import retry_policy
+from mcp_server.cache import MISSING, SingleFlight, create_cache, cached_get, normalize_csv
+
+router = APIRouter(dependencies=[Depends(retry_policy("contract"))])
+
+# --- Contract Metadata Caches ---
+# Contract definitions change at most daily, so these endpoints read through a local cache.
+
+contract_info_cache = create_cache("contract_info", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+secdef_cache = create_cache("trsrv_secdef", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+stocks_cache = create_cache("trsrv_stocks", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+futures_cache = create_cache("trsrv_futures", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+search_cache = create_cache("secdef_search", CONTRACT_SEARCH_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
+symbol_conid_cache = create_cache("symbol_conid", CONTRACT_CACHE_TTL, CONTRACT_CACHE_MAX_ENTRIES)
 
-router = APIRouter()
+# In-flight symbol lookups shared across concurrent /batch/resolve calls.
+symbol_flight = SingleFlight()
 
 # --- Pydantic Models ---
 
@@ -25,6 +48,22 @@ class ContractRulesRequest(BaseModel):
     )
 
 
+class BatchResolveRequest(BaseModel):
+    """Request model for resolving many symbols to conids in one call."""
+    symbols: List[str] = Field(..., description="The symbols to resolve. Duplicates and case differences are ignored.")
+    secType: str = Field("STK", description="The security type to resolve, e.g. STK, FUT, IND.")
+    refresh: bool = Field(False, description="Set to true to ignore previously resolved conids.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "symbols": ["AAPL", "MSFT", "IBM"],
+                "secType": "STK"
+            }
+        }
+    )
+
+
 # --- Contract Router Endpoints ---
 
 @router.get(
@@ -37,7 +76,8 @@ async def get_contract_algos(
     conid: int = Path(..., description="The contract ID."),
     algos: Optional[str] = Query(None, description="A comma-separated list of IB Algos to query."),
     addDescription: Optional[str] = Query(None, description="Set to 1 to receive algorithm descriptions."),
-    addParams: Optional[str] = Query(None, description="Set to 1 to receive algorithm parameters.")
+    addParams: Optional[str] = Query(None, description="Set to 1 to receive algorithm parameters."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves a list of supported IB Algos for a given instrument.
@@ -50,15 +90,14 @@ async def get_contract_algos(
     if addParams:
         params["addParams"] = addParams
 
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/algos", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/algos", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/contract/{conid}/info-and-rules",
@@ -68,21 +107,21 @@ async def get_contract_algos(
 )
 async def get_contract_info_and_rules(
     conid: int = Path(..., description="The contract ID."),
-    isBuy: bool = Query(..., description="Side of the market: true for Buy, false for Sell.")
+    isBuy: bool = Query(..., description="Side of the market: true for Buy, false for Sell."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves a combination of contract details and associated trading rules in a single call.
     """
     params = {"isBuy": isBuy}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/info-and-rules", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/info-and-rules", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -92,20 +131,21 @@ async def get_contract_info_and_rules(
     description="Get full contract details for a given contract ID (conid)."
 )
 async def get_contract_info(
-    conid: int = Path(..., description="The contract ID.")
+    conid: int = Path(..., description="The contract ID."),
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
-    Retrieves detailed information about a specific contract using its conid.
+    Retrieves detailed information about a specific contract using its conid. Results are cached locally.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/contract/{conid}/info", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        return await cached_get(
+            client, contract_info_cache, conid, f"{BASE_URL}/iserver/contract/{conid}/info", refresh=refresh
+        )
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/secdef/bond-filters",
@@ -114,7 +154,8 @@ async def get_contract_info(
     description="Returns a list of available bond filters for a given issuer."
 )
 async def get_bond_filters(
-    issuerId: str = Query(..., description="Specifies the issuerId value used to designate the bond issuer type.")
+    issuerId: str = Query(..., description="Specifies the issuerId value used to designate the bond issuer type."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves a list of filters that can be used when searching for bonds.
@@ -123,15 +164,14 @@ async def get_bond_filters(
         "symbol": "BOND",
         "issuerId": issuerId
     }
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/bond-filters", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/secdef/bond-filters", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/secdef/currency",
@@ -140,21 +180,21 @@ async def get_bond_filters(
     description="Search for currency pairs."
 )
 async def search_currency_pairs(
-    symbol: str = Query(..., description="The currency pair (e.g., EUR.USD).")
+    symbol: str = Query(..., description="The currency pair (e.g., EUR.USD)."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves information about a currency pair. Corresponds to the user's request for /iserver/currency/pairs.
     """
     params = {"symbol": symbol}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/currency", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/secdef/currency", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/secdef/info",
@@ -168,7 +208,8 @@ async def get_secdef_info(
     month: Optional[str] = Query(None, description="The expiration month for options/futures (e.g., 'DEC23')."),
     exchange: Optional[str] = Query(None, description="The exchange to query."),
     strike: Optional[float] = Query(None, description="The strike price for options."),
-    right: Optional[str] = Query(None, description="The right for options: 'C' for Call, 'P' for Put.")
+    right: Optional[str] = Query(None, description="The right for options: 'C' for Call, 'P' for Put."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     A comprehensive endpoint to get instrument metadata and rules in one call.
@@ -183,15 +224,14 @@ async def get_secdef_info(
     if right:
         params["right"] = right
 
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/info", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/secdef/info", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/secdef/search",
@@ -202,10 +242,13 @@ async def get_secdef_info(
 async def search_contract_by_symbol_or_name(
     symbol: str = Query(..., description="The symbol or company name to search for."),
     name: Optional[bool] = Query(False, description="Set to true to search by company name instead of symbol."),
-    secType: Optional[str] = Query(None, description="The security type to filter by (e.g., STK, OPT, FUT).")
+    secType: Optional[str] = Query(None, description="The security type to filter by (e.g., STK, OPT, FUT)."),
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Searches for contracts based on a symbol or name. This is a primary method for finding a contract's conid.
+    Results are cached locally.
     """
     params = {"symbol": symbol}
     if name is not None:
@@ -213,15 +256,15 @@ async def search_contract_by_symbol_or_name(
     if secType:
         params["secType"] = secType
 
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/search", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    key = (symbol.strip().upper(), bool(name), (secType or "").upper())
+    try:
+        return await cached_get(
+            client, search_cache, key, f"{BASE_URL}/iserver/secdef/search", params=params, refresh=refresh
+        )
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/iserver/contract/rules",
@@ -229,23 +272,22 @@ async def search_contract_by_symbol_or_name(
     summary="Contract Rules",
     description="Returns trading rules for a contract. The request body requires the conid and a boolean for the side."
 )
-async def get_contract_rules(body: ContractRulesRequest = Body(...)):
+async def get_contract_rules(body: ContractRulesRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Fetches the trading rules for a given contract, such as order types and sizes.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/contract/rules",
-                json=body.dict(),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/contract/rules",
+            json=body.dict(),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/secdef/strikes",
@@ -257,7 +299,8 @@ async def get_strikes(
     conid: int = Query(..., description="The contract ID of the underlying security."),
     secType: str = Query(..., description="The security type (e.g., OPT, WAR)."),
     month: str = Query(..., description="The expiration month in 'MMMYY' format (e.g., JAN25)."),
-    exchange: Optional[str] = Query(None, description="The exchange to filter by. Defaults to SMART.")
+    exchange: Optional[str] = Query(None, description="The exchange to filter by. Defaults to SMART."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves available strike prices for an options contract based on the underlying conid, security type, and expiration.
@@ -266,15 +309,14 @@ async def get_strikes(
     if exchange:
         params["exchange"] = exchange
         
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/secdef/strikes", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/secdef/strikes", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/trsrv/futures",
@@ -283,21 +325,21 @@ async def get_strikes(
     description="Returns a list of futures for the given symbols."
 )
 async def get_trsrv_futures_by_symbol(
-    symbols: str = Query(..., description="A comma-separated list of underlying symbols.")
+    symbols: str = Query(..., description="A comma-separated list of underlying symbols."),
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Get detailed information about futures contracts for given symbols.
     """
     params = {"symbols": symbols}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/futures", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    key = normalize_csv(symbols, upper=True)
+    try:
+        return await cached_get(client, futures_cache, key, f"{BASE_URL}/trsrv/futures", params=params, refresh=refresh)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/trsrv/secdef",
@@ -306,21 +348,21 @@ async def get_trsrv_futures_by_symbol(
     description="Returns a list of security definitions for the given conids."
 )
 async def get_secdef_by_conids(
-    conids: str = Query(..., description="A comma-separated list of contract IDs.")
+    conids: str = Query(..., description="A comma-separated list of contract IDs."),
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves security definitions for one or more contracts.
     """
     params = {"conids": conids}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/secdef", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    key = normalize_csv(conids)
+    try:
+        return await cached_get(client, secdef_cache, key, f"{BASE_URL}/trsrv/secdef", params=params, refresh=refresh)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/trsrv/stocks",
@@ -329,21 +371,21 @@ async def get_secdef_by_conids(
     description="Returns a list of stock contracts for the given symbols."
 )
 async def get_stocks_by_symbol(
-    symbols: str = Query(..., description="A comma-separated list of stock symbols.")
+    symbols: str = Query(..., description="A comma-separated list of stock symbols."),
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches stock contracts for a list of symbols. This is more direct than a general search if you know you are looking for stocks.
     """
     params = {"symbols": symbols}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/stocks", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    key = normalize_csv(symbols, upper=True)
+    try:
+        return await cached_get(client, stocks_cache, key, f"{BASE_URL}/trsrv/stocks", params=params, refresh=refresh)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/trsrv/secdef/schedule",
@@ -355,7 +397,8 @@ async def get_trading_schedule(
     assetClass: str = Query(..., description="The asset class of the contract, e.g., 'STK', 'OPT', 'FUT'."),
     symbol: str = Query(..., description="The underlying symbol."),
     exchange: Optional[str] = Query(None, description="The exchange to query."),
-    exchangeFilter: Optional[str] = Query(None, description="The exchange filter.")
+    exchangeFilter: Optional[str] = Query(None, description="The exchange filter."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves the trading schedule for a given contract.
@@ -366,12 +409,154 @@ async def get_trading_schedule(
     if exchangeFilter:
         params["exchangeFilter"] = exchangeFilter
 
-    async with create_client() as client:
+    try:
+        response = await client.get(f"{BASE_URL}/trsrv/secdef/schedule", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+# --- Batch Conid Resolution ---
+
+def _pick_stock_conid(entries: Any) -> Optional[int]:
+    """Pick a conid from a /trsrv/stocks entry list, preferring US listings."""
+    contracts = [c for entry in entries or [] for c in entry.get("contracts") or []]
+    if not contracts:
+        return None
+    preferred = next((c for c in contracts if c.get("isUS")), contracts[0])
+    return preferred.get("conid")
+
+
+def _pick_search_conid(symbol: str, results: Any) -> Optional[int]:
+    """Pick a conid from /iserver/secdef/search results whose symbol matches exactly."""
+    if not isinstance(results, list):
+        return None
+    for result in results:
+        if str(result.get("symbol", "")).upper() == symbol and result.get("conid"):
+            conid = result["conid"]
+            return int(conid) if str(conid).isdigit() else conid
+    return None
+
+
+async def _resolve_symbols(client: httpx.AsyncClient, symbols: List[str], secType: str):
+    """Resolve symbols upstream. Returns ({symbol: conid or None}, {symbol: error})."""
+    semaphore = asyncio.Semaphore(BATCH_RESOLVE_CONCURRENCY)
+    conids: Dict[str, Optional[int]] = {}
+    errors: Dict[str, Any] = {}
+
+    async def stocks_chunk(chunk: List[str]):
+        async with semaphore:
+            try:
+                response = await client.get(f"{BASE_URL}/trsrv/stocks", params={"symbols": ",".join(chunk)}, timeout=10)
+                response.raise_for_status()
+                data = response.json()
+            except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                # Leave the chunk unresolved; the per-symbol search below gets a second chance.
+                for symbol in chunk:
+                    errors[symbol] = handle_gateway_error(exc)
+                return
+        if isinstance(data, dict):
+            for symbol in chunk:
+                conid = _pick_stock_conid(data.get(symbol))
+                if conid is not None:
+                    conids[symbol] = conid
+                    errors.pop(symbol, None)
+
+    async def search_one(symbol: str):
+        async with semaphore:
+            try:
+                response = await client.get(
+                    f"{BASE_URL}/iserver/secdef/search",
+                    params={"symbol": symbol, "secType": secType},
+                    timeout=10,
+                )
+                response.raise_for_status()
+                conids[symbol] = _pick_search_conid(symbol, response.json())
+                errors.pop(symbol, None)
+            except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                errors[symbol] = handle_gateway_error(exc)
+
+    # /trsrv/stocks resolves many stock symbols per request; anything it misses falls back to search.
+    if secType == "STK":
+        chunks = [symbols[i:i + BATCH_RESOLVE_CHUNK_SIZE] for i in range(0, len(symbols), BATCH_RESOLVE_CHUNK_SIZE)]
+        await asyncio.gather(*(stocks_chunk(chunk) for chunk in chunks))
+    await asyncio.gather(*(search_one(symbol) for symbol in symbols if symbol not in conids))
+
+    return conids, errors
+
+
+@router.post(
+    "/batch/resolve",
+    tags=["Contract"],
+    summary="Batch Resolve Symbols to Conids",
+    description="Resolves many symbols to contract IDs in one call. Known symbols are served from cache; the rest are looked up concurrently."
+)
+async def batch_resolve_conids(
+    body: BatchResolveRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    """
+    Deduplicates the requested symbols, serves previously resolved ones from cache and resolves the rest
+    upstream, preferring the multi-symbol /trsrv/stocks call for stocks. Identical lookups already in flight
+    from another request are shared rather than repeated. Returns a symbol -> conid map; symbols that could
+    not be resolved map to null and are listed in 'unresolved', with any gateway errors under 'errors'.
+    """
+    secType = body.secType.upper()
+    symbols = list(dict.fromkeys(s.strip().upper() for s in body.symbols if s.strip()))
+
+    conids: Dict[str, Any] = {}
+    errors: Dict[str, Any] = {}
+    owned: List[str] = []
+    waiting: Dict[str, asyncio.Future] = {}
+    cached = 0
+
+    for symbol in symbols:
+        key = (symbol, secType)
+        if not body.refresh:
+            conid = symbol_conid_cache.get(key)
+            if conid is not MISSING:
+                conids[symbol] = conid
+                cached += 1
+                continue
+        future, owner = symbol_flight.claim(key)
+        if owner:
+            owned.append(symbol)
+        else:
+            waiting[symbol] = future
+
+    try:
+        resolved, resolve_errors = await _resolve_symbols(client, owned, secType) if owned else ({}, {})
+    except BaseException as exc:
+        for symbol in owned:
+            symbol_flight.fail((symbol, secType), exc)
+        raise
+    for symbol in owned:
+        conid = resolved.get(symbol)
+        if conid is not None:
+            symbol_conid_cache.set((symbol, secType), conid)
+        symbol_flight.resolve((symbol, secType), conid)
+        conids[symbol] = conid
+    errors.update(resolve_errors)
+
+    for symbol, future in waiting.items():
         try:
-            response = await client.get(f"{BASE_URL}/trsrv/secdef/schedule", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+            conids[symbol] = await asyncio.shield(future)
+        except Exception as exc:
+            conids[symbol] = None
+            errors[symbol] = {"error": "Request Error", "detail": str(exc)}
+
+    ordered = {symbol: conids.get(symbol) for symbol in symbols}
+    return {
+        "conids": ordered,
+        "unresolved": [symbol for symbol, conid in ordered.items() if conid is None],
+        "errors": {symbol: errors[symbol] for symbol in symbols if symbol in errors and ordered[symbol] is None},
+        "stats": {
+            "requested": len(symbols),
+            "cached": cached,
+            "fetched": len(owned),
+            "coalesced": len(waiting),
+        },
+    }
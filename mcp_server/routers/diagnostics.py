@@ -0,0 +1,75 @@
+# diagnostics.py
+from fastapi import APIRouter, Body
+from typing import Dict, Any, Optional
+from pydantic import BaseModel, Field
+from mcp_server.cache import CACHES
+from mcp_server.rate_limiter import scheduler
+from mcp_server.session_supervisor import supervisor
+from mcp_server.order_events import order_book
+from mcp_server.streaming import gateway_ws, market_data_stream
+
+router = APIRouter()
+
+# --- Pydantic Models ---
+
+class CacheInvalidateRequest(BaseModel):
+    """Request model for invalidating local caches."""
+    cache: Optional[str] = Field(None, description="Name of the cache to clear, e.g. 'contract_info'. Omit to clear every cache.")
+
+
+# --- Diagnostics Router Endpoints ---
+
+@router.get(
+    "/diagnostics/cache",
+    tags=["Diagnostics"],
+    summary="Local Cache Statistics",
+    description="Returns size, TTL, hit/miss and eviction counters for every local cache kept by this server."
+)
+async def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: cache.stats() for name, cache in sorted(CACHES.items())}
+
+
+@router.post(
+    "/diagnostics/cache/invalidate",
+    tags=["Diagnostics"],
+    summary="Invalidate Local Caches",
+    description="Clears one named local cache, or all of them, so the next call fetches fresh data from the gateway."
+)
+async def invalidate_cache(body: CacheInvalidateRequest = Body(...)):
+    if body.cache is None:
+        targets = CACHES
+    elif body.cache in CACHES:
+        targets = {body.cache: CACHES[body.cache]}
+    else:
+        return {"error": "Unknown cache", "detail": f"Valid caches: {', '.join(sorted(CACHES))}"}
+    return {"invalidated": {name: cache.invalidate() for name, cache in targets.items()}}
+
+
+@router.get(
+    "/diagnostics/rate-limits",
+    tags=["Diagnostics"],
+    summary="Outbound Rate Limiter Metrics",
+    description="Returns the budget, queue depth and wait-time metrics of every outbound rate limiting lane."
+)
+async def get_rate_limit_stats() -> Dict[str, Any]:
+    return scheduler.stats()
+
+
+@router.get(
+    "/diagnostics/session",
+    tags=["Diagnostics"],
+    summary="Session Supervisor Status",
+    description="Returns the state of the in-process session supervisor, the last /iserver/auth/status it saw, and its tickle and recovery counters."
+)
+async def get_session_supervisor_stats() -> Dict[str, Any]:
+    return supervisor.stats()
+
+
+@router.get(
+    "/diagnostics/stream",
+    tags=["Diagnostics"],
+    summary="Streaming Status",
+    description="Returns the state and message counters of the gateway WebSocket, which subscribers hold each streamed conid, and the streamed order book counters."
+)
+async def get_stream_stats() -> Dict[str, Any]:
+    return {"websocket": gateway_ws.stats(), "market_data": market_data_stream.stats(), "orders": order_book.stats()}
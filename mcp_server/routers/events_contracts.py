@@ -1,10 +1,11 @@
 # events_contracts.py
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends
 import httpx
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("events_contracts"))])
 
 # --- Events Contracts Router Endpoints ---
 
@@ -15,21 +16,21 @@ router = APIRouter()
     description="Returns a list of event contracts for the given conids."
 )
 async def get_events_contracts(
-    conids: str = Query(..., description="A comma-separated list of contract IDs.")
+    conids: str = Query(..., description="A comma-separated list of contract IDs."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches event contracts for the specified conids. Event contracts are contracts that settle based on the outcome of a future event.
     """
     params = {"conids": conids}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/events/contracts", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/events/contracts", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/events/show",
@@ -38,18 +39,18 @@ async def get_events_contracts(
     description="Returns the event contract for the given conid."
 )
 async def show_event_contract(
-    conid: str = Query(..., description="A single contract ID.")
+    conid: str = Query(..., description="A single contract ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves the details for a specific event contract.
     """
     params = {"conid": conid}
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/events/show", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/events/show", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
@@ -1,12 +1,13 @@
 # fa_allocation_management.py
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Depends
 from typing import List
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("fa_allocation_management"))])
 
 # --- Pydantic Models for FA Group Requests ---
 
@@ -45,19 +46,18 @@ class FAGroup(BaseModel):
     summary="Get FA Groups",
     description="Returns a list of all Financial Advisor (FA) allocation groups for the currently connected financial advisor."
 )
-async def get_fa_groups():
+async def get_fa_groups(client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves all FA groups for the advisor. These groups are used for trade allocation.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/fa/groups", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/fa/groups", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/fa/groups",
@@ -65,24 +65,23 @@ async def get_fa_groups():
     summary="Create FA Group",
     description="Creates a new Financial Advisor (FA) allocation group. This endpoint requires the group name, allocation method, and a list of accounts."
 )
-async def create_fa_group(body: FAGroup = Body(...)):
+async def create_fa_group(body: FAGroup = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Creates a new FA group with a specified allocation method and accounts.
     """
-    async with create_client() as client:
-        try:
-            # The API documentation implies the list of accounts is sent directly as the body.
-            # We'll structure it based on the Pydantic model, which aligns with common REST practices.
-            # The actual JSON sent will be the list of FAGroup models if the API expects a list.
-            # For a single group creation, sending the single object's dict is correct.
-            response = await client.post(
-                f"{BASE_URL}/fa/groups",
-                json=[body.dict()], # The doc example suggests sending a list containing one group object
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        # The API documentation implies the list of accounts is sent directly as the body.
+        # We'll structure it based on the Pydantic model, which aligns with common REST practices.
+        # The actual JSON sent will be the list of FAGroup models if the API expects a list.
+        # For a single group creation, sending the single object's dict is correct.
+        response = await client.post(
+            f"{BASE_URL}/fa/groups",
+            json=[body.dict()], # The doc example suggests sending a list containing one group object
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
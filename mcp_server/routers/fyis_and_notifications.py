@@ -1,12 +1,13 @@
 # fyis_and_notifications.py
-from fastapi import APIRouter, Body, Path, Query
+from fastapi import APIRouter, Body, Path, Query, Depends
 from typing import List, Optional
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("fyis_and_notifications"))])
 
 # --- Pydantic Models for FYI Requests ---
 
@@ -41,19 +42,18 @@ class MarkReadRequest(BaseModel):
     summary="Get Unread Number of FYIs",
     description="Returns the total number of unread FYI notifications."
 )
-async def get_fyi_unread_number():
+async def get_fyi_unread_number(client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves the count of unread notifications.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/fyi/unreadnumber", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/fyi/unreadnumber", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/fyi/deliveryoptions",
@@ -61,19 +61,18 @@ async def get_fyi_unread_number():
     summary="Get FYI Delivery Options",
     description="Returns a list of all supported delivery options."
 )
-async def get_fyi_delivery_options():
+async def get_fyi_delivery_options(client: httpx.AsyncClient = Depends(get_client)):
     """
     Fetches the available FYI delivery options.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/fyi/deliveryoptions", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/fyi/deliveryoptions", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -82,19 +81,18 @@ async def get_fyi_delivery_options():
     summary="Enable/Disable FYI Delivery Options",
     description="Enables or disables a delivery option."
 )
-async def configure_fyi_delivery_options(body: DeliveryOptionsRequest = Body(...)):
+async def configure_fyi_delivery_options(body: DeliveryOptionsRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Enables or disables a specific FYI delivery option.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/fyi/deliveryoptions", json=body.dict(), timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(f"{BASE_URL}/fyi/deliveryoptions", json=body.dict(), timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.put(
@@ -103,19 +101,18 @@ async def configure_fyi_delivery_options(body: DeliveryOptionsRequest = Body(...
     summary="Enable Device Notifications",
     description="Enables or disables notifications for a specific device."
 )
-async def configure_device_delivery_options(body: DeviceDeliveryOptionsRequest = Body(...)):
+async def configure_device_delivery_options(body: DeviceDeliveryOptionsRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Configures FYI notifications for a specific device.
     """
-    async with create_client() as client:
-        try:
-            response = await client.put(f"{BASE_URL}/fyi/deliveryoptions/device", json=body.dict(), timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.put(f"{BASE_URL}/fyi/deliveryoptions/device", json=body.dict(), timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -124,19 +121,18 @@ async def configure_device_delivery_options(body: DeviceDeliveryOptionsRequest =
     summary="Get FYI Settings",
     description="Returns a list of disclaimer-type notifications."
 )
-async def get_fyi_settings(body: FYISettingsGetRequest = Body(...)):
+async def get_fyi_settings(body: FYISettingsGetRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves the settings for a list of disclaimer type notifications.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/fyi/settings", json=body.dict(), timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(f"{BASE_URL}/fyi/settings", json=body.dict(), timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.put(
@@ -147,20 +143,20 @@ async def get_fyi_settings(body: FYISettingsGetRequest = Body(...)):
 )
 async def configure_fyi_setting(
     typecode: str = Path(..., description="The FYI type code to configure."),
-    body: FYISettingsRequest = Body(...)
+    body: FYISettingsRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Enables or disables a specific FYI setting by its type code.
     """
-    async with create_client() as client:
-        try:
-            response = await client.put(f"{BASE_URL}/fyi/settings/{typecode}", json=body.dict(), timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.put(f"{BASE_URL}/fyi/settings/{typecode}", json=body.dict(), timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.delete(
@@ -169,22 +165,21 @@ async def configure_fyi_setting(
     summary="Mark Notifications as Read",
     description="Marks a list of notifications as read."
 )
-async def mark_notifications_as_read(body: MarkReadRequest = Body(...)):
+async def mark_notifications_as_read(body: MarkReadRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Marks one or more notifications as read by their IDs.
     Note: The documentation specifies using a DELETE method with a request body.
     """
-    async with create_client() as client:
-        try:
-            # Using request to handle DELETE with body, as httpx.delete doesn't directly support it.
-            request = client.build_request("DELETE", f"{BASE_URL}/fyi/notifications", json=body.dict())
-            response = await client.send(request, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        # Using request to handle DELETE with body, as httpx.delete doesn't directly support it.
+        request = client.build_request("DELETE", f"{BASE_URL}/fyi/notifications", json=body.dict())
+        response = await client.send(request, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -196,7 +191,8 @@ async def mark_notifications_as_read(body: MarkReadRequest = Body(...)):
 async def get_notifications(
     exclude: Optional[str] = Query(None, description="A comma-separated list of notification IDs to exclude from the response."),
     include: Optional[str] = Query(None, description="A comma-separated list of notification IDs to include in the response."),
-    max_count: int = Query(10, alias="max", description="The maximum number of notifications to return.")
+    max_count: int = Query(10, alias="max", description="The maximum number of notifications to return."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves a list of notifications, with options to filter and limit the results.
@@ -207,12 +203,11 @@ async def get_notifications(
     if include:
         params["include"] = include
         
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/fyi/notifications", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/fyi/notifications", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
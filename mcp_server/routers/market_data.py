@@ -1,12 +1,22 @@
 # market_data.py
-from fastapi import APIRouter, Query, Body, Path
-from typing import List, Dict, Any, Union, Optional
+from fastapi import APIRouter, Query, Body, Path, Depends
+from typing import List, Dict, Any, Union, Optional, Tuple
+import asyncio
+import re
+import time
 import httpx
 from pydantic import BaseModel, Field
-from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.config import BASE_URL, HMDS_RANGE_CONCURRENCY, HMDS_RANGE_MAX_WINDOWS
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error, handle_gateway_error
+from mcp_server.shaping import ResponseShape, response_shape
+from mcp_server.retry import retry_policy
+from mcp_server.snapshot import snapshot_engine, split_csv
+from mcp_server.streaming import market_data_stream
+from mcp_server.bars import columnar_history
+from mcp_server.hmds import hmds_session
+from mcp_server.bar_store import bar_store, read_through, duration_seconds, period_start, parse_start_time, format_start_time
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("market_data"))])
 
 # --- Pydantic Models ---
 
@@ -62,6 +72,83 @@ ISERVER_HISTORY_RULES = {
 }
 
 
+def _format_history(payload: Any, format: Optional[str], delta_time: bool) -> Any:
+    """Convert a history response to columnar bars when requested."""
+    if format == "columnar":
+        return columnar_history(payload, delta_time)
+    return payload
+
+
+async def _read_history(
+    client: httpx.AsyncClient,
+    path: str,
+    params: Dict[str, str],
+    start_time: Optional[str],
+    use_store: bool,
+    timeout: float,
+) -> Any:
+    """Fetch a history window, reading through the local bar store when it is enabled."""
+    async def fetch(period: str, fetch_start: Optional[str]) -> Any:
+        request_params = {**params, "period": period}
+        if fetch_start:
+            request_params["startTime"] = fetch_start
+        if path.startswith("/hmds"):
+            response = await hmds_session.get(client, f"{BASE_URL}{path}", params=request_params, timeout=timeout)
+        else:
+            response = await client.get(f"{BASE_URL}{path}", params=request_params, timeout=timeout)
+        response.raise_for_status()
+        return response.json()
+
+    if bar_store is None or not use_store:
+        return await fetch(params["period"], start_time)
+    key = "|".join([path] + [f"{name}={params.get(name, '')}" for name in ("conid", "bar", "barType", "outsideRth", "exchange")])
+    return await read_through(
+        bar_store, key, params["period"], params.get("bar"), start_time, path.startswith("/hmds"), fetch
+    )
+
+
+def _hmds_period_windows() -> List[Tuple[int, str, int, int]]:
+    """(period seconds, period, min bar seconds, max bar seconds) for each row of HMDS_HISTORY_RULES."""
+    windows = []
+    for period, units in HMDS_HISTORY_RULES["bar_units_by_period"].items():
+        match = re.search(r"\(([^)]+?)\s*->\s*([^)]+)\)", units)
+        bounds = (duration_seconds(match.group(1)), duration_seconds(match.group(2))) if match else (None, None)
+        if duration_seconds(period) and all(bounds):
+            windows.append((duration_seconds(period), period, *bounds))
+    return sorted(windows)
+
+
+HMDS_PERIOD_WINDOWS = _hmds_period_windows()
+
+
+def _plan_hmds_windows(bar: str, start_ms: int, end_ms: int) -> Tuple[Optional[str], List[int]]:
+    """Pick the longest HMDS period that allows `bar` and return it with the end time of each window.
+
+    Windows are laid back-to-back from the range end, since startTime anchors
+    the end of an HMDS period. Each step goes back by the period on the
+    calendar (see period_start), as the gateway counts months and years, so
+    every window starts exactly where the previous one ends. The earliest
+    window may reach before the range start and is trimmed when the series
+    is stitched.
+    """
+    bar_seconds = duration_seconds(bar)
+    allowed = [w for w in HMDS_PERIOD_WINDOWS if bar_seconds and w[2] <= bar_seconds <= w[3]]
+    if not allowed:
+        return None, []
+    period = allowed[-1][1]
+    windows: List[Tuple[int, int]] = []
+    window_end = end_ms
+    while window_end > start_ms and len(windows) <= HMDS_RANGE_MAX_WINDOWS:
+        window_start = period_start(period, window_end)
+        if window_start is None or window_start >= window_end:
+            return None, []
+        windows.append((window_start, window_end))
+        window_end = window_start
+    if any(earlier[1] != later[0] for later, earlier in zip(windows, windows[1:])):
+        raise ValueError(f"HMDS window plan for '{period}' has gaps")
+    return period, [end for _, end in windows]
+
+
 # --- Market Data Router Endpoints ---
 
 @router.get(
@@ -109,23 +196,38 @@ async def get_iserver_history_rules() -> Dict[str, Any]:
 )
 async def get_marketdata_snapshot(
     conids: str = Query(..., description="A comma-separated list of contract IDs."),
-    fields: str = Query(..., description="A comma-separated list of field codes.")
-) -> List[Dict[str, Any]]:
+    fields: str = Query(..., description="A comma-separated list of field codes."),
+    maxAge: Optional[float] = Query(None, ge=0, description="Answer from streamed data (see /stream/marketdata/subscribe) for conids updated within this many seconds, without calling the gateway. Other conids are fetched as usual."),
+    client: httpx.AsyncClient = Depends(get_client)
+) -> Union[List[Dict[str, Any]], Dict[str, Any]]:
     """
     ### Get Market Data Snapshot
-    Fetches a snapshot of market data. This endpoint is called twice internally to ensure data retrieval.
+    Fetches a snapshot of market data. Conids that are not yet subscribed are primed by the first
+    request and re-read only if requested fields are still missing; already primed conids take a single call.
+    Long conid lists are split into SNAPSHOT_CHUNK_SIZE chunks fetched concurrently; conids of a chunk that
+    failed come back as {"conid", "error"} rows in their place.
+    With maxAge, streamed conids whose quote table row is recent enough and has every requested field are
+    answered from memory (marked "_source": "stream"); only the rest go to the gateway.
     """
-    params = {"conids": conids, "fields": fields}
-    async with create_client() as client:
-        try:
-            await client.get(f"{BASE_URL}/iserver/marketdata/snapshot", params=params, timeout=10)
-            response = await client.get(f"{BASE_URL}/iserver/marketdata/snapshot", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    conid_list, field_list = split_csv(conids), split_csv(fields)
+    streamed: Dict[str, Dict[str, Any]] = {}
+    if maxAge is not None:
+        for conid in conid_list:
+            row = market_data_stream.quotes.read_fresh(conid, field_list, maxAge)
+            if row is not None:
+                streamed[conid] = {**row, "_source": "stream"}
+        if len(streamed) == len(conid_list):
+            return [streamed[conid] for conid in conid_list]
+    try:
+        if not streamed:
+            return await snapshot_engine.fetch(client, conid_list, field_list)
+        fetched = await snapshot_engine.fetch(client, [conid for conid in conid_list if conid not in streamed], field_list)
+        by_conid = {str(row.get("conid")): row for row in fetched}
+        return [streamed.get(conid) or by_conid[conid] for conid in conid_list if conid in streamed or conid in by_conid]
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/md/snapshot",
@@ -135,20 +237,20 @@ async def get_marketdata_snapshot(
 )
 async def get_md_snapshot(
     conids: str = Query(..., description="A comma-separated list of contract IDs."),
-    fields: Optional[str] = Query(None, description="A comma-separated list of field codes.")
+    fields: Optional[str] = Query(None, description="A comma-separated list of field codes."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     params = {"conids": conids}
     if fields:
         params["fields"] = fields
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/md/snapshot", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/md/snapshot", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -163,7 +265,12 @@ async def get_marketdata_history(
     bar: Optional[str] = Query(None, description="The bar size, e.g., '1min', '1h'."),
     exchange: Optional[str] = Query(None, description="The exchange to query."),
     outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
-    barType: Optional[str] = Query("trades", description="The type of data to return, e.g., 'trades', 'midpoint'.")
+    barType: Optional[str] = Query("trades", description="The type of data to return, e.g., 'trades', 'midpoint'."),
+    format: Optional[str] = Query("rows", description="'rows' for the gateway's one-object-per-bar format, or 'columnar' for parallel arrays per bar field."),
+    deltaTime: bool = Query(False, description="With format=columnar, encode timestamps as the first value followed by differences."),
+    useStore: bool = Query(True, description="Serve already-fetched bars from the local bar store and only fetch the missing part of the window. Set to false to always query the gateway."),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     params = {
         "conid": conid,
@@ -176,15 +283,13 @@ async def get_marketdata_history(
         params["exchange"] = exchange
     if barType:
         params["barType"] = barType
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/marketdata/history", params=params, timeout=20)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        payload = await _read_history(client, "/iserver/marketdata/history", params, None, useStore, timeout=20)
+        return _format_history(shape.apply(payload), format, deltaTime)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -199,10 +304,17 @@ async def get_hmds_history(
     bar: Optional[str] = Query(None, description="The bar size. Note: allowed units depend on the period."),
     outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
     barType: Optional[str] = Query("trades", description="The type of data to return."),
-    startTime: Optional[str] = Query(None, description="Specify the start time of the query in 'YYYYMMDD-hh:mm:ss' format.")
+    startTime: Optional[str] = Query(None, description="Specify the start time of the query in 'YYYYMMDD-hh:mm:ss' format."),
+    format: Optional[str] = Query("rows", description="'rows' for the gateway's one-object-per-bar format, or 'columnar' for parallel arrays per bar field."),
+    deltaTime: bool = Query(False, description="With format=columnar, encode timestamps as the first value followed by differences."),
+    useStore: bool = Query(True, description="Serve already-fetched bars from the local bar store and only fetch the missing part of the window. Set to false to always query the gateway."),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
-    Fetches deeper historical market data using the HMDS. It first calls /hmds/auth/init to authenticate the session.
+    Fetches deeper historical market data using the HMDS. The HMDS session is initialized once and
+    re-initialized only when it expires or the gateway rejects a request.
+    Bars already in the local bar store are reused; only the uncovered part of the window is requested.
     """
     params = {
         "conid": conid,
@@ -213,18 +325,94 @@ async def get_hmds_history(
         params["bar"] = bar
     if barType:
         params["barType"] = barType
-    if startTime:
-        params["startTime"] = startTime
-    async with create_client() as client:
-        try:
-            await client.get(f"{BASE_URL}/hmds/auth/init", timeout=10)
-            response = await client.get(f"{BASE_URL}/hmds/history", params=params, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        payload = await _read_history(client, "/hmds/history", params, startTime, useStore, timeout=30)
+        return _format_history(shape.apply(payload), format, deltaTime)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+@router.get(
+    "/hmds/history/range",
+    tags=["Market Data"],
+    summary="Long-Range HMDS History",
+    description="Get HMDS bars for an arbitrary start/end range. The range is split into windows that satisfy `/hmds/history/rules`, fetched concurrently and stitched into one de-duplicated series."
+)
+async def get_hmds_history_range(
+    conid: str = Query(..., description="The contract ID."),
+    bar: str = Query(..., description="The bar size, e.g. '1min', '5mins', '1h', '1d'."),
+    start: str = Query(..., description="Start of the range in 'YYYYMMDD-hh:mm:ss' format (UTC)."),
+    end: Optional[str] = Query(None, description="End of the range in 'YYYYMMDD-hh:mm:ss' format (UTC). Defaults to now."),
+    outsideRth: Optional[bool] = Query(False, description="Set to true to include data outside regular trading hours."),
+    barType: Optional[str] = Query("trades", description="The type of data to return."),
+    format: Optional[str] = Query("rows", description="'rows' for the gateway's one-object-per-bar format, or 'columnar' for parallel arrays per bar field."),
+    deltaTime: bool = Query(False, description="With format=columnar, encode timestamps as the first value followed by differences."),
+    useStore: bool = Query(True, description="Serve already-fetched bars from the local bar store. Set to false to always query the gateway."),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    """
+    Plans the period/startTime windows for a long range, fetches them under HMDS_RANGE_CONCURRENCY
+    and merges the bars by timestamp. Windows that fail are reported under "errors".
+    """
+    try:
+        start_ms = parse_start_time(start)
+        end_ms = parse_start_time(end) if end else int(time.time() * 1000)
+    except ValueError:
+        return {"error": "Invalid time", "detail": "start and end must use the 'YYYYMMDD-hh:mm:ss' format."}
+    if start_ms >= end_ms:
+        return {"error": "Invalid range", "detail": "start must be before end."}
+
+    period, window_ends = _plan_hmds_windows(bar, start_ms, end_ms)
+    if period is None:
+        return {"error": "Invalid bar size", "detail": f"No HMDS period allows bar '{bar}'. See /hmds/history/rules."}
+    if len(window_ends) > HMDS_RANGE_MAX_WINDOWS:
+        return {
+            "error": "Range too large",
+            "detail": f"Bar '{bar}' needs more than {HMDS_RANGE_MAX_WINDOWS} '{period}' windows for this range. Use a larger bar or a shorter range."
+        }
+
+    params = {"conid": conid, "period": period, "bar": bar, "outsideRth": str(outsideRth).lower()}
+    if barType:
+        params["barType"] = barType
+    semaphore = asyncio.Semaphore(HMDS_RANGE_CONCURRENCY)
+
+    async def fetch_window(window_end: int) -> Any:
+        async with semaphore:
+            return await _read_history(client, "/hmds/history", params, format_start_time(window_end), useStore, timeout=30)
+
+    try:
+        await hmds_session.ensure(client)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+    results = await asyncio.gather(*(fetch_window(window_end) for window_end in window_ends), return_exceptions=True)
+
+    merged: Dict[int, Dict[str, Any]] = {}
+    meta: Dict[str, Any] = {}
+    errors = []
+    for window_end, result in zip(window_ends, results):
+        if isinstance(result, (httpx.HTTPStatusError, httpx.RequestError)):
+            errors.append({"startTime": format_start_time(window_end), **handle_gateway_error(result)})
+        elif isinstance(result, BaseException):
+            raise result
+        elif isinstance(result, dict):
+            if not meta:
+                meta = {key: value for key, value in result.items() if key != "data"}
+            for item in result.get("data") or []:
+                if isinstance(item, dict) and start_ms <= item.get("t", -1) <= end_ms:
+                    merged[item["t"]] = item
+
+    if errors and not merged:
+        return {"error": "All history windows failed", "detail": errors[0].get("detail"), "errors": errors}
+    payload = {**meta, "data": [merged[t] for t in sorted(merged)], "windows": len(window_ends), "period": period}
+    if "points" in payload:
+        payload["points"] = len(merged)
+    if errors:
+        payload["errors"] = errors
+    return _format_history(shape.apply(payload), format, deltaTime)
 
 @router.post(
     "/iserver/marketdata/unsubscribe",
@@ -232,16 +420,16 @@ async def get_hmds_history(
     summary="Unsubscribe from Market Data",
     description="Unsubscribes from a specific market data feed."
 )
-async def unsubscribe_market_data(body: UnsubscribeRequest = Body(...)):
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/iserver/marketdata/unsubscribe", json=body.dict(), timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+async def unsubscribe_market_data(body: UnsubscribeRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    try:
+        response = await client.post(f"{BASE_URL}/iserver/marketdata/unsubscribe", json=body.dict(), timeout=10)
+        response.raise_for_status()
+        snapshot_engine.forget(body.conid)
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -250,13 +438,13 @@ async def unsubscribe_market_data(body: UnsubscribeRequest = Body(...)):
     summary="Unsubscribe from All Market Data",
     description="Unsubscribes from all current market data subscriptions."
 )
-async def unsubscribe_all_market_data():
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/iserver/marketdata/unsubscribeall", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+async def unsubscribe_all_market_data(client: httpx.AsyncClient = Depends(get_client)):
+    try:
+        response = await client.post(f"{BASE_URL}/iserver/marketdata/unsubscribeall", timeout=10)
+        response.raise_for_status()
+        snapshot_engine.forget_all()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
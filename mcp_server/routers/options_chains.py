@@ -1,11 +1,16 @@
 # options_chains.py
-from fastapi import APIRouter, Query
-from typing import Optional
+from dataclasses import dataclass
+from fastapi import APIRouter, Query, Depends
+from typing import Any, Dict, List, Optional
 import httpx
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.option_chain import LEG_FIELDS, ChainError, build_chain, snapshot_chain
+from mcp_server.shaping import ResponseShape, response_shape
+from mcp_server.snapshot import split_csv
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("options_chains"))])
 
 # --- Options Chains Router Endpoints ---
 
@@ -21,7 +26,9 @@ async def get_options_chains(
     strike: Optional[float] = Query(None, description="The strike price."),
     right: Optional[str] = Query(None, description="The option right: 'C' for Call or 'P' for Put."),
     exchange: Optional[str] = Query(None, description="The exchange to query. Defaults to SMART."),
-    chainType: Optional[str] = Query(None, description="The type of chain to return: 'CALL' or 'PUT'.")
+    chainType: Optional[str] = Query(None, description="The type of chain to return: 'CALL' or 'PUT'."),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches the option chain for a given underlying symbol. You can filter the results by expiration, strike, right, and exchange.
@@ -38,12 +45,134 @@ async def get_options_chains(
     if chainType:
         params["chainType"] = chainType
 
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/trsrv/secdef/chains", params=params, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/trsrv/secdef/chains", params=params, timeout=30)
+        response.raise_for_status()
+        return shape.apply(response.json())
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+
+@dataclass(frozen=True)
+class ChainQuery:
+    """Which underlying, months, rights and strikes an option chain endpoint should cover."""
+    symbol: str
+    conid: Optional[int]
+    months: Optional[List[str]]
+    max_months: int
+    sec_type: str
+    exchange: Optional[str]
+    rights: List[str]
+    strike_count: Optional[int]
+    strike_range: Optional[float]
+    price: Optional[float]
+    refresh: bool
+
+    async def build(self, client: httpx.AsyncClient) -> Dict[str, Any]:
+        return await build_chain(
+            client,
+            self.symbol,
+            conid=self.conid,
+            months=self.months,
+            max_months=self.max_months,
+            sec_type=self.sec_type,
+            exchange=self.exchange,
+            rights=self.rights,
+            strike_count=self.strike_count,
+            strike_range=self.strike_range,
+            price=self.price,
+            refresh=self.refresh,
+        )
+
+
+def chain_query(
+    symbol: str = Query(..., description="The underlying symbol (e.g., AAPL)."),
+    conid: Optional[int] = Query(None, description="The underlying conid, to pick one of several contracts matching the symbol."),
+    months: Optional[str] = Query(None, description="Comma-separated option months (e.g., 'JAN25,FEB25'). Defaults to the nearest maxMonths."),
+    maxMonths: int = Query(1, ge=1, le=12, description="How many of the nearest months to include when months is not given."),
+    secType: str = Query("OPT", description="OPT for options or FOP for futures options."),
+    exchange: Optional[str] = Query(None, description="The exchange to query. Defaults to SMART."),
+    rights: str = Query("C,P", pattern=r"^\s*[CPcp]\s*(,\s*[CPcp]\s*)?$", description="Comma-separated rights to include: C, P or both."),
+    strikeCount: int = Query(10, ge=0, description="Strikes kept on each side of the underlying price. 0 keeps every strike."),
+    strikeRange: Optional[float] = Query(None, gt=0, description="Only keep strikes within this fraction of the underlying price (e.g., 0.1 for +/-10%)."),
+    underlyingPrice: Optional[float] = Query(None, description="Center the strike window on this price instead of the last traded price."),
+    refresh: bool = Query(False, description="Bypass the cached months, strikes and conids."),
+) -> ChainQuery:
+    """FastAPI dependency that adds the option chain selection query parameters to an endpoint."""
+    return ChainQuery(
+        symbol=symbol,
+        conid=conid,
+        months=split_csv(months) if months else None,
+        max_months=maxMonths,
+        sec_type=secType.upper(),
+        exchange=exchange,
+        rights=split_csv(rights.upper()),
+        strike_count=strikeCount or None,
+        strike_range=strikeRange,
+        price=underlyingPrice,
+        refresh=refresh,
+    )
+
+
+@router.get(
+    "/options/chain",
+    tags=["Options Chains"],
+    summary="Build Option Chain",
+    description=(
+        "Builds an option chain for an underlying in one call: resolves the option months, the strikes of each month "
+        "and the option conid of every strike/right concurrently, all cached. Returns a compact grid where "
+        "calls[i][j] and puts[i][j] are the conids for strikes[i] and expirations[j] (null if none). By default only "
+        "the strikeCount strikes on either side of the underlying's last price are kept."
+    )
+)
+async def build_option_chain(
+    query: ChainQuery = Depends(chain_query),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    """
+    Builds a strike x expiration grid of option conids, ready for /iserver/marketdata/snapshot or order placement.
+    """
+    try:
+        return await query.build(client)
+    except ChainError as exc:
+        return {"error": "Could not build option chain", "detail": str(exc)}
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+@router.get(
+    "/options/chain/snapshot",
+    tags=["Options Chains"],
+    summary="Option Chain Snapshot",
+    description=(
+        "Builds an option chain like /options/chain and snapshots every leg in concurrent batches. Returns a "
+        "columnar table (one list per column: expiry, strike, right, conid and the requested fields, parsed to "
+        "numbers) plus a summary with put/call volume and open interest ratios and ATM implied volatility, "
+        f"overall and per expiration. Available fields: {', '.join(LEG_FIELDS)}."
+    )
+)
+async def get_option_chain_snapshot(
+    query: ChainQuery = Depends(chain_query),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to snapshot for each leg. Defaults to all available fields."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    """
+    Quotes a whole option chain (prices, greeks, IV, volume, open interest) in one call.
+    """
+    columns = split_csv(fields) or list(LEG_FIELDS)
+    unknown = [column for column in columns if column not in LEG_FIELDS]
+    if unknown:
+        return {"error": "Unknown fields", "detail": f"Unknown fields {', '.join(unknown)}. Available: {', '.join(LEG_FIELDS)}."}
+    try:
+        return await snapshot_chain(client, await query.build(client), columns)
+    except ChainError as exc:
+        return {"error": "Could not build option chain", "detail": str(exc)}
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
@@ -1,11 +1,15 @@
 # order_monitoring.py
-from fastapi import APIRouter, Query, Path
+from fastapi import APIRouter, Query, Path, Depends
 from typing import Optional
 import httpx
-from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.config import BASE_URL, ORDER_WAIT_MAX_TIMEOUT
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.order_events import TERMINAL_STATUSES, order_book
+from mcp_server.shaping import ResponseShape, response_shape
+from mcp_server.snapshot import split_csv
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("order_monitoring"))])
 
 # --- Order Monitoring Router Endpoints ---
 
@@ -23,7 +27,9 @@ async def get_live_orders(
     force: Optional[bool] = Query(
         default=False,
         description="Set to true to clear the cache of orders and fetch an updated list."
-    )
+    ),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches all live orders from the IBKR API. This endpoint provides a comprehensive view of order activity.
@@ -34,15 +40,14 @@ async def get_live_orders(
     if force:
         params["force"] = str(force).lower()
 
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/orders", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/orders", params=params, timeout=10)
+        response.raise_for_status()
+        return shape.apply(response.json())
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -52,20 +57,20 @@ async def get_live_orders(
     description="Retrieves the status of a single order by its order ID."
 )
 async def get_order_status(
-    orderId: str = Path(..., description="The order ID of the order to check.")
+    orderId: str = Path(..., description="The order ID of the order to check."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches the latest status for a specific order. This is useful for tracking the lifecycle of an individual order.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/order/status/{orderId}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/order/status/{orderId}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -75,7 +80,9 @@ async def get_order_status(
     description="Returns a list of trades for the currently selected account for the current and previous six days."
 )
 async def get_trades(
-    days: Optional[str] = Query(None, description="Number of days to retrieve trades for, up to a maximum of 7.")
+    days: Optional[str] = Query(None, description="Number of days to retrieve trades for, up to a maximum of 7."),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves a list of recent trades, providing a history of executed orders.
@@ -84,12 +91,59 @@ async def get_trades(
     if days:
         params["days"] = days
         
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/trades", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/trades", params=params, timeout=10)
+        response.raise_for_status()
+        return shape.apply(response.json())
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+@router.get(
+    "/stream/orders",
+    tags=["Order Monitoring"],
+    summary="Streamed Order Book",
+    description=(
+        "Returns the orders reported by the gateway's order WebSocket topic, keyed by orderId, with the status "
+        "transitions seen for each, plus the latest streamed PnL. Reading it costs no gateway call; the first call "
+        "starts the order stream."
+    )
+)
+async def get_streamed_orders(
+    orderId: Optional[str] = Query(None, description="Only return this order."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    await order_book.start(client)
+    if orderId:
+        return order_book.snapshot(orderId)
+    return {
+        "orders": [order_book.snapshot(order_id) for order_id in order_book.orders],
+        "pnl": order_book.pnl,
+    }
+
+
+@router.get(
+    "/stream/orders/{orderId}/wait",
+    tags=["Order Monitoring"],
+    summary="Wait for Order Status",
+    description=(
+        "Blocks until the order reaches one of the given statuses or the timeout passes, reacting to the gateway's "
+        "order WebSocket topic instead of polling. Returns the order, its status transitions and whether the status "
+        "was matched. Use this instead of calling /iserver/account/orders or the order status endpoint in a loop."
+    )
+)
+async def wait_for_order_status(
+    orderId: str = Path(..., description="The order ID to wait on."),
+    status: Optional[str] = Query(None, description="Comma-separated statuses to wait for (e.g. 'Filled,Cancelled'). Defaults to any final status: Filled, Cancelled or Inactive."),
+    timeout: float = Query(30, gt=0, le=ORDER_WAIT_MAX_TIMEOUT, description=f"Seconds to wait at most (up to {ORDER_WAIT_MAX_TIMEOUT:g})."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    statuses = split_csv(status) or TERMINAL_STATUSES
+    try:
+        return await order_book.wait_for(client, orderId, statuses, timeout)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
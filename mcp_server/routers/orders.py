@@ -1,12 +1,16 @@
 # orders.py
-from fastapi import APIRouter, Query, Body, Path
-from typing import Optional, List, Dict, Any
+import asyncio
+import time
+from fastapi import APIRouter, Query, Body, Path, Depends
+from typing import Optional, List, Dict, Any, Awaitable, Callable
 import httpx
 from pydantic import BaseModel, Field
-from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.config import BASE_URL, ORDER_BATCH_CONCURRENCY, ORDER_BATCH_MAX_ORDERS
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.order_replies import auto_reply_policy, reply_prompts
+from mcp_server.retry import NO_RETRY, retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("orders", NO_RETRY))])
 
 # --- Pydantic Models for Order Requests ---
 
@@ -54,6 +58,122 @@ class ReplyRequest(BaseModel):
     confirmed: bool = Field(..., description="Set to true to confirm and submit the order.")
 
 
+class BulkPlaceItem(BaseModel):
+    """One placement in a bulk request: a single order, or a bracket/OCA group placed in one call."""
+    accountId: str = Field(..., description="The account ID to place the order(s) for.")
+    orders: List[OrderModel] = Field(..., min_length=1, description="The order, or the orders of one bracket/OCA group.")
+
+
+class BulkPlaceRequest(BaseModel):
+    """Request model for placing many orders, across accounts, in one call."""
+    items: List[BulkPlaceItem] = Field(..., min_length=1, description="The placements to submit.")
+    autoReply: bool = Field(False, description="Confirm whitelisted confirmation prompts server-side, as with place_order's autoReply.")
+
+
+class BulkModifyItem(BaseModel):
+    """One modification in a bulk request."""
+    accountId: str = Field(..., description="The account ID of the order.")
+    orderId: str = Field(..., description="The order ID of the order to modify.")
+    order: OrderModel = Field(..., description="The updated order details.")
+
+
+class BulkModifyRequest(BaseModel):
+    """Request model for modifying many orders in one call."""
+    items: List[BulkModifyItem] = Field(..., min_length=1, description="The modifications to submit.")
+    autoReply: bool = Field(False, description="Confirm whitelisted confirmation prompts server-side, as with modify_order's autoReply.")
+
+
+class BulkCancelItem(BaseModel):
+    """One cancellation in a bulk request."""
+    accountId: str = Field(..., description="The account ID of the order.")
+    orderId: str = Field(..., description="The order ID of the order to cancel.")
+
+
+class BulkCancelRequest(BaseModel):
+    """Request model for cancelling many orders in one call."""
+    items: List[BulkCancelItem] = Field(..., min_length=1, description="The orders to cancel.")
+
+
+class CancelMatchingRequest(BaseModel):
+    """Request model for cancelling every live order that matches a filter."""
+    accountId: Optional[str] = Field(None, description="Only cancel orders of this account.")
+    conids: Optional[List[int]] = Field(None, description="Only cancel orders for these contract IDs.")
+    tickers: Optional[List[str]] = Field(None, description="Only cancel orders for these ticker symbols.")
+    side: Optional[str] = Field(None, description="Only cancel BUY or SELL orders.")
+    orderType: Optional[str] = Field(None, description="Only cancel orders of this type, e.g. LMT.")
+    statuses: List[str] = Field(["PendingSubmit", "PreSubmitted", "Submitted"], description="Only cancel orders in these statuses.")
+    dryRun: bool = Field(False, description="Set to true to only list the matching orders without cancelling them.")
+
+
+AUTO_REPLY_DESCRIPTION = (
+    "Confirm whitelisted confirmation prompts (ORDER_AUTO_REPLY_MESSAGE_IDS) server-side, up to "
+    "ORDER_AUTO_REPLY_MAX_DEPTH in a row. The response becomes {result, auto_confirmed, pending}; "
+    "pending is true when a prompt still needs /iserver/reply. If a reply fails, the error is returned with the "
+    "prompts already confirmed."
+)
+
+
+def _auto_reply_unavailable() -> Optional[dict]:
+    if not auto_reply_policy.message_ids:
+        return {"error": "Auto-reply is not configured", "detail": "Set ORDER_AUTO_REPLY_MESSAGE_IDS to the message ids that may be confirmed automatically."}
+    return None
+
+
+def _gateway_error(result: Any) -> bool:
+    """Order endpoints report some rejections as a 200 response with an 'error' field."""
+    return isinstance(result, dict) and "error" in result
+
+
+async def _order_outcome(client: httpx.AsyncClient, response: httpx.Response, auto_reply: bool) -> Dict[str, Any]:
+    response.raise_for_status()
+    if auto_reply:
+        outcome = await auto_reply_policy.resolve(client, response.json())
+    else:
+        result = response.json()
+        outcome = {"result": result, "pending": bool(reply_prompts(result))}
+    return {"ok": "error" not in outcome and not _gateway_error(outcome["result"]), **outcome}
+
+
+async def _run_bulk(
+    items: List[BaseModel],
+    describe: Callable[[Any], Dict[str, Any]],
+    submit: Callable[[Any], Awaitable[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """Submit items concurrently (ORDER_BATCH_CONCURRENCY at a time, paced by the orders rate lane), one result per item, in order."""
+    semaphore = asyncio.Semaphore(ORDER_BATCH_CONCURRENCY)
+
+    async def run(index: int, item: Any) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                outcome = await submit(item)
+            except httpx.HTTPStatusError as exc:
+                outcome = {"ok": False, **handle_http_error(exc)}
+            except httpx.RequestError as exc:
+                outcome = {"ok": False, **handle_request_error(exc)}
+            except Exception as exc:
+                # E.g. a 200 that is not JSON: the order may have reached the gateway, so report it on this item
+                # instead of failing the whole batch after other orders were sent.
+                outcome = {"ok": False, "error": "Unexpected gateway response", "detail": f"{type(exc).__name__}: {exc}"}
+        return {"index": index, **describe(item), **outcome}
+
+    results = await asyncio.gather(*(run(index, item) for index, item in enumerate(items)))
+    return {
+        "results": results,
+        "stats": {
+            "requested": len(results),
+            "succeeded": sum(1 for result in results if result["ok"]),
+            "failed": sum(1 for result in results if not result["ok"]),
+            "pending_replies": sum(1 for result in results if result.get("pending")),
+        },
+    }
+
+
+def _too_many(count: int) -> Optional[dict]:
+    if count > ORDER_BATCH_MAX_ORDERS:
+        return {"error": "Too many orders", "detail": f"At most {ORDER_BATCH_MAX_ORDERS} orders can be submitted in one batch."}
+    return None
+
+
 # --- Orders Router Endpoints ---
 
 @router.post(
@@ -64,24 +184,29 @@ class ReplyRequest(BaseModel):
 )
 async def place_order(
     accountId: str = Path(..., description="The account ID to place the order for."),
-    body: OrdersRequest = Body(...)
+    body: OrdersRequest = Body(...),
+    autoReply: bool = Query(False, description=AUTO_REPLY_DESCRIPTION),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Places one or more orders for the specified account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/orders",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    if autoReply and (error := _auto_reply_unavailable()):
+        return error
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{accountId}/orders",
+            json=body.dict(exclude_none=True),
+            timeout=10
+        )
+        response.raise_for_status()
+        if autoReply:
+            return await auto_reply_policy.resolve(client, response.json())
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -92,24 +217,24 @@ async def place_order(
 )
 async def preview_order(
     accountId: str = Path(..., description="The account ID for the what-if analysis."),
-    body: OrdersRequest = Body(...)
+    body: OrdersRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Previews an order to see its potential impact on the account before placing it.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/orders/whatif",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{accountId}/orders/whatif",
+            json=body.dict(exclude_none=True),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -121,24 +246,29 @@ async def preview_order(
 async def modify_order(
     accountId: str = Path(..., description="The account ID of the order."),
     orderId: str = Path(..., description="The order ID of the order to modify."),
-    body: OrderModel = Body(...)
+    body: OrderModel = Body(...),
+    autoReply: bool = Query(False, description=AUTO_REPLY_DESCRIPTION),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Modifies an existing active order. The request body should contain the updated order details.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/order/{orderId}",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    if autoReply and (error := _auto_reply_unavailable()):
+        return error
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{accountId}/order/{orderId}",
+            json=body.dict(exclude_none=True),
+            timeout=10
+        )
+        response.raise_for_status()
+        if autoReply:
+            return await auto_reply_policy.resolve(client, response.json())
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.delete(
@@ -149,23 +279,23 @@ async def modify_order(
 )
 async def cancel_order(
     accountId: str = Path(..., description="The account ID of the order."),
-    orderId: str = Path(..., description="The order ID of the order to cancel.")
+    orderId: str = Path(..., description="The order ID of the order to cancel."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Cancels an active order by its ID.
     """
-    async with create_client() as client:
-        try:
-            response = await client.delete(
-                f"{BASE_URL}/iserver/account/{accountId}/order/{orderId}",
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.delete(
+            f"{BASE_URL}/iserver/account/{accountId}/order/{orderId}",
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -176,21 +306,151 @@ async def cancel_order(
 )
 async def place_order_reply(
     replyId: str = Path(..., description="The ID of the message to reply to."),
-    body: ReplyRequest = Body(...)
+    body: ReplyRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Confirms an order that requires a secondary confirmation (e.g., due to price or size constraints).
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/reply/{replyId}",
-                json=body.dict(),
-                timeout=10
-            )
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/reply/{replyId}",
+            json=body.dict(),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+@router.post(
+    "/batch/orders/place",
+    tags=["Orders"],
+    summary="Bulk Place Orders",
+    description=(
+        "Places many orders, across accounts, in one call. Each item is one order or one bracket/OCA group and is "
+        "placed with its own gateway call; items are submitted concurrently under the order rate limit. Returns one "
+        "result per item, in order, with 'ok', the gateway response and 'pending' when a confirmation prompt still "
+        "needs /iserver/reply (see autoReply)."
+    )
+)
+async def bulk_place_orders(body: BulkPlaceRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    if error := _too_many(sum(len(item.orders) for item in body.items)):
+        return error
+    if body.autoReply and (error := _auto_reply_unavailable()):
+        return error
+
+    async def submit(item: BulkPlaceItem) -> Dict[str, Any]:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{item.accountId}/orders",
+            json={"orders": [order.model_dump(exclude_none=True) for order in item.orders]},
+            timeout=10
+        )
+        return await _order_outcome(client, response, body.autoReply)
+
+    return await _run_bulk(body.items, lambda item: {"accountId": item.accountId}, submit)
+
+
+@router.post(
+    "/batch/orders/modify",
+    tags=["Orders"],
+    summary="Bulk Modify Orders",
+    description="Modifies many open orders in one call, concurrently under the order rate limit. Returns one result per item, in order."
+)
+async def bulk_modify_orders(body: BulkModifyRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    if error := _too_many(len(body.items)):
+        return error
+    if body.autoReply and (error := _auto_reply_unavailable()):
+        return error
+
+    async def submit(item: BulkModifyItem) -> Dict[str, Any]:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{item.accountId}/order/{item.orderId}",
+            json=item.order.model_dump(exclude_none=True),
+            timeout=10
+        )
+        return await _order_outcome(client, response, body.autoReply)
+
+    return await _run_bulk(body.items, lambda item: {"accountId": item.accountId, "orderId": item.orderId}, submit)
+
+
+async def _cancel_all(client: httpx.AsyncClient, items: List[BulkCancelItem]) -> Dict[str, Any]:
+    async def submit(item: BulkCancelItem) -> Dict[str, Any]:
+        response = await client.delete(f"{BASE_URL}/iserver/account/{item.accountId}/order/{item.orderId}", timeout=10)
+        return await _order_outcome(client, response, False)
+
+    return await _run_bulk(items, lambda item: {"accountId": item.accountId, "orderId": item.orderId}, submit)
+
+
+@router.post(
+    "/batch/orders/cancel",
+    tags=["Orders"],
+    summary="Bulk Cancel Orders",
+    description="Cancels many open orders in one call, concurrently under the order rate limit. Returns one result per item, in order."
+)
+async def bulk_cancel_orders(body: BulkCancelRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    if error := _too_many(len(body.items)):
+        return error
+    return await _cancel_all(client, body.items)
+
+
+@router.post(
+    "/batch/orders/cancel-matching",
+    tags=["Orders"],
+    summary="Cancel Orders Matching a Filter",
+    description=(
+        "Reads the live orders (/iserver/account/orders) and cancels every one matching the filter: account, "
+        "conids, tickers, side, order type and status (open statuses by default). With dryRun=true only lists the "
+        "matching orders. Returns the matched orders, one cancellation result per order, and stats with the "
+        "order list reads and the elapsed seconds."
+    )
+)
+async def cancel_matching_orders(body: CancelMatchingRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    started = time.monotonic()
+    params = {"filters": ",".join(body.statuses)}
+    reads = 1
+    try:
+        # force=true bypasses the gateway's cached order list, which can miss orders placed moments ago.
+        # While the gateway is still building that list it answers with "snapshot": false; only then is it
+        # read once more (the list endpoint is paced at one call per 5 seconds, so an empty list is trusted).
+        response = await client.get(f"{BASE_URL}/iserver/account/orders", params={**params, "force": "true"}, timeout=10)
+        response.raise_for_status()
+        payload = response.json()
+        if isinstance(payload, dict) and payload.get("snapshot") is False:
+            reads += 1
+            response = await client.get(f"{BASE_URL}/iserver/account/orders", params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+            payload = response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+    statuses = {status.lower() for status in body.statuses}
+    conids = set(body.conids or [])
+    tickers = {ticker.upper() for ticker in body.tickers or []}
+    matched = [
+        order for order in (payload.get("orders") if isinstance(payload, dict) else None) or []
+        if str(order.get("status", "")).lower() in statuses
+        and (body.accountId is None or order.get("acct") == body.accountId)
+        and (not conids or order.get("conid") in conids)
+        and (not tickers or str(order.get("ticker", "")).upper() in tickers)
+        and (body.side is None or str(order.get("side", "")).upper() == body.side.upper())
+        and (body.orderType is None or str(order.get("orderType", "")).upper() == body.orderType.upper())
+    ]
+    summary = [
+        {key: order.get(key) for key in ("acct", "orderId", "conid", "ticker", "side", "orderType", "status", "remainingQuantity")}
+        for order in matched
+    ]
+    if body.dryRun or not matched:
+        result = {"results": [], "stats": {"requested": 0, "succeeded": 0, "failed": 0, "pending_replies": 0}}
+    elif error := _too_many(len(matched)):
+        return {"matched": summary, **error}
+    else:
+        items = [BulkCancelItem(accountId=order["acct"], orderId=str(order["orderId"])) for order in matched]
+        result = await _cancel_all(client, items)
+    result["stats"].update({"order_list_reads": reads, "elapsed_seconds": round(time.monotonic() - started, 3)})
+    return {"matched": summary, **result}
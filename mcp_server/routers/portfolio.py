@@ -1,12 +1,18 @@
 # portfolio.py
-from fastapi import APIRouter, Body, Path, Query
-from typing import List, Optional
+import asyncio
+import json
+from fastapi import APIRouter, Body, Path, Query, Depends
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List, Optional
 import httpx
 from pydantic import BaseModel, Field
-from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.config import BASE_URL, POSITIONS_PAGE_CONCURRENCY, PORTFOLIO_ACCOUNTS_CACHE_TTL, AGGREGATE_CONCURRENCY
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error, handle_gateway_error
+from mcp_server.shaping import ResponseShape, response_shape
+from mcp_server.cache import create_cache, cached_get
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("portfolio"))])
 
 # --- Pydantic Models ---
 
@@ -15,6 +21,79 @@ class AccountAllocationRequest(BaseModel):
     acctIds: List[str] = Field(..., description="List of account IDs to retrieve allocation for.")
 
 
+# The gateway returns at most this many positions per page.
+POSITIONS_PAGE_SIZE = 100
+
+# Per-account endpoints that /portfolio/aggregate can fan out to.
+AGGREGATE_SECTIONS = ("summary", "ledger", "allocation")
+
+# Account lists rarely change within a session; keyed by the listing endpoint.
+accounts_cache = create_cache("portfolio_accounts", PORTFOLIO_ACCOUNTS_CACHE_TTL, 8)
+
+
+# --- Helpers ---
+
+async def _fetch_positions_page(client: httpx.AsyncClient, accountId: str, pageId: int, params: Dict[str, str]) -> List[Dict[str, Any]]:
+    response = await client.get(f"{BASE_URL}/portfolio/{accountId}/positions/{pageId}", params=params, timeout=10)
+    response.raise_for_status()
+    rows = response.json()
+    return rows if isinstance(rows, list) else []
+
+
+async def _iter_position_pages(
+    client: httpx.AsyncClient, accountId: str, params: Dict[str, str], first_page: List[Dict[str, Any]]
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield position pages in order, fetching the pages after the first in concurrent waves.
+
+    The gateway does not report a page count, so a page shorter than
+    POSITIONS_PAGE_SIZE marks the end.
+    """
+    yield first_page
+    if len(first_page) < POSITIONS_PAGE_SIZE:
+        return
+    page = 1
+    while True:
+        wave = range(page, page + POSITIONS_PAGE_CONCURRENCY)
+        results = await asyncio.gather(*(_fetch_positions_page(client, accountId, p, params) for p in wave))
+        for rows in results:
+            if rows:
+                yield rows
+            if len(rows) < POSITIONS_PAGE_SIZE:
+                return
+        page += POSITIONS_PAGE_CONCURRENCY
+
+
+def _project(row: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if not fields:
+        return row
+    return {field: row[field] for field in fields if field in row}
+
+
+def _sort_key(field: str, descending: bool = False):
+    # None sorts last in either direction (the sort is reversed for descending, so its rank is
+    # flipped too) and mixed types fall back to string comparison.
+    def key(row: Dict[str, Any]):
+        value = row.get(field)
+        if value is None:
+            return (-1, "") if descending else (2, "")
+        if isinstance(value, (int, float)):
+            return (0, value)
+        return (1, str(value))
+    return key
+
+
+def _account_ids(listing: Any) -> List[str]:
+    """Extract account IDs from /portfolio/accounts, /portfolio/subaccounts or /portfolio/subaccounts2 output."""
+    if isinstance(listing, dict):
+        listing = listing.get("subaccounts") or listing.get("accounts") or []
+    ids = []
+    for entry in listing if isinstance(listing, list) else []:
+        account_id = entry.get("accountId") or entry.get("id") if isinstance(entry, dict) else entry
+        if account_id:
+            ids.append(str(account_id))
+    return list(dict.fromkeys(ids))
+
+
 # --- Router Endpoints ---
 
 @router.get(
@@ -23,19 +102,19 @@ class AccountAllocationRequest(BaseModel):
     summary="Portfolio Accounts",
     description="In non-tiered account structures, returns a list of accounts for which the user can view position and account information. This endpoint must be called prior to calling other /portfolio endpoints for those accounts."
 )
-async def get_portfolio_accounts():
+async def get_portfolio_accounts(
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
     """
-    Fetches the list of available portfolio accounts.
+    Fetches the list of available portfolio accounts. The list is cached locally.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/accounts", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        return await cached_get(client, accounts_cache, "accounts", f"{BASE_URL}/portfolio/accounts", refresh=refresh)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/portfolio/subaccounts",
@@ -43,19 +122,19 @@ async def get_portfolio_accounts():
     summary="Portfolio Subaccounts",
     description="Used in tiered account structures (such as Financial Advisor and IBroker) to return a list of up to 100 sub-accounts for which the user can view position and account-related information. This endpoint must be called prior to calling other /portfolio endpoints for those sub-accounts."
 )
-async def get_portfolio_subaccounts():
+async def get_portfolio_subaccounts(
+    refresh: bool = Query(False, description="Set to true to bypass the local cache and fetch fresh data from the gateway."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
     """
-    Retrieves a list of subaccounts for the portfolio, primarily for tiered account structures.
+    Retrieves a list of subaccounts for the portfolio, primarily for tiered account structures. The list is cached locally.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/subaccounts", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        return await cached_get(client, accounts_cache, "subaccounts", f"{BASE_URL}/portfolio/subaccounts", refresh=refresh)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/portfolio/subaccounts2",
@@ -63,21 +142,20 @@ async def get_portfolio_subaccounts():
     summary="Portfolio Subaccounts (Large Account Structures)",
     description="Used in large tiered account structures to return a list of sub-accounts for which the user can view position and account-related information. This endpoint must be called prior to calling other /portfolio endpoints for those sub-accounts."
 )
-async def get_portfolio_subaccounts_large():
+async def get_portfolio_subaccounts_large(shape: ResponseShape = Depends(response_shape), client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves a list of subaccounts for large portfolio structures.
     """
-    async with create_client() as client:
-        try:
-            # Note: The documentation suggests this might be a GET, but a POST with a body might be needed in practice for large lists.
-            # Assuming GET based on the doc for now.
-            response = await client.get(f"{BASE_URL}/portfolio/subaccounts2", timeout=30) # Longer timeout for potentially large responses
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        # Note: The documentation suggests this might be a GET, but a POST with a body might be needed in practice for large lists.
+        # Assuming GET based on the doc for now.
+        response = await client.get(f"{BASE_URL}/portfolio/subaccounts2", timeout=30) # Longer timeout for potentially large responses
+        response.raise_for_status()
+        return shape.apply(response.json())
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -87,20 +165,20 @@ async def get_portfolio_subaccounts_large():
     description="Returns information about the account, including the account's name, currency, and other metadata."
 )
 async def get_account_meta(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches metadata for a specific portfolio account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{accountId}/meta", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{accountId}/meta", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -110,20 +188,20 @@ async def get_account_meta(
     description="Returns a list of positions and their allocation by asset class, industry, and category for a single account."
 )
 async def get_account_allocation(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches portfolio allocation for a single specified account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{accountId}/allocation", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{accountId}/allocation", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -133,20 +211,20 @@ async def get_account_allocation(
     description="Returns a list of combination positions for a single account."
 )
 async def get_combo_positions(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves combination positions (e.g., complex options strategies) for an account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{accountId}/combo/positions", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{accountId}/combo/positions", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -155,23 +233,92 @@ async def get_combo_positions(
     summary="Portfolio Allocation (All)",
     description="Returns portfolio allocation information for multiple accounts combined. The accounts are specified in the request body."
 )
-async def get_all_accounts_allocation(body: AccountAllocationRequest = Body(...)):
+async def get_all_accounts_allocation(body: AccountAllocationRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Fetches combined portfolio allocation for a list of specified accounts.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/portfolio/allocation",
-                json=body.dict(),
-                timeout=20
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/portfolio/allocation",
+            json=body.dict(),
+            timeout=20
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+@router.get(
+    "/portfolio/{accountId}/positions/all",
+    tags=["Portfolio"],
+    summary="All Positions",
+    description="Returns every position for the given account in one call by walking all position pages concurrently. Supports server-side sorting, field projection and NDJSON streaming."
+)
+async def get_all_positions(
+    accountId: str = Path(..., description="The account ID."),
+    model: Optional[str] = Query(None, description="The model to query positions for."),
+    period: Optional[str] = Query(None, description="The period for which to retrieve positions."),
+    sort: Optional[str] = Query(None, description="A position field to sort the merged result by, e.g., 'mktValue'."),
+    direction: Optional[str] = Query("a", description="The sort direction: 'a' for ascending, 'd' for descending."),
+    fields: Optional[str] = Query(None, description="A comma-separated list of position fields to return, e.g., 'conid,ticker,position,mktValue'."),
+    format: Optional[str] = Query("json", description="'json' for a single JSON document, or 'ndjson' to stream one position per line."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    """
+    Fetches all positions for an account. The first page is fetched on its own; if it is full, the remaining pages
+    are fetched concurrently in waves until a short page is returned. Without sorting, NDJSON output is streamed
+    page by page as pages arrive.
+    """
+    params = {}
+    if model:
+        params["model"] = model
+    if period:
+        params["period"] = period
+    field_list = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+    # Fetch the first page up front so authentication and account errors are reported normally.
+    try:
+        first_page = await _fetch_positions_page(client, accountId, 0, params)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+    pages = _iter_position_pages(client, accountId, params, first_page)
+
+    if format == "ndjson" and not sort:
+        async def stream():
+            try:
+                async for rows in pages:
+                    yield "".join(json.dumps(_project(row, field_list)) + "\n" for row in rows)
+            except httpx.HTTPStatusError as exc:
+                yield json.dumps(handle_http_error(exc)) + "\n"
+            except httpx.RequestError as exc:
+                yield json.dumps(handle_request_error(exc)) + "\n"
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    positions: List[Dict[str, Any]] = []
+    try:
+        async for rows in pages:
+            positions.extend(rows)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+    if sort:
+        positions.sort(key=_sort_key(sort, direction == "d"), reverse=direction == "d")
+    if field_list:
+        positions = [_project(row, field_list) for row in positions]
+
+    if format == "ndjson":
+        return StreamingResponse(
+            iter([json.dumps(row) + "\n" for row in positions]), media_type="application/x-ndjson"
+        )
+    return positions
 
 
 @router.get(
@@ -186,7 +333,8 @@ async def get_positions(
     model: Optional[str] = Query(None, description="The model to query positions for."),
     sort: Optional[str] = Query(None, description="The field to sort by."),
     direction: Optional[str] = Query(None, description="The sort direction: 'a' for ascending, 'd' for descending."),
-    period: Optional[str] = Query(None, description="The period for which to retrieve positions.")
+    period: Optional[str] = Query(None, description="The period for which to retrieve positions."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches paginated positions for a specific account.
@@ -201,15 +349,14 @@ async def get_positions(
     if period:
         params["period"] = period
         
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{accountId}/positions/{pageId}", params=params, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{accountId}/positions/{pageId}", params=params, timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -220,20 +367,20 @@ async def get_positions(
 )
 async def get_position_by_conid(
     acctId: str = Path(..., description="The account ID."),
-    conid: int = Path(..., description="The contract ID.")
+    conid: int = Path(..., description="The contract ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves all positions for a specific contract within a given account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{acctId}/position/{conid}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{acctId}/position/{conid}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -243,20 +390,20 @@ async def get_position_by_conid(
     description="Invalidates the backend portfolio cache for the specified account, forcing a refresh of portfolio data."
 )
 async def invalidate_portfolio_cache(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Clears the cached portfolio data on the server side for the specified account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/portfolio/{accountId}/positions/invalidate", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(f"{BASE_URL}/portfolio/{accountId}/positions/invalidate", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -266,20 +413,20 @@ async def invalidate_portfolio_cache(
     description="Returns a summary of account information and portfolio positions."
 )
 async def get_account_summary(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches a summary of the specified account's portfolio.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{accountId}/summary", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{accountId}/summary", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -289,20 +436,20 @@ async def get_account_summary(
     description="Returns the cash balance and other ledger information for the specified account."
 )
 async def get_account_ledger(
-    accountId: str = Path(..., description="The account ID.")
+    accountId: str = Path(..., description="The account ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves the ledger for a specific account, showing cash balances and other financial details.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/{accountId}/ledger", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/{accountId}/ledger", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.get(
@@ -312,17 +459,80 @@ async def get_account_ledger(
     description="Returns a list of all positions matching the conid, along with the contract information."
 )
 async def get_all_positions_by_conid(
-    conid: int = Path(..., description="The contract ID.")
+    conid: int = Path(..., description="The contract ID."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Fetches all positions for a given contract ID across all portfolio accounts.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/portfolio/positions/{conid}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
\ No newline at end of file
+    try:
+        response = await client.get(f"{BASE_URL}/portfolio/positions/{conid}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+
+@router.get(
+    "/portfolio/aggregate",
+    tags=["Portfolio"],
+    summary="Multi-Account Aggregate",
+    description="Returns summary, ledger and allocation for all (or selected) accounts in one call, fetched concurrently with per-account error isolation."
+)
+async def get_accounts_aggregate(
+    accountIds: Optional[str] = Query(None, description="A comma-separated list of account IDs. Defaults to every account returned by the account listing."),
+    sections: Optional[str] = Query("summary,ledger,allocation", description="A comma-separated list of sections to fetch: summary, ledger, allocation."),
+    source: Optional[str] = Query("accounts", description="The account listing used when accountIds is omitted: 'accounts', 'subaccounts' or 'subaccounts2'."),
+    refresh: bool = Query(False, description="Set to true to refresh the cached account listing."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    """
+    Fans out /portfolio/{accountId}/summary, /ledger and /allocation across accounts concurrently and merges the
+    results into {"accounts": {accountId: {section: data}}, "errors": {accountId: {section: error}}}. A failing
+    account or section does not affect the others. The account listing is also required by the gateway before other
+    /portfolio calls, so it is always loaded (from cache when possible).
+    """
+    requested_sections = [s.strip() for s in (sections or "").split(",") if s.strip() in AGGREGATE_SECTIONS]
+    if not requested_sections:
+        return {"error": "Invalid sections", "detail": f"Valid sections: {', '.join(AGGREGATE_SECTIONS)}"}
+    if source not in ("accounts", "subaccounts", "subaccounts2"):
+        return {"error": "Invalid source", "detail": "Valid sources: accounts, subaccounts, subaccounts2"}
+
+    try:
+        listing = await cached_get(client, accounts_cache, source, f"{BASE_URL}/portfolio/{source}", timeout=30, refresh=refresh)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+    if accountIds:
+        account_list = list(dict.fromkeys(a.strip() for a in accountIds.split(",") if a.strip()))
+    else:
+        account_list = _account_ids(listing)
+
+    semaphore = asyncio.Semaphore(AGGREGATE_CONCURRENCY)
+    results: Dict[str, Dict[str, Any]] = {account: {} for account in account_list}
+    errors: Dict[str, Dict[str, Any]] = {}
+
+    async def fetch(account: str, section: str):
+        async with semaphore:
+            try:
+                response = await client.get(f"{BASE_URL}/portfolio/{account}/{section}", timeout=10)
+                response.raise_for_status()
+                results[account][section] = response.json()
+            except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                errors.setdefault(account, {})[section] = handle_gateway_error(exc)
+
+    await asyncio.gather(*(fetch(account, section) for account in account_list for section in requested_sections))
+
+    return {
+        "accounts": results,
+        "errors": errors,
+        "stats": {
+            "accounts": len(account_list),
+            "sections": requested_sections,
+            "failed_accounts": len(errors),
+        },
+    }
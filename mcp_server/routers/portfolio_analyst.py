@@ -1,12 +1,13 @@
 # portfolio_analyst.py
-from fastapi import APIRouter, Body
+from fastapi import APIRouter, Body, Depends
 from typing import List, Optional
 import httpx
 from pydantic import BaseModel, Field
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("portfolio_analyst"))])
 
 # --- Pydantic Models ---
 
@@ -32,23 +33,22 @@ class PATransactionsRequest(BaseModel):
     summary="Available Periods",
     description="Returns a list of all available periods for Portfolio Analyst data."
 )
-async def get_all_periods(body: PARequest = Body(...)):
+async def get_all_periods(body: PARequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves all available time periods for Portfolio Analyst queries.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/pa/allperiods",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/pa/allperiods",
+            json=body.dict(exclude_none=True),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -57,23 +57,22 @@ async def get_all_periods(body: PARequest = Body(...)):
     summary="Portfolio Performance",
     description="Returns the performance (NAV) of specified account(s)."
 )
-async def get_performance(body: PARequest = Body(...)):
+async def get_performance(body: PARequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves portfolio performance data for specified accounts.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/pa/performance",
-                json=body.dict(exclude_none=True),
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/pa/performance",
+            json=body.dict(exclude_none=True),
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 
 @router.post(
@@ -82,20 +81,19 @@ async def get_performance(body: PARequest = Body(...)):
     summary="Transaction History",
     description="Returns a list of transactions for specified account(s)."
 )
-async def get_transactions(body: PATransactionsRequest = Body(...)):
+async def get_transactions(body: PATransactionsRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves transaction history for specified accounts.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/pa/transactions",
-                json=body.dict(exclude_none=True),
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/pa/transactions",
+            json=body.dict(exclude_none=True),
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
@@ -1,14 +1,25 @@
 # scanner.py
-from fastapi import APIRouter, Body
+import asyncio
+import json
+from fastapi import APIRouter, Body, Depends, Query
 from fastapi.responses import Response
-from typing import List, Optional, Any
-from xml.etree.ElementTree import Element, SubElement, tostring
+from typing import List, Optional, Any, Dict, Tuple
+from xml.sax.saxutils import escape
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
-from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.config import BASE_URL, SCANNER_BATCH_CONCURRENCY, SCANNER_BATCH_MAX_SCANS, SCANNER_RESULT_CACHE_TTL
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error, handle_gateway_error
+from mcp_server.shaping import ResponseShape, response_shape
+from mcp_server.retry import retry_policy
+from mcp_server.hmds import hmds_session
+from mcp_server.scanner_params import scanner_params
+from mcp_server.cache import MISSING, SingleFlight, create_cache
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("scanner"))])
+
+# Identical scans within SCANNER_RESULT_CACHE_TTL share one gateway call (used by /batch/scanner).
+scan_result_cache = create_cache("scanner_results", SCANNER_RESULT_CACHE_TTL, 256)
+scan_flight = SingleFlight()
 
 # --- Pydantic Models for Scanner Requests ---
 
@@ -67,28 +78,196 @@ class HmdsScannerRequest(BaseModel):
         }
 
 
+class BatchScannerRequest(BaseModel):
+    """Request model for running many iServer and HMDS scans in one call."""
+    iserver: List[ScannerSubscription] = Field(default_factory=list, description="iServer scans, each in the /iserver/scanner/run format.")
+    hmds: List[HmdsScannerRequest] = Field(default_factory=list, description="HMDS scans, each in the /hmds/scanner format.")
+    refresh: bool = Field(False, description="Set to true to ignore recently cached results of identical scans.")
+
+    model_config = ConfigDict(
+        json_schema_extra = {
+            "example": {
+                "iserver": [
+                    {"instrument": "STK", "type": "TOP_PERC_GAIN", "locationCode": "STK.US.MAJOR"},
+                    {"instrument": "STK", "type": "HOT_BY_VOLUME", "locationCode": "STK.US.MAJOR",
+                     "filter": [{"name": "priceAbove", "value": 5}]}
+                ],
+                "hmds": []
+            }
+        }
+    )
+
+
+# --- Scanner Helpers ---
+
+# The subscription XML has a fixed shape, so it is filled from templates rather than built as a tree.
+SUBSCRIPTION_XML = (
+    "<ScannerSubscription><instrument>{}</instrument><type>{}</type>"
+    "<locationCode>{}</locationCode>{}</ScannerSubscription>"
+)
+FILTER_ITEM_XML = "<item><name>{}</name><value>{}</value></item>"
+
+
+def _subscription_xml(body: ScannerSubscription) -> str:
+    """Serialize a ScannerSubscription to the XML body expected by /iserver/scanner/run.
+
+    Every value is escaped (&, <, >) exactly as ElementTree would escape element
+    text, so user input cannot inject markup.
+    """
+    filters = ""
+    if body.filter:
+        filters = "<filter>" + "".join(
+            FILTER_ITEM_XML.format(escape(str(item.name)), escape(str(item.value))) for item in body.filter
+        ) + "</filter>"
+    return SUBSCRIPTION_XML.format(escape(body.instrument), escape(body.type), escape(body.locationCode), filters)
+
+
+async def _post_iserver_scan(client: httpx.AsyncClient, xml_string: str) -> Any:
+    response = await client.post(
+        f"{BASE_URL}/iserver/scanner/run",
+        content=xml_string,
+        headers={"Content-Type": "application/xml"},
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _post_hmds_scan(client: httpx.AsyncClient, payload: Dict[str, Any]) -> Any:
+    response = await hmds_session.post(client, f"{BASE_URL}/hmds/scanner", json=payload, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def _scan_contracts(result: Any) -> List[Dict[str, Any]]:
+    """The ranked contract list of an iServer ('contracts') or HMDS ('Contracts.Contract') scan result."""
+    items = result
+    if isinstance(result, dict):
+        items = result.get("contracts") or result.get("Contracts") or []
+        if isinstance(items, dict):
+            items = items.get("Contract") or []
+    return [item for item in items if isinstance(item, dict)] if isinstance(items, list) else []
+
+
+def _contract_conid(item: Dict[str, Any]) -> Optional[int]:
+    for key in ("con_id", "conid", "contractID", "conidex"):
+        value = item.get(key)
+        if value is not None:
+            try:
+                return int(str(value).split("@")[0])
+            except ValueError:
+                continue
+    return None
+
+
 # --- Scanner Router Endpoints ---
 
 @router.get(
     "/iserver/scanner/params",
     tags=["Scanner"],
     summary="Get Scanner Parameters",
-    description="Returns an XML file containing all available scanner parameters for the iServer scanner."
+    description="Returns all available scanner parameters for the iServer scanner. Prefer the /iserver/scanner/params/instruments, /scan-types, /filters and /locations endpoints, which return only the matching entries. Use 'fields', 'exclude' and 'limit' to avoid pulling the full document."
 )
-async def get_scanner_params():
+async def get_scanner_params(
+    refresh: bool = Query(False, description="Refetch the parameters from the gateway instead of using the cached copy."),
+    shape: ResponseShape = Depends(response_shape),
+    client: httpx.AsyncClient = Depends(get_client)
+):
     """
-    Retrieves the iServer scanner parameters as an XML file. This information is needed to correctly configure an iServer scanner request.
+    Retrieves the iServer scanner parameters. This information is needed to correctly configure an iServer scanner request.
+    The document is cached in memory and on disk for SCANNER_PARAMS_TTL seconds.
+    JSON documents are shaped server-side; XML documents are returned as-is.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/scanner/params", timeout=10)
-            response.raise_for_status()
-            # Return the raw XML content with the correct media type
-            return Response(content=response.text, media_type="application/xml")
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        document = await scanner_params.get(client, refresh)
+        if document.is_json:
+            return shape.apply(document.json())
+        # Return the raw XML content with the correct media type
+        return Response(content=document.body, media_type="application/xml")
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+@router.get(
+    "/iserver/scanner/params/instruments",
+    tags=["Scanner"],
+    summary="List Scanner Instruments",
+    description="Lists the instrument types accepted by the iServer scanner (the 'instrument' of a ScannerSubscription), from the cached scanner parameters."
+)
+async def get_scanner_instruments(
+    refresh: bool = Query(False, description="Refetch the parameters from the gateway instead of using the cached copy."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    try:
+        index = (await scanner_params.get(client, refresh)).index
+        return [
+            {"type": item["type"], "display_name": item["display_name"], "filter_count": len(item["filters"])}
+            for item in index.instruments
+        ]
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+@router.get(
+    "/iserver/scanner/params/scan-types",
+    tags=["Scanner"],
+    summary="List Scan Types",
+    description="Lists scan types (the 'type' of a ScannerSubscription), optionally only those available for one instrument."
+)
+async def get_scanner_scan_types(
+    instrument: Optional[str] = Query(None, description="Only return scan types available for this instrument, e.g. 'STK'."),
+    refresh: bool = Query(False, description="Refetch the parameters from the gateway instead of using the cached copy."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    try:
+        index = (await scanner_params.get(client, refresh)).index
+        return [{"code": item["code"], "display_name": item["display_name"]} for item in index.scan_types_for(instrument)]
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+@router.get(
+    "/iserver/scanner/params/filters",
+    tags=["Scanner"],
+    summary="Find Scanner Filters",
+    description="Looks up scanner filter codes (the 'name' of a filter item) whose code, display name or group contains the query text."
+)
+async def get_scanner_filters(
+    query: Optional[str] = Query(None, description="Case-insensitive text to search for, e.g. 'volume' or 'price'."),
+    instrument: Optional[str] = Query(None, description="Only return filters supported by this instrument, e.g. 'STK'."),
+    limit: int = Query(50, ge=1, description="Maximum number of filters to return."),
+    refresh: bool = Query(False, description="Refetch the parameters from the gateway instead of using the cached copy."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    try:
+        index = (await scanner_params.get(client, refresh)).index
+        return index.find_filters(query, instrument)[:limit]
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+@router.get(
+    "/iserver/scanner/params/locations",
+    tags=["Scanner"],
+    summary="List Scanner Locations",
+    description="Lists location codes (the 'locationCode' of a ScannerSubscription), optionally only those for one instrument."
+)
+async def get_scanner_locations(
+    instrument: Optional[str] = Query(None, description="Only return locations for this instrument, e.g. 'STK'."),
+    refresh: bool = Query(False, description="Refetch the parameters from the gateway instead of using the cached copy."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    try:
+        index = (await scanner_params.get(client, refresh)).index
+        return index.locations_for(instrument)
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/iserver/scanner/run",
@@ -96,40 +275,17 @@ async def get_scanner_params():
     summary="Run iServer Market Scanner",
     description="Runs an iServer market scanner search and returns the top 100 contracts matching the criteria."
 )
-async def run_scanner(body: ScannerSubscription = Body(...)):
+async def run_scanner(body: ScannerSubscription = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     Submits an iServer scanner configuration and returns the results.
     The JSON request body will be converted to the required XML format.
     """
-    # Build the XML safely using ElementTree to prevent XML injection
-    root = Element("ScannerSubscription")
-    SubElement(root, "instrument").text = body.instrument
-    SubElement(root, "type").text = body.type
-    SubElement(root, "locationCode").text = body.locationCode
-    if body.filter:
-        filter_el = SubElement(root, "filter")
-        for item in body.filter:
-            item_el = SubElement(filter_el, "item")
-            SubElement(item_el, "name").text = str(item.name)
-            SubElement(item_el, "value").text = str(item.value)
-    xml_string = tostring(root, encoding="unicode")
-
-    headers = {"Content-Type": "application/xml"}
-
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/scanner/run",
-                content=xml_string,
-                headers=headers,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        return await _post_iserver_scan(client, _subscription_xml(body))
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/hmds/scanner",
@@ -137,30 +293,97 @@ async def run_scanner(body: ScannerSubscription = Body(...)):
     summary="Run HMDS Market Scanner",
     description="Runs a scanner on the Historical Market Data Service."
 )
-async def run_hmds_scanner(body: HmdsScannerRequest = Body(...)):
+async def run_hmds_scanner(body: HmdsScannerRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
     """
     ### Run HMDS Scanner
-    Submits a scanner request to the HMDS. As per the documentation, this endpoint
-    first calls `/hmds/auth/init` to authenticate the session before running the scan.
+    Submits a scanner request to the HMDS. The HMDS session (`/hmds/auth/init`) is
+    initialized once and re-initialized only when it expires or the gateway rejects the scan.
 
     The request body should be a JSON object specifying the scanner parameters.
     """
-    async with create_client() as client:
+    try:
+        return await _post_hmds_scan(client, body.dict())
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
+
+@router.post(
+    "/batch/scanner",
+    tags=["Scanner"],
+    summary="Run Many Scanners",
+    description="Runs many iServer and HMDS scans concurrently within the scanner rate limit and returns one de-duplicated contract list, with the scans and ranks each contract came from."
+)
+async def run_scanner_batch(body: BatchScannerRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    """
+    Identical scans, within the batch or from another recent call, are run once; results are reused for
+    SCANNER_RESULT_CACHE_TTL seconds unless 'refresh' is set. Contracts are ordered by the number of scans
+    they appear in, then by their best rank. Failed scans are reported in 'scans' without failing the batch.
+    """
+    scans: List[Tuple[str, str, Dict[str, Any]]] = [
+        ("iserver", _subscription_xml(item), item.model_dump()) for item in body.iserver
+    ] + [
+        ("hmds", json.dumps(item.model_dump(), sort_keys=True, default=str), item.model_dump()) for item in body.hmds
+    ]
+    if not scans:
+        return {"error": "No scans", "detail": "Provide at least one scan under 'iserver' or 'hmds'."}
+    if len(scans) > SCANNER_BATCH_MAX_SCANS:
+        return {"error": "Too many scans", "detail": f"At most {SCANNER_BATCH_MAX_SCANS} scans can be run in one batch."}
+
+    semaphore = asyncio.Semaphore(SCANNER_BATCH_CONCURRENCY)
+    stats = {"requested": len(scans), "executed": 0, "cached": 0, "coalesced": 0, "failed": 0}
+
+    async def run(source: str, request_key: str, payload: Dict[str, Any]) -> Tuple[Any, str]:
+        key = (source, request_key)
+        if not body.refresh:
+            cached = scan_result_cache.get(key)
+            if cached is not MISSING:
+                stats["cached"] += 1
+                return cached, "cache"
+        future, owner = scan_flight.claim(key)
+        if not owner:
+            stats["coalesced"] += 1
+            return await asyncio.shield(future), "coalesced"
         try:
-            # Initialize HMDS session to prevent 404 error on the first call
-            # This is a prerequisite for all /hmds endpoints.
-            init_response = await client.get(f"{BASE_URL}/hmds/auth/init", timeout=10)
-            init_response.raise_for_status() # Ensure the init call was successful
-
-            # Now, make the actual scanner request
-            scanner_response = await client.post(
-                f"{BASE_URL}/hmds/scanner",
-                json=body.dict(),
-                timeout=30
-            )
-            scanner_response.raise_for_status()
-            return scanner_response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+            async with semaphore:
+                if source == "iserver":
+                    result = await _post_iserver_scan(client, request_key)
+                else:
+                    result = await _post_hmds_scan(client, payload)
+        except BaseException as exc:
+            scan_flight.fail(key, exc)
+            raise
+        scan_flight.resolve(key, result)
+        scan_result_cache.set(key, result)
+        stats["executed"] += 1
+        return result, "gateway"
+
+    outcomes = await asyncio.gather(*(run(*scan) for scan in scans), return_exceptions=True)
+
+    summaries = []
+    merged: Dict[int, Dict[str, Any]] = {}
+    for index, ((source, _, payload), outcome) in enumerate(zip(scans, outcomes)):
+        summary: Dict[str, Any] = {"scan": index, "source": source, "request": payload}
+        if isinstance(outcome, (httpx.HTTPStatusError, httpx.RequestError)):
+            stats["failed"] += 1
+            summaries.append({**summary, **handle_gateway_error(outcome)})
+            continue
+        if isinstance(outcome, BaseException):
+            raise outcome
+        result, origin = outcome
+        contracts = _scan_contracts(result)
+        summaries.append({**summary, "origin": origin, "count": len(contracts)})
+        for rank, item in enumerate(contracts):
+            conid = _contract_conid(item)
+            if conid is None:
+                continue
+            entry = merged.setdefault(conid, {
+                "conid": conid,
+                "symbol": item.get("symbol"),
+                "company_name": item.get("company_name") or item.get("companyName"),
+                "scans": [],
+            })
+            entry["scans"].append({"scan": index, "rank": rank})
+
+    contracts = sorted(merged.values(), key=lambda entry: (-len(entry["scans"]), min(hit["rank"] for hit in entry["scans"])))
+    return {"contracts": contracts, "scans": summaries, "stats": stats}
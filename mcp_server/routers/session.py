@@ -1,10 +1,11 @@
 # session.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 import httpx
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("session"))])
 
 # --- Session Router Endpoints ---
 
@@ -14,19 +15,18 @@ router = APIRouter()
     summary="Validate SSO",
     description="Validates the current session for the SSO user."
 )
-async def sso_validate():
+async def sso_validate(client: httpx.AsyncClient = Depends(get_client)):
     """
     Validates the session for a Single Sign-On (SSO) user.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/sso/validate", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(f"{BASE_URL}/sso/validate", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/auth/status",
@@ -34,19 +34,18 @@ async def sso_validate():
     summary="Authentication Status",
     description="Returns the authentication status of the gateway."
 )
-async def get_auth_status():
+async def get_auth_status(client: httpx.AsyncClient = Depends(get_client)):
     """
     Checks the current authentication status, including connection status, any competing sessions, and server info.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/auth/status", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/auth/status", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/iserver/reauthenticate",
@@ -54,19 +53,18 @@ async def get_auth_status():
     summary="Re-authenticate",
     description="Attempts to re-authenticate a session that has expired."
 )
-async def reauthenticate():
+async def reauthenticate(client: httpx.AsyncClient = Depends(get_client)):
     """
     When the session has been idle for a long time, it may expire. This endpoint can be used to re-authenticate the session.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/iserver/reauthenticate", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(f"{BASE_URL}/iserver/reauthenticate", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/logout",
@@ -74,19 +72,18 @@ async def reauthenticate():
     summary="Terminate Session",
     description="Logs the user out of the gateway session."
 )
-async def logout():
+async def logout(client: httpx.AsyncClient = Depends(get_client)):
     """
     Terminates the current brokerage session.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(f"{BASE_URL}/logout", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(f"{BASE_URL}/logout", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/tickle",
@@ -94,16 +91,15 @@ async def logout():
     summary="Tickle",
     description="Keeps the session open and verifies that the gateway is running. If the gateway is not running, it will not respond."
 )
-async def tickle():
+async def tickle(client: httpx.AsyncClient = Depends(get_client)):
     """
     Pings the gateway to keep the session alive and check for connectivity.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/tickle", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/tickle", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
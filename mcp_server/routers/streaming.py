@@ -0,0 +1,114 @@
+# streaming.py
+import asyncio
+import json
+import uuid
+from fastapi import APIRouter, Body, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from pydantic import BaseModel, Field
+import httpx
+from mcp_server.http_client import get_client
+from mcp_server.snapshot import split_csv
+from mcp_server.streaming import market_data_stream
+from mcp_server.retry import retry_policy
+
+router = APIRouter(dependencies=[Depends(retry_policy("streaming"))])
+
+# Seconds between SSE comments that keep idle connections from being closed by proxies.
+SSE_KEEPALIVE_INTERVAL = 15
+
+# --- Pydantic Models ---
+
+class StreamSubscribeRequest(BaseModel):
+    """Request model for holding streamed market data for a set of conids."""
+    conids: List[str] = Field(..., min_length=1, description="Contract IDs to stream.")
+    fields: Optional[List[str]] = Field(None, description="Field codes to stream (e.g. ['31', '84', '86']). Defaults to STREAM_DEFAULT_FIELDS.")
+    subscriber: str = Field("default", description="Name of the subscriber holding the conids. Conids stay streamed while any subscriber holds them.")
+    ttl: Optional[float] = Field(None, gt=0, description="Seconds the subscription lasts unless renewed by subscribing again. Defaults to STREAM_SUBSCRIPTION_TTL.")
+
+
+class StreamUnsubscribeRequest(BaseModel):
+    """Request model for releasing streamed market data."""
+    conids: Optional[List[str]] = Field(None, description="Contract IDs to release. Omit to release every conid held by the subscriber.")
+    subscriber: str = Field("default", description="Name of the subscriber releasing the conids.")
+
+
+# --- Streaming Router Endpoints ---
+
+@router.post(
+    "/stream/marketdata/subscribe",
+    tags=["Streaming"],
+    summary="Subscribe to Streaming Market Data",
+    description=(
+        "Streams market data for the given conids over the gateway WebSocket and keeps the latest tick of each in "
+        "memory. Read it with /stream/marketdata/ticks instead of polling snapshots. The subscription is a lease of "
+        "ttl seconds, renewed by subscribing again; conids are unsubscribed upstream once no subscriber holds them."
+    )
+)
+async def subscribe_stream(body: StreamSubscribeRequest = Body(...), client: httpx.AsyncClient = Depends(get_client)):
+    conids = await market_data_stream.subscribe(client, body.subscriber, body.conids, body.fields, body.ttl)
+    return {"subscriber": body.subscriber, "conids": conids, "ttl": body.ttl or market_data_stream.ttl}
+
+
+@router.post(
+    "/stream/marketdata/unsubscribe",
+    tags=["Streaming"],
+    summary="Unsubscribe from Streaming Market Data",
+    description="Releases a subscriber's hold on streamed conids. Conids no other subscriber holds are unsubscribed from the gateway."
+)
+async def unsubscribe_stream(body: StreamUnsubscribeRequest = Body(...)):
+    released = await market_data_stream.unsubscribe(body.subscriber, body.conids)
+    return {"subscriber": body.subscriber, "released": released}
+
+
+@router.get(
+    "/stream/marketdata/ticks",
+    tags=["Streaming"],
+    summary="Latest Streamed Ticks",
+    description=(
+        "Returns the latest streamed values of subscribed conids from memory, without calling the gateway. Each row "
+        "holds the field codes received so far, '_updated' (gateway time, ms) and '_received' (local time, s)."
+    )
+)
+async def get_stream_ticks(
+    conids: Optional[str] = Query(None, description="A comma-separated list of contract IDs. Omit for every streamed conid.")
+):
+    return market_data_stream.latest(split_csv(conids) if conids else None)
+
+
+@router.get(
+    "/stream/marketdata/events",
+    tags=["Streaming"],
+    summary="Market Data Event Stream (SSE)",
+    description=(
+        "Server-Sent Events stream of tick deltas for the given conids. The conids are held for as long as the "
+        "connection stays open. The first events carry the latest known tick of each conid."
+    )
+)
+async def stream_events(
+    request: Request,
+    conids: str = Query(..., description="A comma-separated list of contract IDs."),
+    fields: Optional[str] = Query(None, description="A comma-separated list of field codes. Defaults to STREAM_DEFAULT_FIELDS."),
+    client: httpx.AsyncClient = Depends(get_client)
+):
+    wanted = split_csv(conids)
+    subscriber = f"sse-{uuid.uuid4().hex[:12]}"
+    listener = market_data_stream.listen(wanted)
+    await market_data_stream.subscribe(client, subscriber, wanted, split_csv(fields) or None, persistent=True)
+
+    async def events():
+        try:
+            for tick in market_data_stream.latest(wanted):
+                yield f"data: {json.dumps(tick)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(listener.queue.get(), SSE_KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            market_data_stream.stop_listening(listener)
+            await market_data_stream.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
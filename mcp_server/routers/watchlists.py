@@ -1,12 +1,13 @@
 # watchlists.py
-from fastapi import APIRouter, Body, Path
+from fastapi import APIRouter, Body, Path, Depends
 from typing import List, Optional
 import httpx
 from pydantic import BaseModel, Field
 from mcp_server.config import BASE_URL
-from mcp_server.http_client import create_client, handle_http_error, handle_request_error
+from mcp_server.http_client import get_client, handle_http_error, handle_request_error
+from mcp_server.retry import retry_policy
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(retry_policy("watchlists"))])
 
 # --- Pydantic Models for Watchlist Requests ---
 
@@ -28,19 +29,18 @@ class WatchlistContractsRequest(BaseModel):
     summary="Get Watchlists",
     description="Returns a list of all watchlists for the current user."
 )
-async def get_watchlists():
+async def get_watchlists(client: httpx.AsyncClient = Depends(get_client)):
     """
     Retrieves all watchlists associated with the current user's account.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/watchlists", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/watchlists", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.get(
     "/iserver/account/watchlist/{watchlistId}",
@@ -49,20 +49,20 @@ async def get_watchlists():
     description="Returns a list of contracts for a specific watchlist."
 )
 async def get_watchlist_contracts(
-    watchlistId: str = Path(..., description="The ID of the watchlist.")
+    watchlistId: str = Path(..., description="The ID of the watchlist."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Retrieves all contracts within a specific watchlist.
     """
-    async with create_client() as client:
-        try:
-            response = await client.get(f"{BASE_URL}/iserver/account/watchlist/{watchlistId}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.get(f"{BASE_URL}/iserver/account/watchlist/{watchlistId}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/iserver/account/{accountId}/watchlist",
@@ -72,24 +72,24 @@ async def get_watchlist_contracts(
 )
 async def create_watchlist(
     accountId: str = Path(..., description="The account ID."),
-    body: WatchlistCreateRequest = Body(...)
+    body: WatchlistCreateRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Creates a new watchlist for the specified account with an optional list of initial contracts.
     """
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/{accountId}/watchlist",
-                json=body.dict(exclude_none=True),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/{accountId}/watchlist",
+            json=body.dict(exclude_none=True),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.post(
     "/iserver/account/watchlist/{watchlistId}/contract",
@@ -99,7 +99,8 @@ async def create_watchlist(
 )
 async def add_contracts_to_watchlist(
     watchlistId: str = Path(..., description="The ID of the watchlist."),
-    body: WatchlistContractsRequest = Body(...)
+    body: WatchlistContractsRequest = Body(...),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Adds one or more contracts to a specified watchlist.
@@ -108,19 +109,18 @@ async def add_contracts_to_watchlist(
     # The API might expect a single `conid` key. If this call fails, adjust the model and this call accordingly.
     # For now, we assume a more flexible `conids` list can be handled or that the first element is used.
     # A safer single-conid implementation would be: `json={"conid": body.conids[0]}` if only one is allowed.
-    async with create_client() as client:
-        try:
-            response = await client.post(
-                f"{BASE_URL}/iserver/account/watchlist/{watchlistId}/contract",
-                json=body.dict(),
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.post(
+            f"{BASE_URL}/iserver/account/watchlist/{watchlistId}/contract",
+            json=body.dict(),
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.delete(
     "/iserver/account/watchlist/{watchlistId}",
@@ -129,20 +129,20 @@ async def add_contracts_to_watchlist(
     description="Deletes a specific watchlist."
 )
 async def delete_watchlist(
-    watchlistId: str = Path(..., description="The ID of the watchlist to delete.")
+    watchlistId: str = Path(..., description="The ID of the watchlist to delete."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Deletes an entire watchlist by its ID.
     """
-    async with create_client() as client:
-        try:
-            response = await client.delete(f"{BASE_URL}/iserver/account/watchlist/{watchlistId}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.delete(f"{BASE_URL}/iserver/account/watchlist/{watchlistId}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
 
 @router.delete(
     "/iserver/account/watchlist/{watchlistId}/contract/{conid}",
@@ -152,17 +152,17 @@ async def delete_watchlist(
 )
 async def delete_contract_from_watchlist(
     watchlistId: str = Path(..., description="The ID of the watchlist."),
-    conid: str = Path(..., description="The contract ID to delete.")
+    conid: str = Path(..., description="The contract ID to delete."),
+    client: httpx.AsyncClient = Depends(get_client)
 ):
     """
     Removes a single contract from a specified watchlist.
     """
-    async with create_client() as client:
-        try:
-            response = await client.delete(f"{BASE_URL}/iserver/account/watchlist/{watchlistId}/contract/{conid}", timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except httpx.HTTPStatusError as exc:
-            return handle_http_error(exc)
-        except httpx.RequestError as exc:
-            return handle_request_error(exc)
+    try:
+        response = await client.delete(f"{BASE_URL}/iserver/account/watchlist/{watchlistId}/contract/{conid}", timeout=10)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as exc:
+        return handle_http_error(exc)
+    except httpx.RequestError as exc:
+        return handle_request_error(exc)
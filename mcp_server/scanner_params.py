@@ -0,0 +1,242 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from xml.etree.ElementTree import Element, ParseError, fromstring
+
+import httpx
+from mcp_server.cache import CACHES
+from mcp_server.config import BASE_URL, SCANNER_PARAMS_TTL, SCANNER_PARAMS_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def _csv_list(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return [str(item) for item in value]
+    if not value:
+        return []
+    return [item.strip() for item in str(value).split(",") if item.strip()]
+
+
+def _text(element: Element, tag: str) -> Optional[str]:
+    child = element.find(tag)
+    return child.text.strip() if child is not None and child.text else None
+
+
+class ScannerParamsIndex:
+    """Instruments, scan types, filters and locations parsed out of /iserver/scanner/params.
+
+    Accepts either the JSON document (scan_type_list, instrument_list,
+    filter_list, location_tree) or the TWS-style XML one, and keeps only the
+    fields an agent needs to build a ScannerSubscription.
+    """
+
+    def __init__(self, instruments: List[Dict[str, Any]], scan_types: List[Dict[str, Any]],
+                 filters: List[Dict[str, Any]], locations: List[Dict[str, Any]]):
+        self.instruments = instruments
+        self.scan_types = scan_types
+        self.filters = filters
+        self.locations = locations
+        self._instrument_filters = {item["type"]: set(item["filters"]) for item in instruments}
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "ScannerParamsIndex":
+        instruments = [
+            {"type": item.get("type"), "display_name": item.get("display_name"), "filters": _csv_list(item.get("filters"))}
+            for item in data.get("instrument_list") or [] if item.get("type")
+        ]
+        scan_types = [
+            {"code": item.get("code"), "display_name": item.get("display_name"), "instruments": _csv_list(item.get("instruments"))}
+            for item in data.get("scan_type_list") or [] if item.get("code")
+        ]
+        filters = [
+            {"code": item.get("code"), "display_name": item.get("display_name"), "group": item.get("group"), "type": item.get("type")}
+            for item in data.get("filter_list") or [] if item.get("code")
+        ]
+        locations: List[Dict[str, Any]] = []
+
+        def walk(nodes: Iterable[Dict[str, Any]], instrument: Optional[str]) -> None:
+            for node in nodes:
+                code = node.get("type")
+                if instrument is None:
+                    walk(node.get("locations") or [], code)
+                    continue
+                locations.append({"code": code, "display_name": node.get("display_name"), "instrument": instrument})
+                walk(node.get("locations") or [], instrument)
+
+        walk(data.get("location_tree") or [], None)
+        return cls(instruments, scan_types, filters, locations)
+
+    @classmethod
+    def from_xml(cls, text: str) -> "ScannerParamsIndex":
+        root = fromstring(text)
+        instruments = [
+            {"type": _text(item, "type"), "display_name": _text(item, "name"), "filters": _csv_list(_text(item, "filters"))}
+            for item in root.iter("Instrument") if _text(item, "type")
+        ]
+        scan_types = [
+            {"code": _text(item, "scanCode"), "display_name": _text(item, "displayName"), "instruments": _csv_list(_text(item, "instruments"))}
+            for item in root.iter("ScanType") if _text(item, "scanCode")
+        ]
+        filters = []
+        for filter_list in root.iter("FilterList"):
+            for group in filter_list:
+                for field in group.iter("AbstractField"):
+                    if _text(field, "code"):
+                        filters.append({
+                            "code": _text(field, "code"),
+                            "display_name": _text(field, "displayName"),
+                            "group": _text(group, "id"),
+                            "type": group.tag,
+                        })
+        locations = [
+            {"code": code, "display_name": _text(item, "displayName"), "instrument": code.split(".")[0]}
+            for item in root.iter("Location") if (code := _text(item, "locationCode"))
+        ]
+        return cls(instruments, scan_types, filters, locations)
+
+    def scan_types_for(self, instrument: Optional[str]) -> List[Dict[str, Any]]:
+        if not instrument:
+            return self.scan_types
+        return [item for item in self.scan_types if instrument in item["instruments"]]
+
+    def find_filters(self, query: Optional[str], instrument: Optional[str]) -> List[Dict[str, Any]]:
+        """Filters whose code, display name or group contains query (case-insensitive), optionally limited to one instrument."""
+        allowed = self._instrument_filters.get(instrument) if instrument else None
+        needle = query.lower() if query else None
+        matches = []
+        for item in self.filters:
+            if allowed is not None and item["group"] not in allowed and item["code"] not in allowed:
+                continue
+            if needle and not any(needle in (item[key] or "").lower() for key in ("code", "display_name", "group")):
+                continue
+            matches.append(item)
+        return matches
+
+    def locations_for(self, instrument: Optional[str]) -> List[Dict[str, Any]]:
+        if not instrument:
+            return self.locations
+        return [item for item in self.locations if item["instrument"] == instrument]
+
+
+class ScannerParamsDocument:
+    """The raw scanner params response and its lazily built index."""
+
+    def __init__(self, body: str, is_json: bool, fetched_at: float):
+        self.body = body
+        self.is_json = is_json
+        self.fetched_at = fetched_at
+        self._index: Optional[ScannerParamsIndex] = None
+
+    @property
+    def index(self) -> ScannerParamsIndex:
+        if self._index is None:
+            try:
+                self._index = ScannerParamsIndex.from_json(json.loads(self.body)) if self.is_json \
+                    else ScannerParamsIndex.from_xml(self.body)
+            except (ValueError, ParseError, AttributeError) as exc:
+                logger.warning("Could not parse scanner params: %s", exc)
+                self._index = ScannerParamsIndex([], [], [], [])
+        return self._index
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+class ScannerParamsStore:
+    """Fetches /iserver/scanner/params at most once per SCANNER_PARAMS_TTL and keeps it on disk across restarts.
+
+    Registered in CACHES as "scanner_params" so it appears in the cache
+    diagnostics and can be invalidated with the other caches.
+    """
+
+    def __init__(self, path: Optional[str], ttl: float):
+        self.path = os.path.expanduser(path) if path else None
+        self.ttl = ttl
+        self._document: Optional[ScannerParamsDocument] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_loads = 0
+
+    def _fresh(self, document: Optional[ScannerParamsDocument]) -> bool:
+        return document is not None and time.time() - document.fetched_at < self.ttl
+
+    def _read_disk(self) -> Optional[ScannerParamsDocument]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+            return ScannerParamsDocument(stored["body"], stored["is_json"], stored["fetched_at"])
+        except (OSError, ValueError, KeyError) as exc:
+            logger.warning("Ignoring unreadable scanner params cache %s: %s", self.path, exc)
+            return None
+
+    def _write_disk(self, document: ScannerParamsDocument) -> None:
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"body": document.body, "is_json": document.is_json, "fetched_at": document.fetched_at}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            logger.warning("Could not persist scanner params to %s: %s", self.path, exc)
+
+    async def get(self, client: httpx.AsyncClient, refresh: bool = False) -> ScannerParamsDocument:
+        """Return the scanner params document, fetching it only if the memory and disk copies are stale."""
+        if not refresh and self._fresh(self._document):
+            self.hits += 1
+            return self._document
+        async with self._lock:
+            if not refresh and self._fresh(self._document):
+                self.hits += 1
+                return self._document
+            if not refresh:
+                document = await asyncio.to_thread(self._read_disk)
+                if self._fresh(document):
+                    self.disk_loads += 1
+                    self._document = document
+                    return document
+            self.misses += 1
+            response = await client.get(f"{BASE_URL}/iserver/scanner/params", timeout=30)
+            response.raise_for_status()
+            document = ScannerParamsDocument(
+                response.text, "json" in response.headers.get("content-type", ""), time.time()
+            )
+            self._document = document
+            await asyncio.to_thread(self._write_disk, document)
+            return document
+
+    def invalidate(self, keys: Optional[Iterable[Any]] = None) -> int:
+        removed = int(self._document is not None)
+        self._document = None
+        if self.path and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError as exc:
+                logger.warning("Could not remove scanner params cache %s: %s", self.path, exc)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.disk_loads
+        return {
+            "entries": int(self._document is not None),
+            "max_entries": 1,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_loads": self.disk_loads,
+            "hit_ratio": round((self.hits + self.disk_loads) / lookups, 4) if lookups else None,
+            "age_seconds": round(time.time() - self._document.fetched_at, 1) if self._document else None,
+            "path": self.path,
+        }
+
+
+scanner_params = ScannerParamsStore(SCANNER_PARAMS_CACHE_PATH, SCANNER_PARAMS_TTL)
+CACHES["scanner_params"] = scanner_params
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from mcp_server.config import (
+    BASE_URL,
+    SESSION_TICKLE_INTERVAL,
+    SESSION_RECOVERY_POLL_INTERVAL,
+    SESSION_RECOVERY_TIMEOUT,
+    SESSION_GATE_TIMEOUT,
+)
+from mcp_server.hmds import hmds_session
+
+logger = logging.getLogger(__name__)
+
+HEALTHY = "healthy"
+RECOVERING = "recovering"
+UNREACHABLE = "unreachable"
+
+
+class SessionSupervisor:
+    """Keeps the gateway brokerage session alive and recovers it when it degrades.
+
+    Every SESSION_TICKLE_INTERVAL seconds it tickles the gateway and checks
+    /iserver/auth/status. When the session is no longer authenticated, or a
+    gateway call comes back 401, it calls /iserver/reauthenticate and polls the
+    status until the session is back. While recovering, outbound calls wait in
+    GatewayTransport (up to SESSION_GATE_TIMEOUT) instead of failing with 401.
+    """
+
+    def __init__(self):
+        self.state = HEALTHY
+        self._healthy = asyncio.Event()
+        self._healthy.set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._client: Optional[httpx.AsyncClient] = None
+        self.last_status: Optional[Dict[str, Any]] = None
+        self.last_check: Optional[float] = None
+        self.counters = {"tickles": 0, "status_checks": 0, "reauthentications": 0, "recoveries": 0, "gated_requests": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        if self.is_running:
+            return
+        self._client = client
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="session-supervisor")
+
+    async def stop(self) -> None:
+        if not self.is_running:
+            return
+        # The flag ends the loops even if the cancellation lands somewhere that absorbs it.
+        self._stopping = True
+        self._wake.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._mark_healthy()
+
+    def report_unauthorized(self) -> None:
+        """Called when a gateway call returns 401: hold further calls and re-check the session now.
+
+        Acts in any state but an ongoing recovery, so a 401 while UNREACHABLE
+        also triggers a check instead of waiting for the next tickle.
+        """
+        if self.is_running and self._healthy.is_set():
+            self._healthy.clear()
+            self._wake.set()
+
+    async def wait_until_healthy(self) -> None:
+        """Hold an outbound call while the session recovers, giving up after SESSION_GATE_TIMEOUT."""
+        if self._healthy.is_set() or not self.is_running:
+            return
+        self.counters["gated_requests"] += 1
+        try:
+            await asyncio.wait_for(self._healthy.wait(), SESSION_GATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("Session still %s after %.0fs; sending the request anyway", self.state, SESSION_GATE_TIMEOUT)
+
+    def _mark_healthy(self) -> None:
+        self.state = HEALTHY
+        self._healthy.set()
+
+    async def _auth_status(self) -> Dict[str, Any]:
+        self.counters["status_checks"] += 1
+        response = await self._client.get(f"{BASE_URL}/iserver/auth/status", timeout=10)
+        response.raise_for_status()
+        self.last_status = response.json()
+        self.last_check = time.time()
+        return self.last_status
+
+    async def _check(self) -> bool:
+        """Tickle and return whether the brokerage session is authenticated.
+
+        The tickle response normally embeds the iserver auth status; a separate
+        /iserver/auth/status call is only made when it does not.
+        """
+        response = await self._client.post(f"{BASE_URL}/tickle", json={}, timeout=10)
+        response.raise_for_status()
+        self.counters["tickles"] += 1
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        status = body.get("iserver", {}).get("authStatus") if isinstance(body, dict) else None
+        if isinstance(status, dict) and "authenticated" in status:
+            self.last_status = status
+            self.last_check = time.time()
+        else:
+            status = await self._auth_status()
+        return bool(status.get("authenticated"))
+
+    async def _recover(self) -> None:
+        self.state = RECOVERING
+        self._healthy.clear()
+        logger.warning("Gateway session is not authenticated; re-authenticating")
+        deadline = time.monotonic() + SESSION_RECOVERY_TIMEOUT
+        while time.monotonic() < deadline and not self._stopping:
+            try:
+                await self._client.post(f"{BASE_URL}/iserver/reauthenticate", timeout=10)
+                self.counters["reauthentications"] += 1
+                await asyncio.sleep(SESSION_RECOVERY_POLL_INTERVAL)
+                if (await self._auth_status()).get("authenticated"):
+                    self.counters["recoveries"] += 1
+                    hmds_session.invalidate()
+                    logger.info("Gateway session recovered")
+                    self._mark_healthy()
+                    return
+            except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                logger.warning("Session recovery attempt failed: %s", exc)
+                await asyncio.sleep(SESSION_RECOVERY_POLL_INTERVAL)
+        # Stop holding requests; they will surface the 401 and its guidance to the caller.
+        logger.error("Gateway session did not recover within %.0fs", SESSION_RECOVERY_TIMEOUT)
+        self.state = UNREACHABLE
+        self._healthy.set()
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                if await self._check():
+                    self._mark_healthy()
+                else:
+                    await self._recover()
+            except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                logger.warning("Session health check failed: %s", exc)
+                self.state = UNREACHABLE
+                self._healthy.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Unexpected error in the session supervisor")
+            try:
+                await asyncio.wait_for(self._wake.wait(), SESSION_TICKLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running,
+            "state": self.state,
+            "last_status": self.last_status,
+            "last_check": self.last_check,
+            **self.counters,
+        }
+
+
+supervisor = SessionSupervisor()
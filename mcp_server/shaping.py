@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional
+
+from fastapi import Query
+
+
+def _csv_set(value: Optional[str]) -> Optional[FrozenSet[str]]:
+    if not value:
+        return None
+    items = frozenset(item.strip() for item in value.split(",") if item.strip())
+    return items or None
+
+
+@dataclass(frozen=True)
+class ResponseShape:
+    """Server-side field projection and truncation for large gateway payloads.
+
+    Field names are matched against the top-level keys of an object response
+    first; if none of them match, they apply to the records inside its list
+    values instead (e.g. the bars under "data" in a history response). List
+    responses, and lists one level down in object responses, are truncated to
+    `limit` items.
+    """
+    fields: Optional[FrozenSet[str]] = None
+    exclude: Optional[FrozenSet[str]] = None
+    limit: Optional[int] = None
+
+    @property
+    def is_noop(self) -> bool:
+        return self.fields is None and self.exclude is None and self.limit is None
+
+    def _project(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        if self.fields is not None:
+            record = {key: value for key, value in record.items() if key in self.fields}
+        if self.exclude is not None:
+            record = {key: value for key, value in record.items() if key not in self.exclude}
+        return record
+
+    def _shape_list(self, items: list, project: bool) -> list:
+        if self.limit is not None:
+            items = items[:self.limit]
+        if project and (self.fields is not None or self.exclude is not None):
+            items = [self._project(item) if isinstance(item, dict) else item for item in items]
+        return items
+
+    def apply(self, data: Any) -> Any:
+        if self.is_noop:
+            return data
+        if isinstance(data, list):
+            return self._shape_list(data, project=True)
+        if not isinstance(data, dict):
+            return data
+        names = (self.fields or frozenset()) | (self.exclude or frozenset())
+        top_level = any(name in data for name in names)
+        if top_level:
+            data = self._project(data)
+        return {
+            key: self._shape_list(value, project=not top_level) if isinstance(value, list) else value
+            for key, value in data.items()
+        }
+
+
+def response_shape(
+    fields: Optional[str] = Query(None, description="A comma-separated list of fields to keep in the response. Applied to top-level keys if they match, otherwise to each record in the response's lists."),
+    exclude: Optional[str] = Query(None, description="A comma-separated list of fields to drop from the response, matched the same way as 'fields'."),
+    limit: Optional[int] = Query(None, ge=1, description="Return at most this many items from each list in the response."),
+) -> ResponseShape:
+    """FastAPI dependency that adds fields/exclude/limit query parameters to an endpoint."""
+    return ResponseShape(_csv_set(fields), _csv_set(exclude), limit)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from mcp_server.config import (
+    BASE_URL,
+    SNAPSHOT_PRIME_TTL,
+    SNAPSHOT_MAX_RETRIES,
+    SNAPSHOT_RETRY_DELAY,
+    SNAPSHOT_CHUNK_SIZE,
+    SNAPSHOT_CHUNK_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def split_csv(value: Optional[str]) -> List[str]:
+    """Split a comma-separated query value into stripped, de-duplicated items, preserving order."""
+    if not value:
+        return []
+    return list(dict.fromkeys(item.strip() for item in value.split(",") if item.strip()))
+
+
+def _missing_fields(row: Optional[Dict[str, Any]], fields: List[str]) -> bool:
+    """Return True if the snapshot row is absent or lacks any of the requested fields."""
+    if row is None:
+        return True
+    return any(field not in row for field in fields)
+
+
+def _missing_row(conid: str) -> Dict[str, Any]:
+    """Marker row for a conid the gateway left out of an otherwise successful snapshot."""
+    return {"conid": int(conid) if conid.isdigit() else conid, "error": "No data returned"}
+
+
+def _error_row(conid: str, exc: Exception) -> Dict[str, Any]:
+    """Marker row standing in for a conid whose snapshot chunk failed."""
+    row: Dict[str, Any] = {"conid": int(conid) if conid.isdigit() else conid, "error": "Snapshot request failed"}
+    if isinstance(exc, httpx.HTTPStatusError):
+        row["status_code"] = exc.response.status_code
+        row["detail"] = exc.response.text[:200]
+    else:
+        row["detail"] = str(exc) or type(exc).__name__
+    return row
+
+
+class SnapshotEngine:
+    """Issue market data snapshots without a blind "prime then read" double fetch.
+
+    The gateway only returns values for a conid once a streaming subscription
+    for the requested fields exists, so the first snapshot for a cold conid
+    usually comes back empty. The engine remembers which conid/field sets are
+    already primed and only re-reads conids that were cold and are still
+    missing requested fields after the first call.
+    """
+
+    def __init__(self, prime_ttl: float = SNAPSHOT_PRIME_TTL, max_retries: int = SNAPSHOT_MAX_RETRIES,
+                 retry_delay: float = SNAPSHOT_RETRY_DELAY, chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+                 chunk_concurrency: int = SNAPSHOT_CHUNK_CONCURRENCY):
+        self.prime_ttl = prime_ttl
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.chunk_size = max(1, chunk_size)
+        self.chunk_concurrency = max(1, chunk_concurrency)
+        self._primed: Dict[str, tuple[frozenset, float]] = {}
+
+    def is_warm(self, conid: str, fields: Iterable[str]) -> bool:
+        entry = self._primed.get(conid)
+        if entry is None:
+            return False
+        primed_fields, primed_at = entry
+        if time.monotonic() - primed_at > self.prime_ttl:
+            del self._primed[conid]
+            return False
+        return primed_fields.issuperset(fields)
+
+    def mark_primed(self, conids: Iterable[str], fields: Iterable[str]) -> None:
+        now = time.monotonic()
+        fields = frozenset(fields)
+        for conid in conids:
+            entry = self._primed.get(conid)
+            if entry is not None and now - entry[1] <= self.prime_ttl:
+                fields_for_conid = entry[0] | fields
+            else:
+                fields_for_conid = fields
+            self._primed[conid] = (fields_for_conid, now)
+
+    def forget(self, conid: str) -> None:
+        """Drop priming state for a conid, e.g. after it was unsubscribed."""
+        self._primed.pop(str(conid), None)
+
+    def forget_all(self) -> None:
+        self._primed.clear()
+
+    async def _request(self, client: httpx.AsyncClient, conids: List[str], fields: List[str]) -> List[Dict[str, Any]]:
+        params = {"conids": ",".join(conids), "fields": ",".join(fields)}
+        response = await client.get(f"{BASE_URL}/iserver/marketdata/snapshot", params=params, timeout=10)
+        response.raise_for_status()
+        rows = response.json()
+        return rows if isinstance(rows, list) else []
+
+    async def _fetch_chunk(self, client: httpx.AsyncClient, conids: List[str], fields: List[str]) -> List[Dict[str, Any]]:
+        cold = {conid for conid in conids if not self.is_warm(conid, fields)}
+
+        rows_by_conid: Dict[str, Dict[str, Any]] = {}
+        for row in await self._request(client, conids, fields):
+            rows_by_conid[str(row.get("conid"))] = row
+        self.mark_primed(conids, fields)
+
+        # Warm conids that still lack a field simply don't publish it; only
+        # conids that were just primed are worth reading again.
+        for attempt in range(self.max_retries):
+            incomplete = [c for c in conids if c in cold and _missing_fields(rows_by_conid.get(c), fields)]
+            if not incomplete:
+                break
+            logger.debug("Snapshot re-read %d/%d for %d cold conids", attempt + 1, self.max_retries, len(incomplete))
+            if self.retry_delay:
+                await asyncio.sleep(self.retry_delay)
+            for row in await self._request(client, incomplete, fields):
+                rows_by_conid[str(row.get("conid"))] = row
+
+        return [rows_by_conid.get(conid) or _missing_row(conid) for conid in conids]
+
+    async def fetch(self, client: httpx.AsyncClient, conids: List[str], fields: List[str]) -> List[Dict[str, Any]]:
+        """Return one snapshot row per conid, in the order requested.
+
+        Lists longer than chunk_size are split into gateway-sized chunks that
+        are fetched chunk_concurrency at a time. When some chunks fail, each of
+        their conids gets an error marker row ({"conid", "error", ...}) in its
+        place; so does a conid the gateway leaves out of a successful response. When every chunk fails, or the list fits in one chunk, the error
+        is raised as httpx.HTTPStatusError / httpx.RequestError like a plain
+        client call.
+        """
+        if len(conids) <= self.chunk_size:
+            return await self._fetch_chunk(client, conids, fields)
+
+        chunks = [conids[i:i + self.chunk_size] for i in range(0, len(conids), self.chunk_size)]
+        semaphore = asyncio.Semaphore(self.chunk_concurrency)
+
+        async def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self._fetch_chunk(client, chunk, fields)
+
+        results = await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        failures = [result for result in results if isinstance(result, BaseException)]
+        for failure in failures:
+            if not isinstance(failure, (httpx.HTTPStatusError, httpx.RequestError)):
+                raise failure
+        if len(failures) == len(chunks):
+            raise failures[0]
+
+        rows: List[Dict[str, Any]] = []
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, BaseException):
+                logger.warning("Snapshot chunk of %d conids failed: %s", len(chunk), result)
+                rows.extend(_error_row(conid, result) for conid in chunk)
+            else:
+                rows.extend(result)
+        return rows
+
+
+snapshot_engine = SnapshotEngine()
@@ -0,0 +1,391 @@
+import asyncio
+import json
+import logging
+import ssl
+import time
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Union
+
+import aiohttp
+import httpx
+from mcp_server.config import (
+    BASE_URL,
+    get_ssl_verify,
+    STREAM_WS_URL,
+    STREAM_DEFAULT_FIELDS,
+    STREAM_SUBSCRIPTION_TTL,
+    STREAM_HEARTBEAT_INTERVAL,
+    STREAM_RECONNECT_DELAY,
+    STREAM_LISTENER_QUEUE_SIZE,
+    QUOTE_TABLE_FIELDS,
+)
+from mcp_server.quote_table import QuoteTable
+from mcp_server.snapshot import snapshot_engine
+
+logger = logging.getLogger(__name__)
+
+DISCONNECTED = "disconnected"
+CONNECTING = "connecting"
+CONNECTED = "connected"
+
+Handler = Callable[[Dict[str, Any]], None]
+Hook = Callable[[], Awaitable[None]]
+
+
+def _ssl_option() -> Union[bool, ssl.SSLContext, None]:
+    """Translate SSL_VERIFY into aiohttp's ssl argument."""
+    verify = get_ssl_verify()
+    if verify is False:
+        return False
+    if isinstance(verify, str):
+        return ssl.create_default_context(cafile=verify)
+    return None
+
+
+class GatewayWebSocket:
+    """The one WebSocket connection to the gateway's /ws endpoint.
+
+    Feature streams register a handler per topic prefix ("smd", "sor", ...)
+    and the subscribe messages of the topics they hold; those are replayed
+    after every reconnect. The connection is opened when the first topic is
+    added and closed once none are left. Every STREAM_HEARTBEAT_INTERVAL
+    seconds it sends the gateway's "tic" keep-alive and runs the registered
+    heartbeat hooks.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.state = DISCONNECTED
+        self._handlers: Dict[str, Handler] = {}
+        self._hooks: List[Hook] = []
+        self._topics: Dict[str, str] = {}
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._stopping = False
+        self.connected_at: Optional[float] = None
+        self.last_message_at: Optional[float] = None
+        self.counters = {"connects": 0, "disconnects": 0, "messages_in": 0, "messages_out": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def client(self) -> Optional[httpx.AsyncClient]:
+        return self._client
+
+    def on(self, topic: str, handler: Handler) -> None:
+        self._handlers[topic] = handler
+
+    def on_heartbeat(self, hook: Hook) -> None:
+        self._hooks.append(hook)
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        self._client = client
+        if self.is_running:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="gateway-websocket")
+
+    async def stop(self) -> None:
+        if not self.is_running:
+            return
+        self._stopping = True
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def subscribe(self, client: httpx.AsyncClient, key: str, message: str) -> None:
+        """Hold a topic: send its subscribe message now if connected, and again after every reconnect."""
+        self._topics[key] = message
+        self.start(client)
+        await self._send(message)
+
+    async def unsubscribe(self, key: str, message: str) -> None:
+        if self._topics.pop(key, None) is not None:
+            await self._send(message)
+
+    async def _send(self, message: str) -> None:
+        if self._ws is None or self._ws.closed:
+            return
+        try:
+            await self._ws.send_str(message)
+            self.counters["messages_out"] += 1
+        except (aiohttp.ClientError, ConnectionError) as exc:
+            logger.info("Could not send %r on the gateway WebSocket: %s", message[:60], exc)
+
+    async def _session_cookie(self) -> Optional[str]:
+        """The gateway authenticates WebSocket upgrades with the session token returned by /tickle."""
+        try:
+            response = await self._client.post(f"{BASE_URL}/tickle", json={}, timeout=10)
+            response.raise_for_status()
+            body = response.json()
+        except (httpx.HTTPStatusError, httpx.RequestError, ValueError) as exc:
+            logger.info("Could not read the session token for the WebSocket: %s", exc)
+            return None
+        return body.get("session") if isinstance(body, dict) else None
+
+    def _dispatch(self, text: str) -> None:
+        self.counters["messages_in"] += 1
+        self.last_message_at = time.time()
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        topic = str(message.get("topic") or "")
+        handler = self._handlers.get(topic.split("+", 1)[0])
+        if handler is not None:
+            try:
+                handler(message)
+            except Exception:
+                logger.exception("Error handling gateway WebSocket message on topic %s", topic)
+
+    async def _run_hooks(self) -> None:
+        for hook in self._hooks:
+            try:
+                await hook()
+            except Exception:
+                logger.exception("Error in a gateway WebSocket heartbeat hook")
+
+    async def _read(self, session: aiohttp.ClientSession) -> None:
+        session_token = await self._session_cookie()
+        headers = {"Cookie": f"api={session_token}"} if session_token else None
+        async with session.ws_connect(self.url, headers=headers, ssl=_ssl_option()) as ws:
+            self._ws = ws
+            self.state = CONNECTED
+            self.connected_at = time.time()
+            self.counters["connects"] += 1
+            for message in list(self._topics.values()):
+                await self._send(message)
+            next_heartbeat = time.monotonic() + STREAM_HEARTBEAT_INTERVAL
+            while self._topics and not self._stopping:
+                try:
+                    msg = await ws.receive(timeout=max(0.0, next_heartbeat - time.monotonic()))
+                except asyncio.TimeoutError:
+                    msg = None
+                if msg is None or time.monotonic() >= next_heartbeat:
+                    next_heartbeat = time.monotonic() + STREAM_HEARTBEAT_INTERVAL
+                    await self._send("tic")
+                    await self._run_hooks()
+                if msg is None:
+                    continue
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self._dispatch(msg.data)
+                elif msg.type == aiohttp.WSMsgType.BINARY:
+                    self._dispatch(msg.data.decode("utf-8", "replace"))
+                elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    break
+
+    async def _run(self) -> None:
+        while True:
+            async with aiohttp.ClientSession() as session:
+                while self._topics and not self._stopping:
+                    self.state = CONNECTING
+                    try:
+                        await self._read(session)
+                    except asyncio.CancelledError:
+                        raise
+                    except (aiohttp.ClientError, ConnectionError, asyncio.TimeoutError) as exc:
+                        logger.warning("Gateway WebSocket error: %s", exc)
+                    finally:
+                        if self._ws is not None:
+                            self.counters["disconnects"] += 1
+                            await self._ws.close()
+                        self._ws = None
+                        self.state = DISCONNECTED
+                    if self._topics and not self._stopping:
+                        # Leases keep expiring while the gateway is unreachable.
+                        await self._run_hooks()
+                        await asyncio.sleep(STREAM_RECONNECT_DELAY)
+            # A topic subscribed while the session was closing found this task still running and did not
+            # start another one, so check again before finishing.
+            if not self._topics or self._stopping:
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "running": self.is_running,
+            "topics": len(self._topics),
+            "connected_at": self.connected_at,
+            "last_message_at": self.last_message_at,
+            **self.counters,
+        }
+
+
+class TickListener:
+    """A bounded queue of tick deltas for one consumer, e.g. an SSE connection."""
+
+    def __init__(self, conids: Optional[Set[str]], maxsize: int = STREAM_LISTENER_QUEUE_SIZE):
+        self.conids = conids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, conid: str, delta: Dict[str, Any]) -> None:
+        if self.conids is not None and conid not in self.conids:
+            return
+        try:
+            self.queue.put_nowait(delta)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class MarketDataStream:
+    """Streams market data over the gateway WebSocket and shares it between subscribers.
+
+    Each conid is subscribed upstream (smd+conid) once, however many
+    subscribers hold it. A subscriber holds a conid either for a lease of
+    `ttl` seconds, renewed by subscribing again, or until it unsubscribes
+    (persistent, used by SSE connections). When the last holder of a conid
+    leaves or its lease expires, the conid is unsubscribed on the WebSocket
+    and through /iserver/marketdata/unsubscribe. The latest values of every
+    held conid are kept in a QuoteTable, so reading them costs no gateway call.
+    Subscribing and releasing a conid are serialized per conid, so a release
+    still in flight cannot cancel a subscription made meanwhile.
+    """
+
+    def __init__(self, ws: GatewayWebSocket, default_fields: List[str], ttl: float, quotes: QuoteTable):
+        self.ws = ws
+        self.default_fields = default_fields
+        self.ttl = ttl
+        self.quotes = quotes
+        self._holders: Dict[str, Dict[str, Optional[float]]] = {}
+        self._fields: Dict[str, List[str]] = {}
+        self._listeners: Set[TickListener] = set()
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+        self.counters = {"ticks": 0, "subscribes": 0, "releases": 0, "expired_leases": 0}
+        ws.on("smd", self._on_tick)
+        ws.on_heartbeat(self.expire)
+
+    async def subscribe(
+        self,
+        client: httpx.AsyncClient,
+        subscriber: str,
+        conids: Iterable[str],
+        fields: Optional[List[str]] = None,
+        ttl: Optional[float] = None,
+        persistent: bool = False,
+    ) -> List[str]:
+        """Hold conids for subscriber for a lease of ttl seconds (default STREAM_SUBSCRIPTION_TTL), or until it unsubscribes if persistent."""
+        expires_at = None if persistent else time.monotonic() + (ttl or self.ttl)
+        fields = fields or self.default_fields
+        subscribed = []
+        for conid in conids:
+            conid = str(conid)
+            async with self._lock(conid):
+                holders = self._holders.setdefault(conid, {})
+                current = holders.get(subscriber, 0.0)
+                holders[subscriber] = None if expires_at is None or current is None else max(expires_at, current)
+                wanted = list(dict.fromkeys(self._fields.get(conid, []) + fields))
+                if wanted != self._fields.get(conid):
+                    self._fields[conid] = wanted
+                    self.counters["subscribes"] += 1
+                    await self.ws.subscribe(client, f"smd+{conid}", f"smd+{conid}+{json.dumps({'fields': wanted})}")
+            subscribed.append(conid)
+        return subscribed
+
+    async def unsubscribe(self, subscriber: str, conids: Optional[Iterable[str]] = None) -> List[str]:
+        """Drop subscriber's hold on conids (all of them if None); returns the conids released upstream."""
+        targets = [str(conid) for conid in conids] if conids is not None else list(self._holders)
+        released = []
+        for conid in targets:
+            holders = self._holders.get(conid)
+            if holders is None or subscriber not in holders:
+                continue
+            del holders[subscriber]
+            if not holders and await self._release(conid):
+                released.append(conid)
+        return released
+
+    async def expire(self) -> None:
+        now = time.monotonic()
+        for conid, holders in list(self._holders.items()):
+            expired = [name for name, expires_at in holders.items() if expires_at is not None and expires_at <= now]
+            for name in expired:
+                del holders[name]
+                self.counters["expired_leases"] += 1
+            if expired and not holders:
+                await self._release(conid)
+
+    def _lock(self, conid: str) -> asyncio.Lock:
+        """The lock serializing subscribe and release of conid; dropped once nobody holds or awaits it."""
+        lock = self._locks.get(conid)
+        if lock is None:
+            lock = self._locks[conid] = asyncio.Lock()
+        return lock
+
+    async def _release(self, conid: str) -> bool:
+        """Unsubscribe conid upstream unless it was held again meanwhile; returns whether it was released."""
+        async with self._lock(conid):
+            if self._holders.get(conid):
+                return False
+            self._holders.pop(conid, None)
+            self._fields.pop(conid, None)
+            self.quotes.remove(conid)
+            self.counters["releases"] += 1
+            await self.ws.unsubscribe(f"smd+{conid}", f"umd+{conid}+{{}}")
+            client = self.ws.client
+            if client is not None:
+                try:
+                    response = await client.post(
+                        f"{BASE_URL}/iserver/marketdata/unsubscribe", json={"conid": conid}, timeout=10
+                    )
+                    response.raise_for_status()
+                except (httpx.HTTPStatusError, httpx.RequestError) as exc:
+                    logger.info("Could not unsubscribe market data for %s: %s", conid, exc)
+            snapshot_engine.forget(conid)
+        return True
+
+    def _on_tick(self, message: Dict[str, Any]) -> None:
+        conid = str(message.get("conid") or message["topic"].split("+", 1)[-1])
+        if conid not in self._holders:
+            return
+        delta = {key: value for key, value in message.items() if key[:1].isdigit() or key == "_updated"}
+        if not delta:
+            return
+        self.counters["ticks"] += 1
+        self.quotes.update(conid, delta)
+        event = {"conid": int(conid) if conid.isdigit() else conid, **delta}
+        for listener in self._listeners:
+            listener.put(conid, event)
+
+    def latest(self, conids: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """The latest values per conid, in the order asked (held conids without a tick yet are omitted)."""
+        keys = [str(conid) for conid in conids] if conids is not None else list(self._holders)
+        rows = (self.quotes.get(conid) for conid in keys)
+        return [row for row in rows if row is not None]
+
+    def listen(self, conids: Optional[Iterable[str]] = None) -> TickListener:
+        listener = TickListener({str(conid) for conid in conids} if conids is not None else None)
+        self._listeners.add(listener)
+        return listener
+
+    def stop_listening(self, listener: TickListener) -> None:
+        self._listeners.discard(listener)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "conids": len(self._holders),
+            "subscriptions": {conid: sorted(holders) for conid, holders in self._holders.items()},
+            "listeners": len(self._listeners),
+            "dropped_events": sum(listener.dropped for listener in self._listeners),
+            **self.counters,
+            "quotes": self.quotes.stats(),
+        }
+
+
+def _default_ws_url() -> str:
+    return BASE_URL.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + "/ws"
+
+
+gateway_ws = GatewayWebSocket(STREAM_WS_URL or _default_ws_url())
+market_data_stream = MarketDataStream(
+    gateway_ws, STREAM_DEFAULT_FIELDS, STREAM_SUBSCRIPTION_TTL, QuoteTable(QUOTE_TABLE_FIELDS + STREAM_DEFAULT_FIELDS)
+)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# mcp_server.config reads these at import time.
+os.environ.setdefault("ROUTERS_PATH", os.path.join(ROOT, "mcp_server", "routers"))
+os.environ.setdefault("GATEWAY_INTERNAL_BASE_URL", "https://localhost")
+os.environ.setdefault("GATEWAY_PORT", "5000")
+os.environ.setdefault("GATEWAY_ENDPOINT", "/v1/api")
+os.environ.setdefault("MCP_SERVER_PORT", "5002")
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
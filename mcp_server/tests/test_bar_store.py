@@ -0,0 +1,36 @@
+import asyncio
+
+from mcp_server.bar_store import BarStore, duration_seconds, format_start_time, parse_start_time, read_through
+
+BAR_MS = 60_000
+
+
+def gateway(calls):
+    """Fake history endpoint: one bar per minute with start <= t < startTime, like the gateway."""
+    async def fetch(period, start_time):
+        calls.append((period, start_time))
+        end_ms = parse_start_time(start_time)
+        start_ms = end_ms - duration_seconds(period) * 1000
+        return {"symbol": "TEST", "data": [{"t": t, "c": 1.0} for t in range(start_ms, end_ms, BAR_MS)]}
+    return fetch
+
+
+def test_window_ending_on_a_stored_bar_matches_gateway_and_repeats(tmp_path):
+    store = BarStore(str(tmp_path / "bars.sqlite3"))
+    calls = []
+    fetch = gateway(calls)
+
+    async def scenario():
+        # The wider request stores a bar stamped exactly at 11:30, the end of the narrower one.
+        await read_through(store, "key", "60min", "1min", "20260105-12:00:00", False, fetch)
+        first = await read_through(store, "key", "30min", "1min", "20260105-11:30:00", False, fetch)
+        repeat = await read_through(store, "key", "30min", "1min", "20260105-11:30:00", False, fetch)
+        expected = await gateway([])("30min", "20260105-11:30:00")
+        return first, repeat, expected
+
+    first, repeat, expected = asyncio.run(scenario())
+
+    assert [bar["t"] for bar in first["data"]] == [bar["t"] for bar in expected["data"]]
+    assert format_start_time(first["data"][-1]["t"]) == "20260105-11:29:00"
+    assert repeat == first
+    assert calls == [("60min", "20260105-12:00:00")]